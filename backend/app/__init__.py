@@ -0,0 +1,5 @@
+# app/__init__.py
+import time
+
+# first app import of the process; app/main.py reports the import phase from here
+IMPORT_STARTED = time.perf_counter()
@@ -1,4 +1,5 @@
 # app/api/deps.py
+from app.db.replicas import get_read_db
 from app.db.session import get_db
 
-__all__ = ["get_db"]
\ No newline at end of file
+__all__ = ["get_db", "get_read_db"]
\ No newline at end of file
@@ -3,5 +3,7 @@ from app.api.routers.chat import router as chat_router
 from app.api.routers.sessions import router as sessions_router
 from app.api.routers.history import router as history_router
 from app.api.routers.support import router as support_router
+from app.api.routers.metrics import router as metrics_router
+from app.api.routers.health import router as health_router
 
-__all__ = ["products_router", "chat_router", "sessions_router", "history_router", "support_router"]
\ No newline at end of file
+__all__ = ["products_router", "chat_router", "sessions_router", "history_router", "support_router", "metrics_router", "health_router"]
\ No newline at end of file
@@ -1,24 +1,60 @@
 # app/api/routers/chat.py
-import re
+import asyncio
+import time
 from datetime import datetime
+from functools import wraps
+from typing import Any, Awaitable, Callable, Optional, TypeVar
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import get_db
+from app.core import metrics
+from app.core.config import settings
 from app.core.logging import logger
-from app.models import ChatHistory, ChatSession, Product
+from app.core.session_tokens import is_signed_session_token
+from app.core.tracing import span
+from app.db.replicas import ReadSessionLocal
+from app.db.session import SessionLocal
+from app.models import ChatHistory, HumanFlag, Product
 from app.schemas import ChatRequest, ChatResponse
-from app.services.gemini_client import gemini_product_answer
+from app.services.gemini_client import FallbackAnswer
+from app.services.gemini_scheduler import Priority, run_in_gemini_thread
 from app.services.human_handoff import get_flag
+from app.services.product_resolver import resolve_product_in_text
+from app.services import idempotency
+from app.services.chat_sessions import lazy_session_retired, upsert_chat_session
+from app.services.session_cache import SessionMeta, get_session_meta, invalidate_sessions, remember_session
 
 from app.services.intent import detect_intent, Intent
-from app.services.product_retrieval import retrieve_products_for_prompt, products_to_gemini_payload
-from app.services.chat_maintenance import trim_chat_history, trim_chat_sessions
+from app.services.product_retrieval import RetrievalResult, retrieve_products_for_prompt, products_to_gemini_payload
+from app.services.chat_maintenance import (
+    history_needs_trim,
+    queue_history_trim,
+    queue_session_trim,
+    sweep_history_trims,
+    sweep_session_trims,
+)
+from app.services.conversation_summary import (
+    ConversationWindow,
+    build_conversation_window,
+    context_fetch_limit,
+    refresh_conversation_summary,
+)
+from app.services.chat_history import recent_messages
+from app.services.model_router import RouteDecision, generate_reply, prepare_prompt_prefix, route_turn
 
 router = APIRouter(tags=["chat"])
 
-_ID_PATTERN = re.compile(r"(?:^|\s)(?:#|id\s*[:#]?\s*|product\s+)(\d+)\b", re.IGNORECASE)
+CHAT_TURN_SECONDS = metrics.histogram("chat_turn_seconds", "End-to-end /chat turn latency by intent")
+RETRIEVALS = metrics.counter("chat_retrievals_total", "Product retrieval decisions by RetrievalResult.reason")
+
+T = TypeVar("T")
+
+# session retention queued by every turn (trim_chat_sessions)
+CHAT_SESSION_CAP = 20
 
 
 def store_assistant(db: Session, session_id: str, message: str) -> None:
@@ -33,8 +69,9 @@ def store_assistant(db: Session, session_id: str, message: str) -> None:
     db.commit()
 
 
-def build_response(db: Session, session_id: str, user_message: str, bot_message: str, product_id: int | None) -> ChatResponse:
-    flag = get_flag(db, session_id)
+def build_response(
+    session_id: str, user_message: str, bot_message: str, product_id: int | None, flag: HumanFlag | None
+) -> ChatResponse:
     return ChatResponse(
         session_id=session_id,
         user_message=user_message,
@@ -46,78 +83,309 @@ def build_response(db: Session, session_id: str, user_message: str, bot_message:
     )
 
 
-def extract_product_id_from_message(db: Session, user_message: str) -> int | None:
+def extract_product_from_message(db: Session, user_message: str) -> Product | None:
     """
-    Only check DB if user explicitly typed an id.
+    Only check DB if user explicitly typed an id. The row is cached in the
+    stage's session, so exact-id retrieval reuses it without a query.
     """
-    m = _ID_PATTERN.search(user_message)
-    if not m:
-        return None
-    pid = int(m.group(1))
-    exists = db.query(Product.id).filter(Product.id == pid).first()
-    return pid if exists else None
+    return resolve_product_in_text(db, user_message)
+
+
+# ---- turn stages -------------------------------------------------------------
+# Blocking stages run on the threadpool (the request trace follows them). A stage
+# that can run alongside another gets its own DB session: Sessions are not
+# thread-safe. The request session `db` is only ever used by one stage at a time.
+
+async def _run(fn: Callable[..., T], *args: Any) -> T:
+    return await run_in_threadpool(fn, *args)
+
+
+def _own_session(fn: Callable[..., T], factory: Callable[[], Session] = SessionLocal) -> Callable[..., T]:
+    @wraps(fn)
+    def stage(*args: Any) -> T:
+        stage_db = factory()  # no connection is checked out until the first query
+        try:
+            return fn(stage_db, *args)
+        finally:
+            stage_db.close()
+
+    return stage
+
+
+async def _gather(*stages: Awaitable[Any]) -> list[Any]:
+    """Concurrent stages; in order when CHAT_CONCURRENT_STAGES=false."""
+    if settings.chat_concurrent_stages:
+        return list(await asyncio.gather(*stages))
+    results = []
+    for i, stage in enumerate(stages):
+        try:
+            results.append(await stage)
+        except BaseException:
+            for pending in stages[i + 1:]:
+                pending.close()  # type: ignore[attr-defined]
+            raise
+    return results
+
+
+async def _start(stage: Awaitable[T]) -> "asyncio.Future[T]":
+    """Start a stage in the background and return a future to await later."""
+    if settings.chat_concurrent_stages:
+        return asyncio.ensure_future(stage)
+    future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+    try:
+        future.set_result(await stage)
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def _load_session_meta(db: Session, session_id: str) -> Optional[SessionMeta]:
+    with span("db.session_check"):
+        return get_session_meta(db, session_id)  # cached; no query on most turns
+
+
+def _load_flag(db: Session, session_id: str, stage: str) -> HumanFlag | None:
+    with span(stage):
+        return get_flag(db, session_id)
+
+
+def _load_history(db: Session, session_id: str, limit: int) -> list[ChatHistory]:
+    # newest rows only, via the (session_id, created_at) index. Loaded on a stage
+    # session: detached rows are not expired (and re-selected) by later commits.
+    with span("db.history"):
+        return recent_messages(db, session_id, limit)
+
+
+def _session_retired(db: Session, session_id: str) -> bool:
+    with span("db.session_retired"):
+        return lazy_session_retired(db, session_id, CHAT_SESSION_CAP)
+
+
+def _store_user_message(db: Session, message: ChatHistory, materialize: bool) -> None:
+    # lazy session: its row is created in the same transaction as the first message
+    with span("db.store_user_message"):
+        if materialize:
+            upsert_chat_session(db, message.session_id)
+        db.add(message)
+        try:
+            db.commit()
+        except IntegrityError:
+            # FK violation: the session was trimmed after the cache said it exists
+            db.rollback()
+            invalidate_sessions([message.session_id])
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    if materialize:
+        remember_session(message.session_id, SessionMeta())  # replaces the cached negative
+
+
+def _store_reply(db: Session, session_id: str, message: str) -> None:
+    with span("db.store_assistant"):
+        store_assistant(db, session_id, message)
+
+
+def _retrieve(
+    db: Session, user_message: str, intent: Intent, conversation_context: list[dict[str, str]]
+) -> tuple[int | None, RetrievalResult, list[dict]]:
+    # Only extract product_id if user typed #id (no extra DB work otherwise)
+    with span("extract_product_id"):
+        matched_product = extract_product_from_message(db, user_message)
+    matched_product_id = matched_product.id if matched_product else None
+
+    # ✅ Conditional DB retrieval
+    with span("retrieve_products") as sp:
+        rr = retrieve_products_for_prompt(
+            db,
+            user_message=user_message,
+            intent=intent,
+            conversation_context=conversation_context,
+            matched_product_id=matched_product_id,
+        )
+        # payload is built before this stage's session closes
+        products_data = products_to_gemini_payload(rr.products) if rr.used else []
+        if sp is not None:
+            sp.set_attribute("reason", rr.reason)
+            sp.set_attribute("products", len(rr.products))
+    return matched_product_id, rr, products_data
+
+
+def _prepare_prompt(
+    predicted: RouteDecision,
+    user_message: str,
+    history: list[ChatHistory],
+    summary: Optional[str],
+    summary_upto: Optional[datetime],
+) -> tuple[ConversationWindow, Optional[str]]:
+    with span("prompt_prefix", route=predicted.route.value):
+        # Gemini gets rolling summary + newest raw turns (token-budgeted)
+        window = build_conversation_window(history, summary=summary, summary_upto=summary_upto)
+        prefix = prepare_prompt_prefix(
+            predicted,
+            user_message=user_message,
+            conversation_history=window.messages,
+            conversation_summary=window.summary,
+        )
+    return window, prefix
+
+
+def _maintenance(db: Session, session_id: str, known_count: Optional[int]) -> bool:
+    """True if the history is over its cap (trimmed in the background, like old sessions)."""
+    with span("maintenance.trim_chat_history"):
+        return history_needs_trim(db, session_id, max_messages=50, known_count=known_count)
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(data: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
-    session = db.query(ChatSession).filter(ChatSession.session_id == data.session_id).first()
-    if not session:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+async def chat(
+    data: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=128),
+) -> ChatResponse:
+    """
+    With an Idempotency-Key header (or client_message_id) a retry of the same
+    message returns the first reply instead of storing and generating again.
+    """
+    key = idempotency_key or data.client_message_id
+    if not key:
+        response, _ = await run_chat_turn(data, background_tasks, db)
+        return response
 
+    scope = f"{data.session_id}:{key}"
+    fp = idempotency.fingerprint(data.message.strip())
+    try:
+        with span("idempotency.acquire"):
+            stored = await _run(idempotency.acquire, scope, fp)
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Idempotency key was already used for a different message",
+        )
+    except idempotency.IdempotencyInFlight:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this idempotency key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    if stored is not None:
+        return ChatResponse(**stored)
+
+    try:
+        response, final = await run_chat_turn(data, background_tasks, db)
+    except BaseException:
+        idempotency.release(scope)  # nothing stored: a retry runs the turn again
+        raise
+    if final:
+        idempotency.complete(scope, fp, response.model_dump())
+    else:
+        idempotency.release(scope)  # "busy" / fallback text: a retry must get a real answer
+    return response
+
+
+async def run_chat_turn(
+    data: ChatRequest, background_tasks: BackgroundTasks, db: Session
+) -> tuple[ChatResponse, bool]:
+    """
+    Returns (response, final); final is False when the reply is a shed or
+    fallback answer (FallbackAnswer) instead of a real one.
+
+    One turn as a small dependency graph:
+
+        session check ─┐
+        human flag ────┼─> store user message (background) ───────────────┐
+        history ───────┘─> intent ─┬─> product id + retrieval ─┐          ├─> Gemini ─┬─> store reply ─> trims
+                                   └─> window + prompt prefix ─┴─> route ─┘           └─> flag for response
+    """
+    started = time.perf_counter()
+    session_id = data.session_id
     user_message = data.message.strip()
     if not user_message:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Message cannot be empty")
 
-    # Store user message
-    db.add(ChatHistory(session_id=data.session_id, role="user", message=user_message, created_at=datetime.utcnow()))
-    db.commit()
-
-    # Context (last 12)
-    history = (
-        db.query(ChatHistory)
-        .filter(ChatHistory.session_id == data.session_id)
-        .order_by(ChatHistory.created_at.asc())
-        .all()
+    # Context: loaded before the user message is stored, so ask for one row less
+    fetch_limit = context_fetch_limit()
+    session, flag, older = await _gather(
+        _run(_own_session(_load_session_meta), session_id),
+        _run(_own_session(_load_flag), session_id, "db.human_flag"),
+        _run(_own_session(_load_history), session_id, fetch_limit - 1),
     )
+    # lazy session: a signed id we issued, first message creates the row, unless
+    # the retention trim already retired it (deleted or never materialized)
+    materialize = session is None and is_signed_session_token(session_id)
+    if materialize and await _run(_own_session(_session_retired), session_id):
+        materialize = False
+    if not session and not materialize:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    summary, summary_upto = (session.summary, session.summary_upto) if session else (None, None)
+
+    now = datetime.utcnow()
+    # the stored row expires on commit (request session); the history keeps its own copy
+    history = [*older, ChatHistory(session_id=session_id, role="user", message=user_message, created_at=now)]
+    user_row = ChatHistory(session_id=session_id, role="user", message=user_message, created_at=now)
     conversation_context = [{"role": h.role, "content": h.message} for h in history][-12:]
 
     # human active => stop gemini
-    flag = get_flag(db, data.session_id)
     if flag and flag.status == "active":
+        await _run(_store_user_message, db, user_row, materialize)
         msg = "Customer service is handling this chat now."
-        store_assistant(db, data.session_id, msg)
-        return build_response(db, data.session_id, user_message, msg, product_id=None)
+        await _run(store_assistant, db, session_id, msg)
+        CHAT_TURN_SECONDS.observe(time.perf_counter() - started, intent="human_active")
+        return build_response(session_id, user_message, msg, None, flag), True
+
+    stored = await _start(_run(_store_user_message, db, user_row, materialize))
+    try:
+        with span("detect_intent") as sp:
+            intent = detect_intent(user_message, conversation_context)
+            if sp is not None:
+                sp.set_attribute("intent", intent.value)
 
-    intent = detect_intent(user_message, conversation_context)
+        # the route without retrieval; the prefix is reused when retrieval does not change it
+        predicted = route_turn(
+            user_message=user_message,
+            intent=intent,
+            conversation_context=conversation_context,
+            retrieval_used=False,
+        )
+        (matched_product_id, rr, products_data), (window, prefix) = await _gather(
+            # catalog reads: a replica when configured (the turn never writes products)
+            _run(_own_session(_retrieve, ReadSessionLocal), user_message, intent, conversation_context),
+            _run(_prepare_prompt, predicted, user_message, history, summary, summary_upto),
+        )
+    finally:
+        await stored  # the user message must be stored before the reply (404 if the session is gone)
 
-    # Only extract product_id if user typed #id (no extra DB work otherwise)
-    matched_product_id = extract_product_id_from_message(db, user_message)
+    RETRIEVALS.inc(reason=rr.reason)
 
-    # ✅ Conditional DB retrieval
-    rr = retrieve_products_for_prompt(
-        db,
+    decision = route_turn(
         user_message=user_message,
         intent=intent,
         conversation_context=conversation_context,
-        matched_product_id=matched_product_id,
+        retrieval_used=rr.used,
     )
-    products_data = products_to_gemini_payload(rr.products) if rr.used else []
 
     logger.info(
-        "chat session=%s intent=%s db_lookup=%s reason=%s products=%d",
-        data.session_id,
+        "chat session=%s intent=%s db_lookup=%s reason=%s products=%d route=%s",
+        session_id,
         intent,
         rr.used,
         rr.reason,
         len(rr.products),
+        decision.route.value,
     )
 
     try:
-        ai_answer = gemini_product_answer(
-            prompt=user_message,
-            products=products_data,
-            conversation_history=conversation_context,
-        )
+        with span("generate_reply", route=decision.route.value):
+            # waits for admission in a Gemini thread, not one of the DB stages' threads
+            ai_answer = await run_in_gemini_thread(
+                lambda: generate_reply(
+                    decision,
+                    user_message=user_message,
+                    products=products_data,
+                    conversation_history=window.messages,
+                    conversation_summary=window.summary,
+                    # ongoing conversations are admitted before brand-new sessions
+                    priority=Priority.ONGOING if len(history) > 1 else Priority.NEW_SESSION,
+                    prompt_prefix=prefix if decision.route is predicted.route else None,
+                )
+            )
     except Exception as exc:
         logger.exception("Gemini error during chat.")
         raise HTTPException(
@@ -125,9 +393,23 @@ def chat(data: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
             detail="Failed to generate AI response.",
         ) from exc
 
-    store_assistant(db, data.session_id, ai_answer)
+    # flag is re-read: customer service may have taken over during generation
+    _, flag = await _gather(
+        _run(_store_reply, db, session_id, ai_answer),
+        _run(_own_session(_load_flag), session_id, "db.build_response"),
+    )
+
+    # the context query loaded the whole session when it returned fewer rows than asked for
+    known_count = len(history) + 1 if len(history) < fetch_limit else None  # +1: assistant reply
+    if await _run(_maintenance, db, session_id, known_count):
+        if queue_history_trim(session_id):
+            background_tasks.add_task(sweep_history_trims, 50)
+    if queue_session_trim(CHAT_SESSION_CAP, keep_session_id=session_id):
+        background_tasks.add_task(sweep_session_trims)
 
-    trim_chat_history(db, data.session_id, max_messages=50)
-    trim_chat_sessions(db, max_sessions=20, keep_session_id=data.session_id)
+    if window.refresh_due:
+        background_tasks.add_task(refresh_conversation_summary, session_id)
 
-    return build_response(db, data.session_id, user_message, ai_answer, product_id=matched_product_id)
\ No newline at end of file
+    response = build_response(session_id, user_message, ai_answer, matched_product_id, flag)
+    CHAT_TURN_SECONDS.observe(time.perf_counter() - started, intent=intent.value)
+    return response, not isinstance(ai_answer, FallbackAnswer)
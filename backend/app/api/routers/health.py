@@ -0,0 +1,19 @@
+# app/api/routers/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.warmup import is_ready, readiness
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz() -> dict:
+    # liveness: the process serves requests (it may still be warming up)
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz() -> JSONResponse:
+    # readiness: 503 until the startup warm-up is done, and again while stopping
+    return JSONResponse(readiness(), status_code=200 if is_ready() else 503)
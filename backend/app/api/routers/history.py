@@ -1,38 +1,43 @@
 # app/api/routers/history.py
-import uuid
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Path, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db
-from app.models import ChatHistory, ChatSession
+from app.api.deps import get_db, get_read_db
+from app.core.session_tokens import is_signed_session_token, is_valid_session_id
 from app.schemas import ChatHistoryOut
+from app.services.chat_archive import archive_enabled, archived_rows
+from app.services.chat_history import session_history_query
+from app.services.session_cache import session_exists
 
 router = APIRouter(tags=["history"])
 
 
 @router.get("/history/{session_id}", response_model=List[ChatHistoryOut])
 def get_history(
-    session_id: str = Path(..., description="Chat session UUID"),
+    session_id: str = Path(..., description="Chat session id"),
     db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
 ) -> List[ChatHistoryOut]:
-    try:
-        uuid.UUID(session_id)
-    except ValueError:
+    if not is_valid_session_id(session_id):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid session_id format")
 
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
+    # on the primary: a lagging replica must not turn a new session into a cached "not found"
+    exists = session_exists(db, session_id)
+    # trimmed messages (or a whole trimmed session) live in the archive tier
+    archived = archived_rows(read_db, session_id) if archive_enabled() else []
+    if not exists and not archived:
+        if is_signed_session_token(session_id):
+            return []  # lazy session without a message yet
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
 
-    history = (
-        db.query(ChatHistory)
-        .filter(ChatHistory.session_id == session_id)
-        .order_by(ChatHistory.created_at.asc())
-        .all()
-    )
-    if not history:
+    history = session_history_query(read_db, session_id).all() if exists else []
+    if not history and not archived:
         return[]
 
-    return [ChatHistoryOut.from_orm(msg) for msg in history]
\ No newline at end of file
+    hot_ids = {msg.id for msg in history}
+    return [
+        *(ChatHistoryOut.model_validate(row) for row in archived if row["id"] not in hot_ids),
+        *(ChatHistoryOut.from_orm(msg) for msg in history),
+    ]
\ No newline at end of file
@@ -0,0 +1,34 @@
+# app/api/routers/metrics.py
+from anyio import to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+from app.services.prompt_builder import cache_info as product_block_cache_info
+from app.services.session_cache import cache_info as session_cache_info
+
+router = APIRouter(tags=["metrics"])
+
+THREADPOOL_BUSY = metrics.gauge("threadpool_busy_threads", "Worker threads in use for sync endpoints")
+THREADPOOL_LIMIT = metrics.gauge("threadpool_max_threads", "Worker thread limit for sync endpoints")
+# counters, so rate()/increase() work; hit ratio = rate(hits) / (rate(hits) + rate(misses))
+CACHE_HITS = metrics.counter("cache_hits_total", "Cache hits")
+CACHE_MISSES = metrics.counter("cache_misses_total", "Cache misses")
+
+
+def _collect_caches() -> None:
+    for name, info in (("product_block", product_block_cache_info()), ("session", session_cache_info())):
+        CACHE_HITS.set_total(info.hits, cache=name)
+        CACHE_MISSES.set_total(info.misses, cache=name)
+
+
+metrics.REGISTRY.register_collector(_collect_caches)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    # the anyio limiter can only be read from the event loop, so sample it here
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_LIMIT.set(limiter.total_tokens)
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,7 +4,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
 from app.core.logging import logger
 from app.models import Product
 from app.schemas import ProductBase, ProductOut
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/products", tags=["products"])
 
 
 @router.get("", response_model=List[ProductOut])
-def list_products(limit: int = Query(1000, ge=1, le=500), db: Session = Depends(get_db)) -> List[Product]:
+def list_products(limit: int = Query(1000, ge=1, le=500), db: Session = Depends(get_read_db)) -> List[Product]:
     logger.info("Fetching products with limit=%s", limit)
     return db.query(Product).limit(limit).all()
 
@@ -1,23 +1,33 @@
 # app/api/routers/sessions.py
-import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, BackgroundTasks, Depends, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.core.config import settings
+from app.db.ids import new_id
 from app.models import ChatSession
 from app.schemas import CreateSessionResponse
-from app.services.chat_maintenance import trim_chat_sessions
+from app.services.chat_maintenance import queue_session_trim, sweep_session_trims
+from app.services.chat_sessions import SESSIONS, issue_lazy_session
+from app.services.session_cache import remember_session
 
 router = APIRouter(tags=["sessions"])
 
 
 @router.post("/create_session", response_model=CreateSessionResponse, status_code=status.HTTP_201_CREATED)
-def create_session(db: Session = Depends(get_db)) -> CreateSessionResponse:
-    session_id = str(uuid.uuid4())
+def create_session(background_tasks: BackgroundTasks, db: Session = Depends(get_db)) -> CreateSessionResponse:
+    if settings.lazy_sessions:
+        # no DB work: the row is upserted by the first /chat message
+        return CreateSessionResponse(session_id=issue_lazy_session())
+
+    session_id = new_id()  # time-ordered UUIDv7, still a valid UUID for clients
     new_session = ChatSession(session_id=session_id, created_at=datetime.utcnow())
-    trim_chat_sessions(db, max_sessions=200, keep_session_id=session_id)
     db.add(new_session)
     db.commit()
-    return CreateSessionResponse(session_id=session_id)
\ No newline at end of file
+    if queue_session_trim(200, keep_session_id=session_id):
+        background_tasks.add_task(sweep_session_trims)
+    SESSIONS.inc(event="created")
+    remember_session(session_id)
+    return CreateSessionResponse(session_id=session_id)
@@ -2,10 +2,12 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db
-from app.models import ChatHistory, ChatSession, HumanFlag
+from app.api.deps import get_db, get_read_db
+from app.models import ChatHistory, HumanFlag
+from app.services.session_cache import invalidate_sessions, session_exists
 
 router = APIRouter(prefix="/support", tags=["support"])
 
@@ -16,15 +18,14 @@ class SupportMessageIn(BaseModel):
 
 
 @router.get("/queue")
-def queue(db: Session = Depends(get_db)):
+def queue(db: Session = Depends(get_read_db)):
     flags = db.query(HumanFlag).filter(HumanFlag.status == "active").order_by(HumanFlag.updated_at.desc()).all()
     return [{"flag_id": f.id, "session_id": f.session_id, "reason": f.reason, "updated_at": f.updated_at.isoformat()} for f in flags]
 
 
 @router.post("/send")
 def send_support_message(data: SupportMessageIn, db: Session = Depends(get_db)):
-    session = db.query(ChatSession).filter(ChatSession.session_id == data.session_id).first()
-    if not session:
+    if not session_exists(db, data.session_id):
         raise HTTPException(status_code=404, detail="Session not found")
 
     msg = data.message.strip()
@@ -37,5 +38,11 @@ def send_support_message(data: SupportMessageIn, db: Session = Depends(get_db)):
         message=msg,
         created_at=datetime.utcnow(),
     ))
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # FK violation: the session was trimmed after the cache said it exists
+        db.rollback()
+        invalidate_sessions([data.session_id])
+        raise HTTPException(status_code=404, detail="Session not found")
     return {"ok": True}
\ No newline at end of file
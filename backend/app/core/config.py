@@ -28,6 +28,23 @@ class Settings:
     mysql_host: str = os.getenv("MYSQL_HOST", "localhost")
     mysql_port: str = os.getenv("MYSQL_PORT", "3306")
     sql_echo: bool = os.getenv("SQL_ECHO", "false").lower() == "true"
+    # connection pool per worker process: DB_MAX_CONNECTIONS (this app's share of MySQL
+    # max_connections) is split across WEB_CONCURRENCY workers, DB_POOL_SIZE/DB_MAX_OVERFLOW cap it
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    db_max_connections: int = int(os.getenv("DB_MAX_CONNECTIONS", "120"))
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # read replicas (comma-separated URLs) for read-only endpoints and catalog reads; a replica
+    # further behind than DB_REPLICA_MAX_LAG_SECONDS is skipped until it catches up
+    database_replica_urls: list[str] = field(
+        default_factory=lambda: [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+    )
+    db_replica_max_lag_seconds: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "2"))
+    db_replica_lag_check_seconds: float = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "5"))
+    # create/upgrade the schema when the API starts; false = `python -m app.db.migrate` per deploy
+    startup_create_schema: bool = os.getenv("STARTUP_CREATE_SCHEMA", "true").lower() == "true"
+    # store chat_history / user_product_history / human_flags ids as BINARY(16) (MySQL only)
+    db_binary_ids: bool = os.getenv("DB_BINARY_IDS", "false").lower() == "true"
 
     # Gemini
     gemini_api_key: str = (
@@ -37,6 +54,83 @@ class Settings:
         or ""
     )
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    gemini_light_model: str = os.getenv("GEMINI_LIGHT_MODEL", "gemini-2.5-flash-lite")
+    model_routing_enabled: bool = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+    gemini_base_url: str = os.getenv("GEMINI_BASE_URL", "")  # e.g. fake server for tests/benchmarks
+
+    # Gemini resilience
+    gemini_deadline_seconds: float = float(os.getenv("GEMINI_DEADLINE_SECONDS", "25"))
+    gemini_attempt_timeout_seconds: float = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT_SECONDS", "15"))
+    gemini_max_attempts: int = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+    gemini_hedge_enabled: bool = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+    gemini_hedge_min_delay_seconds: float = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", "2"))
+    gemini_breaker_failures: int = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+    gemini_breaker_reset_seconds: float = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+    gemini_max_workers: int = int(os.getenv("GEMINI_MAX_WORKERS", "32"))
+    # concurrent byte-identical prompts share one upstream call
+    gemini_single_flight: bool = os.getenv("GEMINI_SINGLE_FLIGHT", "true").lower() == "true"
+
+    # Gemini quota scheduler (RPM/TPM split across WEB_CONCURRENCY workers; 0 = unlimited).
+    # MAX_CONCURRENCY + MAX_QUEUE must stay below the request threadpool (40 threads)
+    gemini_rpm: int = int(os.getenv("GEMINI_RPM", "1000"))
+    gemini_tpm: int = int(os.getenv("GEMINI_TPM", "1000000"))
+    gemini_max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+    gemini_max_queue: int = int(os.getenv("GEMINI_MAX_QUEUE", "16"))
+    gemini_max_queue_wait_seconds: float = float(os.getenv("GEMINI_MAX_QUEUE_WAIT_SECONDS", "5"))
+    gemini_expected_output_tokens: int = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "256"))
+
+    # Conversation summary (0 turns = disabled, raw history only)
+    summary_model: str = os.getenv("SUMMARY_MODEL", "") or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    summary_every_n_turns: int = int(os.getenv("SUMMARY_EVERY_N_TURNS", "4"))
+    summary_keep_raw_messages: int = int(os.getenv("SUMMARY_KEEP_RAW_MESSAGES", "4"))
+    summary_max_tokens: int = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+    prompt_history_token_budget: int = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "1200"))
+
+    # Session metadata cache (negative = unknown ids; local TTL applies when a shared store is set)
+    session_cache_ttl_seconds: float = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+    session_cache_negative_ttl_seconds: float = float(os.getenv("SESSION_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+    session_cache_local_ttl_seconds: float = float(os.getenv("SESSION_CACHE_LOCAL_TTL_SECONDS", "2"))
+    session_cache_max_entries: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+    session_cache_redis_url: str = os.getenv("SESSION_CACHE_REDIS_URL", "")  # needs the `redis` package
+
+    # Lazy sessions: /create_session returns a signed id, the row is upserted on the first /chat
+    lazy_sessions: bool = os.getenv("LAZY_SESSIONS", "false").lower() == "true"
+    session_token_secret: str = os.getenv("SESSION_TOKEN_SECRET", "")  # shared by all workers
+
+    # Idempotent /chat (Idempotency-Key header or client_message_id); shared store is optional
+    idempotency_ttl_seconds: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+    idempotency_wait_seconds: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+    idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    idempotency_redis_url: str = os.getenv("IDEMPOTENCY_REDIS_URL", "") or os.getenv("SESSION_CACHE_REDIS_URL", "")
+
+    # /chat runs independent stages (history, flag, retrieval, prompt prefix) concurrently
+    chat_concurrent_stages: bool = os.getenv("CHAT_CONCURRENT_STAGES", "true").lower() == "true"
+
+    # History retention: a session is trimmed back to 50 messages once it exceeds 50 + slack,
+    # so one background sweep covers `slack` turns instead of running on every turn
+    chat_history_trim_slack: int = int(os.getenv("CHAT_HISTORY_TRIM_SLACK", "20"))
+
+    # Archive tier: rows evicted by the history/session trims go to compressed segment files
+    # under this directory (zstd with the `zstandard` package, else gzip); "" = hard delete
+    chat_archive_dir: str = os.getenv("CHAT_ARCHIVE_DIR", "")
+    chat_archive_zstd_level: int = int(os.getenv("CHAT_ARCHIVE_ZSTD_LEVEL", "3"))
+    # a session's archive spread over this many segments is merged into one (<= 1 = never)
+    chat_archive_compact_segments: int = int(os.getenv("CHAT_ARCHIVE_COMPACT_SEGMENTS", "4"))
+
+    # Incremental analytics export (python -m app.services.analytics_export): Parquet with the
+    # `pyarrow` package, else compressed NDJSON; rows younger than the lag wait for the next run
+    analytics_export_dir: str = os.getenv("ANALYTICS_EXPORT_DIR", "")
+    analytics_export_batch_rows: int = int(os.getenv("ANALYTICS_EXPORT_BATCH_ROWS", "5000"))
+    analytics_export_file_rows: int = int(os.getenv("ANALYTICS_EXPORT_FILE_ROWS", "1000000"))
+    analytics_export_lag_seconds: float = float(os.getenv("ANALYTICS_EXPORT_LAG_SECONDS", "60"))
+
+    # Startup warm-up before /readyz reports ready (pool connections, Gemini client, caches)
+    warmup_enabled: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    warmup_db_connections: int = int(os.getenv("WARMUP_DB_CONNECTIONS", "5"))
+    warmup_gemini_preflight: bool = os.getenv("WARMUP_GEMINI_PREFLIGHT", "true").lower() == "true"
+
+    # Debug: per-request SQL counters in response headers, repeated-statement warnings
+    debug: bool = os.getenv("DEBUG", "false").lower() == "true"
 
     # CORS (fixed: no mutable default)
     cors_allow_origins: list[str] = field(
@@ -1,23 +1,132 @@
 # app/core/logging.py
+"""
+Non-blocking logging: request threads only enqueue records (bounded queue,
+drop + count when full); a QueueListener thread formats them and does the
+console/file I/O, including file rotation.
+"""
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from app.core import metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_FILE = os.getenv("LOG_FILE", "chatbot.log")  # empty = console only
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# fraction of INFO/DEBUG records kept; WARNING and above are never sampled
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+
+LOG_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+LOG_SAMPLED_OUT = metrics.counter("log_records_sampled_out_total", "INFO/DEBUG log records skipped by sampling")
+
+# attributes every LogRecord has; anything else came in via `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
 
 logger = logging.getLogger("chatbot")
 
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps `rate` of INFO and below; `extra={"sample": False}` always keeps a record."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING or getattr(record, "sample", True) is False:
+            return True
+        if random.random() < self.rate:
+            return True
+        LOG_SAMPLED_OUT.inc()
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record and counts it."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc(level=record.levelname)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve %-args and traceback now (they may reference mutable/request
+        # state), but leave formatting to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == "text":
+        return logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    return JsonFormatter()
+
+
 if not logger.handlers:
-    logger.setLevel(logging.INFO)
+    logger.setLevel(LOG_LEVEL)
 
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    formatter = _formatter()
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    file_handler = RotatingFileHandler(
-        "chatbot.log",
-        maxBytes=5 * 1024 * 1024,
-        backupCount=3,
-        encoding="utf-8",
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
\ No newline at end of file
+    sinks: list = [console_handler]
+
+    if LOG_FILE:
+        file_handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=5 * 1024 * 1024,
+            backupCount=3,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        sinks.append(file_handler)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_INFO_SAMPLE_RATE))
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *sinks, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def _restart_listener_after_fork() -> None:
+        # the listener thread does not survive fork() (gunicorn --preload): the
+        # child gets its own queue and thread, without the parent's pending records
+        global listener
+        queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        listener = QueueListener(queue_handler.queue, *sinks, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener_after_fork)
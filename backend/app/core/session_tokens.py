@@ -0,0 +1,77 @@
+# app/core/session_tokens.py
+"""
+Signed session ids for lazy session creation (LAZY_SESSIONS=true).
+
+A token is "<uuid7>.<tag>": the tag is a truncated HMAC-SHA256 of the UUID under
+SESSION_TOKEN_SECRET, so the server can tell an id it issued from a made-up one
+without a database row. 59 characters, fits chat_sessions.session_id (String(64)).
+Plain UUIDs (eagerly created sessions) stay valid session ids.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+TAG_BYTES = 16
+_EPOCH = datetime(1970, 1, 1)
+
+_secret = settings.session_token_secret.encode()
+if not _secret:
+    _secret = os.urandom(32)
+    if settings.lazy_sessions:
+        logger.warning(
+            "LAZY_SESSIONS is on but SESSION_TOKEN_SECRET is unset; using a per-process key, "
+            "so tokens issued by one worker are rejected by the others and after a restart."
+        )
+
+
+def _tag(raw_id: str) -> str:
+    digest = hmac.new(_secret, raw_id.encode(), hashlib.sha256).digest()[:TAG_BYTES]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue_session_token() -> str:
+    from app.db.ids import uuid7  # app.db imports the engine; keep this module import-light
+
+    raw_id = str(uuid7())
+    return f"{raw_id}.{_tag(raw_id)}"
+
+
+def is_signed_session_token(value: str) -> bool:
+    """True only for tokens issued with the current secret."""
+    raw_id, sep, tag = value.partition(".")
+    if not sep or not _is_uuid(raw_id):
+        return False
+    return hmac.compare_digest(tag, _tag(raw_id))
+
+
+def token_issued_at(value: str) -> Optional[datetime]:
+    """
+    When a token was issued: the millisecond timestamp in the first 48 bits of its
+    uuid7, as naive UTC like the created_at columns. None if it is not a token.
+    """
+    raw_id, sep, _ = value.partition(".")
+    if not sep or not _is_uuid(raw_id):
+        return None
+    return _EPOCH + timedelta(milliseconds=uuid.UUID(raw_id).int >> 80)
+
+
+def is_valid_session_id(value: str) -> bool:
+    """Plain UUID (eager sessions) or a signed token (lazy sessions)."""
+    return _is_uuid(value) or is_signed_session_token(value)
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,223 @@
+# app/core/tracing.py
+"""
+Request-scoped latency tracing.
+
+Spans follow the OpenTelemetry data model (128-bit trace id, 64-bit span id,
+parent id, ns timestamps, attributes, status). Finished spans go to the
+registered exporters: InMemorySpanExporter for tests, and the real
+OpenTelemetry SDK when TRACING_OTEL_EXPORT=true and it is installed.
+At the end of each request the per-stage breakdown is logged as one JSON line,
+under its "trace" key. Background jobs run after their request's trace was
+exported: they get a trace of their own (request_trace inside a request
+context), linked to the request's by link_trace_id.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Protocol
+
+from app.core.logging import logger
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACING_OTEL_EXPORT = os.getenv("TRACING_OTEL_EXPORT", "false").lower() == "true"
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "OK"  # OK | ERROR
+    _otel: Any = field(default=None, repr=False)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: List[Span]) -> None: ...
+
+
+class InMemorySpanExporter:
+    def __init__(self) -> None:
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class _Trace:
+    """All spans of one request; shared (mutably) across threads of that request."""
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+_exporters: List[SpanExporter] = []
+_current_trace: contextvars.ContextVar[Optional[_Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+_otel_tracer: Any = None
+if TRACING_OTEL_EXPORT:
+    try:
+        from opentelemetry import trace as _otel_trace
+
+        _otel_tracer = _otel_trace.get_tracer("chatbot")
+    except ImportError:
+        logger.warning("TRACING_OTEL_EXPORT=true but opentelemetry is not installed; using log export only.")
+
+
+def add_exporter(exporter: SpanExporter) -> None:
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter: SpanExporter) -> None:
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def _start_otel(span: Span, parent: Optional[Span]) -> None:
+    if _otel_tracer is None:
+        return
+    ctx = _otel_trace.set_span_in_context(parent._otel) if parent is not None and parent._otel else None
+    span._otel = _otel_tracer.start_span(span.name, context=ctx, start_time=span.start_ns, attributes=span.attributes)
+
+
+def _end_otel(span: Span) -> None:
+    if span._otel is None:
+        return
+    for key, value in span.attributes.items():
+        if isinstance(value, (str, bool, int, float)):
+            span._otel.set_attribute(key, value)
+    if span.status == "ERROR":
+        span._otel.set_status(_otel_trace.Status(_otel_trace.StatusCode.ERROR))
+    span._otel.end(end_time=span.end_ns)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Child span of the current request trace. No-op (yields None) outside a trace.
+    """
+    trace = _current_trace.get()
+    if trace is None or not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    _start_otel(s, parent)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        s.status = "ERROR"
+        s.attributes.setdefault("error", type(exc).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end_ns = time.time_ns()
+        _end_otel(s)
+        trace.add(s)
+
+
+def _export(spans: List[Span]) -> None:
+    for exporter in list(_exporters):
+        try:
+            exporter.export(spans)
+        except Exception:
+            logger.exception("Span exporter %r failed", exporter)
+
+
+def stage_breakdown(root: Span, spans: List[Span]) -> Dict[str, Any]:
+    stages: Dict[str, float] = {}
+    for s in spans:
+        if s is root:
+            continue
+        stages[s.name] = round(stages.get(s.name, 0.0) + s.duration_ms, 3)
+    return {
+        "trace_id": root.trace_id,
+        "name": root.name,
+        "duration_ms": round(root.duration_ms, 3),
+        "status": root.status,
+        **{k: v for k, v in root.attributes.items() if isinstance(v, (str, int, float, bool))},
+        "stages_ms": stages,
+    }
+
+
+@contextmanager
+def request_trace(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Root span for one request (or background job). On exit, exports every span
+    of the trace and logs the stage breakdown as a single structured line.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    linked = _current_trace.get()
+    if linked is not None:  # e.g. a background task of an already exported request
+        attributes["link_trace_id"] = linked.trace_id
+    trace = _Trace(secrets.token_hex(16))
+    outer_span = _current_span.set(None)
+    trace_token = _current_trace.set(trace)
+    root: Optional[Span] = None
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current_span.reset(outer_span)
+        _current_trace.reset(trace_token)
+        spans = sorted(trace.spans, key=lambda s: s.start_ns)
+        _export(spans)
+        if root is not None:
+            logger.info(
+                "trace %s %s %.1fms",
+                root.name,
+                root.trace_id,
+                root.duration_ms,
+                extra={"trace": stage_breakdown(root, spans)},
+            )
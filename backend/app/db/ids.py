@@ -0,0 +1,86 @@
+# app/db/ids.py
+"""
+Primary keys.
+
+New ids are UUIDv7 (RFC 9562): the first 48 bits are a millisecond timestamp,
+so inserts land at the right edge of the InnoDB clustered index instead of at
+random pages, and ids still look like any other UUID to API clients.
+
+`UuidKey` keeps the external form a UUID string; with DB_BINARY_IDS=true it is
+stored as BINARY(16) on MySQL (see migrations.convert_ids_to_binary).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy import String
+from sqlalchemy.dialects.mysql import BINARY
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeDecorator, TypeEngine
+
+from app.core.config import settings
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID. Within one millisecond a 12-bit counter (randomly
+    seeded each ms) keeps ids from this process monotonic.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF  # leave headroom
+        else:
+            _counter += 1
+            if _counter > 0xFFF:  # counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        rand_a = _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | rand_a << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    return str(uuid7())
+
+
+def _binary(dialect: Dialect) -> bool:
+    return settings.db_binary_ids and dialect.name == "mysql"
+
+
+class UuidKey(TypeDecorator):
+    """UUID string in Python; String(64) or (MySQL + DB_BINARY_IDS) BINARY(16) in the DB."""
+
+    impl = String(64)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Dialect) -> TypeEngine[Any]:
+        if _binary(dialect):
+            return dialect.type_descriptor(BINARY(16))
+        return dialect.type_descriptor(String(64))
+
+    def process_bind_param(self, value: Optional[str], dialect: Dialect) -> Any:
+        if value is None or not _binary(dialect):
+            return value
+        try:
+            return uuid.UUID(str(value)).bytes
+        except ValueError:
+            return b""  # not a UUID: matches no row rather than raising
+
+    def process_result_value(self, value: Any, dialect: Dialect) -> Optional[str]:
+        if value is None or not _binary(dialect):
+            return value
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -0,0 +1,174 @@
+# app/db/instrumentation.py
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.tracing import request_trace
+
+DB_QUERY_SECONDS = metrics.histogram("db_query_seconds", "SQL statement execution time")
+POOL_SIZE = metrics.gauge("db_pool_size", "Configured SQLAlchemy pool size")
+POOL_CHECKED_OUT = metrics.gauge("db_pool_checked_out", "Pooled connections currently checked out")
+POOL_OVERFLOW = metrics.gauge("db_pool_overflow", "Connections open beyond pool_size (negative = unused pool slots)")
+
+QUERIES_PER_REQUEST = metrics.histogram(
+    "db_queries_per_request", "SQL statements per HTTP request", buckets=(1, 2, 4, 8, 12, 16, 24, 32, 64, 128)
+)
+REPEATED_STATEMENTS = metrics.counter(
+    "db_repeated_statements_total", "Executions of a statement already run with the same parameters in the request"
+)
+
+_QUERY_START = "_query_start"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# same statement text this many times in one request (any parameters) = likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryStats:
+    """SQL statements executed on behalf of one request."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self._by_params: Counter[tuple[str, str]] = Counter()
+        self._by_statement: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameters: Any, seconds: float, executemany: bool) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self._by_statement[statement] += 1
+            if not executemany:
+                self._by_params[(statement, repr(parameters))] += 1
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Identical statement + parameters executed more than once: a redundant round-trip."""
+        with self._lock:
+            return [(stmt, n) for (stmt, _), n in self._by_params.items() if n > 1]
+
+    def n_plus_one(self) -> list[tuple[str, int]]:
+        with self._lock:
+            return [(stmt, n) for stmt, n in self._by_statement.items() if n >= N_PLUS_ONE_THRESHOLD]
+
+
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("db_query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count statements run in this context. Threadpool endpoints inherit a copy of
+    the context, so they report into the same object. Background tasks run after
+    the middleware has reported the request: wrap them in `background_job`.
+    """
+    stats = QueryStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+def report_request(stats: QueryStats, route: str) -> None:
+    """Record per-request query metrics; in debug mode also log redundant statements."""
+    QUERIES_PER_REQUEST.observe(stats.count, route=route)
+    repeated = stats.repeated()
+    for _, n in repeated:
+        REPEATED_STATEMENTS.inc(n - 1, route=route)
+    if not settings.debug:
+        return
+    for statement, n in repeated:
+        logger.warning("Repeated SQL route=%s times=%d statement=%s", route, n, " ".join(statement.split())[:300])
+    for statement, n in stats.n_plus_one():
+        logger.warning("Possible N+1 route=%s times=%d statement=%s", route, n, " ".join(statement.split())[:300])
+
+
+def background_job(fn: F) -> F:
+    """
+    Run a BackgroundTasks job (sync) under its own QueryStats and trace. Its
+    statements are reported as route="background:<name>", neither lost nor
+    counted against the request that scheduled it, and its spans go to a trace
+    linked to the request's (which was exported when the response finished).
+    """
+    route = f"background:{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with request_trace(f"background.{fn.__name__}") as root, track_queries() as stats:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                report_request(stats, route)
+                if root is not None:
+                    root.set_attribute("db_queries", stats.count)
+                    root.set_attribute("db_time_ms", round(stats.seconds * 1000, 3))
+
+    return wrapper  # type: ignore[return-value]
+
+
+def debug_headers(stats: QueryStats) -> dict[str, str]:
+    return {
+        "X-DB-Query-Count": str(stats.count),
+        "X-DB-Query-Time-Ms": f"{stats.seconds * 1000:.2f}",
+        "X-DB-Repeated-Statements": str(sum(n - 1 for _, n in stats.repeated())),
+    }
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "OTHER"
+
+
+# the start time lives on the statement's execution context, not on the connection: a
+# statement that raises never reaches after_cursor_execute and leaves nothing behind
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    if context is not None:
+        setattr(context, _QUERY_START, time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    started = getattr(context, _QUERY_START, None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed, statement=_statement_kind(statement))
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed, executemany)
+
+
+def instrument_engine(engine: Engine, name: Optional[str] = None) -> None:
+    """Attach query timing hooks and pool gauges to `engine` (idempotent); `name` labels the gauges."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    labels = {"engine": name} if name else {}
+
+    def collect_pool() -> None:
+        pool = engine.pool
+        for gauge, attr in ((POOL_SIZE, "size"), (POOL_CHECKED_OUT, "checkedout"), (POOL_OVERFLOW, "overflow")):
+            fn = getattr(pool, attr, None)
+            if callable(fn):
+                gauge.set(fn(), **labels)
+
+    metrics.REGISTRY.register_collector(collect_pool)
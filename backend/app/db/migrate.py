@@ -0,0 +1,39 @@
+# app/db/migrate.py
+"""
+Schema setup: missing tables (create_all) plus the in-place upgrades in
+app/db/migrations.py. Run it once per deploy instead of on every worker boot:
+
+    cd backend && python -m app.db.migrate
+
+The API only runs it at startup with STARTUP_CREATE_SCHEMA=true (the default,
+convenient for local runs); production workers set it to false.
+"""
+from __future__ import annotations
+
+import time
+
+from sqlalchemy.engine import Engine
+
+from app.core.logging import logger
+from app.db.base import Base
+from app.db.migrations import upgrade
+
+
+def migrate(engine: Engine) -> list[str]:
+    """Create missing tables, then apply pending upgrades. Returns the applied upgrade steps."""
+    from app import models as _models  # noqa: F401  (registers every table on Base.metadata)
+
+    Base.metadata.create_all(bind=engine)
+    return upgrade(engine)
+
+
+def main() -> None:
+    from app.db.session import engine
+
+    started = time.perf_counter()
+    applied = migrate(engine)
+    logger.info("Schema is up to date (%d upgrade step(s), %.2fs)", len(applied), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# app/db/migrations.py
+"""
+Minimal in-place schema upgrades.
+`Base.metadata.create_all()` only creates missing tables; it never alters an
+existing one, so columns added to models later are applied here (idempotent).
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.logging import logger
+
+# (table, column, column DDL)
+ADDED_COLUMNS: tuple[tuple[str, str, str], ...] = (
+    ("chat_sessions", "summary", "TEXT NULL"),
+    ("chat_sessions", "summary_upto", "DATETIME NULL"),
+)
+
+# (table, index, columns): created if missing
+ADDED_INDEXES: tuple[tuple[str, str, tuple[str, ...]], ...] = (
+    ("chat_history", "ix_chat_history_session_created", ("session_id", "created_at")),
+    ("chat_sessions", "ix_chat_sessions_created", ("created_at", "session_id")),
+)
+
+# (table, index): superseded indexes, dropped after ADDED_INDEXES exist
+DROPPED_INDEXES: tuple[tuple[str, str], ...] = (
+    ("chat_history", "ix_chat_history_session_id"),  # prefix of ix_chat_history_session_created
+)
+
+# surrogate primary keys stored as BINARY(16) when DB_BINARY_IDS=true (MySQL only);
+# none of them is referenced by a foreign key, so they convert in place
+BINARY_ID_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("chat_history", "id"),
+    ("user_product_history", "id"),
+    ("human_flags", "id"),
+)
+
+
+def upgrade(engine: Engine) -> list[str]:
+    """
+    Apply pending column additions. Returns the list of applied steps.
+    """
+    insp = inspect(engine)
+    applied: list[str] = []
+
+    with engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if not insp.has_table(table):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table)}
+            if column in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            applied.append(f"add column {table}.{column}")
+
+    applied.extend(_upgrade_indexes(engine))
+
+    if settings.db_binary_ids and engine.dialect.name == "mysql":
+        applied.extend(convert_ids_to_binary(engine))
+
+    for step in applied:
+        logger.info("Schema upgrade applied: %s", step)
+    return applied
+
+
+def _upgrade_indexes(engine: Engine) -> list[str]:
+    insp = inspect(engine)
+    applied: list[str] = []
+    with engine.begin() as conn:
+        for table, name, columns in ADDED_INDEXES:
+            if not insp.has_table(table):
+                continue
+            if name in {ix["name"] for ix in insp.get_indexes(table)}:
+                continue
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+            applied.append(f"create index {table}.{name}")
+    with engine.begin() as conn:
+        for table, name in DROPPED_INDEXES:
+            if not insp.has_table(table):
+                continue
+            if name not in {ix["name"] for ix in inspect(conn).get_indexes(table)}:
+                continue
+            if engine.dialect.name == "mysql":
+                conn.execute(text(f"DROP INDEX {name} ON {table}"))
+            else:
+                conn.execute(text(f"DROP INDEX {name}"))
+            applied.append(f"drop index {table}.{name}")
+    return applied
+
+
+def convert_ids_to_binary(engine: Engine) -> list[str]:
+    """
+    Rewrite UUID-string ids as BINARY(16), in place (MySQL). Idempotent: tables
+    already converted are skipped. Each table is rebuilt, so run it in a
+    maintenance window on large tables.
+    """
+    insp = inspect(engine)
+    applied: list[str] = []
+    for table, column in BINARY_ID_COLUMNS:
+        if not insp.has_table(table):
+            continue
+        col = next(c for c in insp.get_columns(table) if c["name"] == column)
+        if "BINARY" in str(col["type"]).upper() and getattr(col["type"], "length", None) == 16:
+            continue
+        with engine.begin() as conn:
+            # text -> bytes of the text, then to the 16 raw UUID bytes, then shrink
+            conn.execute(text(f"ALTER TABLE {table} MODIFY {column} VARBINARY(64) NOT NULL"))
+            conn.execute(text(f"UPDATE {table} SET {column} = UNHEX(REPLACE({column}, '-', '')) WHERE LENGTH({column}) = 36"))
+            conn.execute(text(f"ALTER TABLE {table} MODIFY {column} BINARY(16) NOT NULL"))
+        applied.append(f"binary ids {table}.{column}")
+    return applied
@@ -0,0 +1,206 @@
+# app/db/replicas.py
+"""
+Read-replica routing (DATABASE_REPLICA_URLS). `ReadSessionLocal` sessions send
+read-only statements to a replica and everything else to the primary:
+
+  - writes (flushes, INSERT/UPDATE/DELETE) always go to the primary
+  - read-your-writes: once the session, or anything else in the same request
+    (see track_writes), has written a table, reads of that table use the primary
+  - a replica whose lag is unknown or above DB_REPLICA_MAX_LAG_SECONDS is
+    skipped; with no usable replica, reads use the primary
+
+Lag comes from SHOW REPLICA STATUS (MySQL), refreshed in the background every
+DB_REPLICA_LAG_CHECK_SECONDS. Other dialects (a SQLite stand-in) report 0.
+Without replicas a ReadSessionLocal session behaves exactly like SessionLocal.
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Generator, Iterable, Iterator, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.util import find_tables
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.session import engine as primary_engine
+from app.db.session import make_engine
+
+ROUTED = metrics.counter("db_routed_statements_total", "Statements of read/write sessions by target and reason")
+REPLICA_LAG = metrics.gauge("db_replica_lag_seconds", "Last measured replica lag (-1 = unknown)")
+
+_WROTE = "wrote_tables"
+
+
+class _Writes:
+    """Tables written on behalf of one request, from any session or thread."""
+
+    def __init__(self) -> None:
+        self.tables: set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, tables: Iterable[str]) -> None:
+        with self._lock:
+            self.tables.update(tables)
+
+    def touches(self, tables: set[str]) -> bool:
+        with self._lock:
+            return not self.tables.isdisjoint(tables)
+
+
+_request_writes: contextvars.ContextVar[Optional[_Writes]] = contextvars.ContextVar("db_request_writes", default=None)
+
+
+@contextmanager
+def track_writes() -> Iterator[None]:
+    """
+    Read-your-writes scope (one request / chat turn). Stage threads and
+    background tasks inherit the context, so their writes count too.
+    """
+    token = _request_writes.set(_Writes())
+    try:
+        yield
+    finally:
+        _request_writes.reset(token)
+
+
+def _record(session: Session, tables: set[str]) -> None:
+    if not tables:
+        return
+    session.info.setdefault(_WROTE, set()).update(tables)
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.add(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context: Any) -> None:
+    tables = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.update(t.name for t in inspect(obj).mapper.tables)
+    _record(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_dml(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        _record(state.session, {t.name for t in find_tables(state.statement, include_crud=True)})
+
+
+def replica_lag_seconds(conn: Connection) -> Optional[float]:
+    """Seconds behind the primary; None if replication is broken or unreadable."""
+    if conn.dialect.name != "mysql":
+        return 0.0  # stand-ins (SQLite, a second standalone server) do not replicate
+    for statement, column in (
+        ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),  # MySQL 8.0.22+
+        ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+    ):
+        try:
+            row = conn.exec_driver_sql(statement).mappings().first()
+        except DBAPIError:
+            continue
+        if row is None:
+            return 0.0  # not configured as a replica
+        value = row.get(column)
+        return None if value is None else float(value)  # NULL: the SQL thread is stopped
+    return None
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine) -> None:
+        self.name = name
+        self.engine = engine
+        self.lag: Optional[float] = None  # unknown until the first check: not used
+        self._checked = float("-inf")
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def usable(self) -> bool:
+        self._maybe_refresh()
+        lag = self.lag
+        return lag is not None and lag <= settings.db_replica_max_lag_seconds
+
+    def _maybe_refresh(self) -> None:
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._checked < settings.db_replica_lag_check_seconds:
+                return
+            self._refreshing = True
+        # never on the request path: the request uses the last known lag
+        threading.Thread(target=self.refresh, name=f"replica-lag-{self.name}", daemon=True).start()
+
+    def refresh(self) -> None:
+        lag: Optional[float] = None
+        try:
+            with self.engine.connect() as conn:
+                lag = replica_lag_seconds(conn)
+        except Exception:
+            logger.warning("Replica %s lag check failed; reads use the primary", self.name, exc_info=True)
+        with self._lock:
+            self.lag = lag
+            self._checked = time.monotonic()
+            self._refreshing = False
+        REPLICA_LAG.set(-1 if lag is None else lag, replica=self.name)
+
+    def reset_after_fork(self) -> None:
+        self.engine.dispose(close=False)
+        self._lock = threading.Lock()
+        self._refreshing = False  # a check running in the parent has no thread here
+
+
+replicas: list[Replica] = [
+    Replica(str(i), make_engine(url, name=f"replica{i}")) for i, url in enumerate(settings.database_replica_urls)
+]
+
+
+def _reset_after_fork() -> None:
+    for replica in replicas:
+        replica.reset_after_fork()
+
+
+if replicas and hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Engine:
+        if not replicas:
+            return primary_engine
+        if self._flushing or isinstance(clause, UpdateBase):
+            ROUTED.inc(target="primary", reason="write")
+            return primary_engine
+
+        tables = {t.name for t in find_tables(clause)} if clause is not None else set()
+        if not tables and mapper is not None:
+            tables = {t.name for t in inspect(mapper).tables}
+        writes = _request_writes.get()
+        if not tables or not self.info.get(_WROTE, set()).isdisjoint(tables) or (writes and writes.touches(tables)):
+            ROUTED.inc(target="primary", reason="read_your_writes" if tables else "unknown_tables")
+            return primary_engine
+
+        usable = [r for r in replicas if r.usable()]
+        if not usable:
+            ROUTED.inc(target="primary", reason="replica_lag")
+            return primary_engine
+        ROUTED.inc(target="replica", reason="read")
+        return random.choice(usable).engine
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
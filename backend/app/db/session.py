@@ -1,12 +1,16 @@
 # app/db/session.py
 from __future__ import annotations
 
-from typing import Any, Generator
+import os
+from typing import Any, Generator, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.core.logging import logger
+from app.db.instrumentation import instrument_engine
 
 DATABASE_URL = settings.database_url
 if not DATABASE_URL:
@@ -16,20 +20,60 @@ if not DATABASE_URL:
         f"@{settings.mysql_host}:{settings.mysql_port}/{settings.mysql_db}"
     )
 
-connect_args: dict[str, Any] = {
-    "connect_timeout": 30,
-    "charset": "utf8mb4",
-}
-
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=5,
-    max_overflow=10,
-    echo=settings.sql_echo,
-    connect_args=connect_args,
-)
+
+def pool_limits(workers: int, max_connections: int, pool_size: int, max_overflow: int) -> tuple[int, int]:
+    """
+    (pool_size, max_overflow) for one worker process, so that `workers` full
+    pools stay within `max_connections`. The steady pool is filled first.
+    """
+    share = max_connections // max(1, workers)
+    if share < 1:
+        logger.warning(
+            "DB_MAX_CONNECTIONS=%d is below WEB_CONCURRENCY=%d; using one connection per worker.",
+            max_connections,
+            workers,
+        )
+        share = 1
+    size = max(1, min(pool_size, share))
+    return size, max(0, min(max_overflow, share - size))
+
+
+def make_engine(url: str, name: Optional[str] = None) -> Engine:
+    """An instrumented engine with this worker's pool limits (primary or replica)."""
+    engine_kwargs: dict[str, Any]
+    if url.startswith("sqlite"):
+        # local runs / benchmarks only; the app targets MySQL
+        engine_kwargs = {"connect_args": {"check_same_thread": False}}
+    else:
+        pool_size, max_overflow = pool_limits(
+            settings.web_concurrency, settings.db_max_connections, settings.db_pool_size, settings.db_max_overflow
+        )
+        engine_kwargs = {
+            "pool_pre_ping": True,
+            "pool_recycle": 3600,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "connect_args": {
+                "connect_timeout": 30,
+                "charset": "utf8mb4",
+            },
+        }
+    new_engine = create_engine(url, echo=settings.sql_echo, **engine_kwargs)
+    instrument_engine(new_engine, name)
+    return new_engine
+
+
+engine = make_engine(DATABASE_URL)
+
+
+def _reset_pool_after_fork() -> None:
+    # a forked worker (gunicorn --preload) must not reuse the parent's pooled
+    # sockets: drop them without closing, the parent still owns them
+    engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import anyio.to_thread
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
+from app import IMPORT_STARTED
+from app.core import metrics
 from app.core.config import settings
-from app.db import Base, engine
+from app.core.logging import logger
+from app.core.tracing import request_trace
+from app.db import engine
+from app.db.instrumentation import debug_headers, report_request, track_queries
+from app.db.migrate import migrate
+from app.db.replicas import track_writes
 
 from app import models as _models # noqa: F401 # pyright: ignore[reportUnusedImport]
 
@@ -12,10 +26,46 @@ from app.api.routers.chat import router as chat_router
 from app.api.routers.history import router as history_router
 
 from app.api.routers.support import router as support_router
+from app.api.routers.metrics import router as metrics_router
+from app.api.routers.health import router as health_router
+from app.services.gemini_scheduler import check_thread_budget
+from app.services.warmup import mark_not_ready, mark_ready, warm_up
+
+STARTUP_SECONDS = metrics.gauge("app_startup_seconds", "Worker cold start by phase (import, startup, warmup)")
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+STARTUP_SECONDS.set(IMPORT_SECONDS, phase="import")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # no DDL at import: the schema is created here, or by `python -m app.db.migrate`
+    started = time.perf_counter()
+    check_thread_budget(anyio.to_thread.current_default_thread_limiter().total_tokens)
+    if settings.startup_create_schema:
+        await run_in_threadpool(migrate, engine)
+    startup = time.perf_counter() - started
+    STARTUP_SECONDS.set(startup, phase="startup")
+    logger.info(
+        "Worker started: import %.3fs, startup %.3fs (schema %s)",
+        IMPORT_SECONDS,
+        startup,
+        "checked" if settings.startup_create_schema else "skipped",
+    )
+    # warm up after the port opens: /healthz answers, /readyz turns 200 when done
+    warmup = asyncio.create_task(_warm_up()) if settings.warmup_enabled else None
+    if warmup is None:
+        mark_ready()
+    yield
+    mark_not_ready("stopping")
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+
 
-app = FastAPI(title="Product Chatbot API")
+async def _warm_up() -> None:
+    STARTUP_SECONDS.set(await run_in_threadpool(warm_up, engine), phase="warmup")
 
-Base.metadata.create_all(bind=engine)
+
+app = FastAPI(title="Product Chatbot API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,8 +75,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with request_trace("http.request", http_method=request.method) as root, track_queries() as queries, track_writes():
+        response = await call_next(request)
+        route = getattr(request.scope.get("route"), "path", None)
+        report_request(queries, route or "unmatched")  # templated path keeps label cardinality bounded
+        if root is not None:
+            root.set_attribute("http_route", route or request.url.path)
+            root.set_attribute("http_status", response.status_code)
+            root.set_attribute("db_queries", queries.count)
+            root.set_attribute("db_time_ms", round(queries.seconds * 1000, 3))
+        if settings.debug:
+            response.headers.update(debug_headers(queries))
+        return response
+
+
 app.include_router(products_router)
 app.include_router(sessions_router)
 app.include_router(support_router)
 app.include_router(chat_router)
-app.include_router(history_router)
\ No newline at end of file
+app.include_router(history_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
\ No newline at end of file
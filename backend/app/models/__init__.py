@@ -1,5 +1,6 @@
 from app.models.product import Product
 from app.models.chat import ChatSession, ChatHistory, UserProductHistory
+from app.models.chat_archive import ChatArchiveEntry
 from app.models.human_flag import HumanFlag
 
-__all__ = ["Product", "ChatSession", "ChatHistory", "UserProductHistory", "HumanFlag"]
\ No newline at end of file
+__all__ = ["Product", "ChatSession", "ChatHistory", "UserProductHistory", "ChatArchiveEntry", "HumanFlag"]
\ No newline at end of file
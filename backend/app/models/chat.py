@@ -1,26 +1,33 @@
 # app/models/chat.py
 from __future__ import annotations
 
-import uuid
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
+from app.db.ids import UuidKey, new_id
 
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    # retention: trim_chat_sessions pages oldest first, lazy_session_retired counts newer sessions
+    __table_args__ = (Index("ix_chat_sessions_created", "created_at", "session_id"),)
 
     session_id: Mapped[str] = mapped_column(
         String(64),
         primary_key=True,
         index=True,
-        default=lambda: str(uuid.uuid4()),
+        default=new_id,
     )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # rolling summary of messages up to (and including) `summary_upto`
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summary_upto: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
     messages: Mapped[list["ChatHistory"]] = relationship(
         "ChatHistory", back_populates="session", cascade="all, delete-orphan"
     )
@@ -31,13 +38,15 @@ class ChatSession(Base):
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # every history read is "WHERE session_id = ? ORDER BY created_at"; this also
+    # serves the session_id foreign key, so no separate session_id index
+    __table_args__ = (Index("ix_chat_history_session_created", "session_id", "created_at"),)
 
-    id: Mapped[str] = mapped_column(String(64), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(UuidKey, primary_key=True, default=new_id)
     session_id: Mapped[str] = mapped_column(
         String(64),
         ForeignKey("chat_sessions.session_id"),
         nullable=False,
-        index=True,
     )
     role: Mapped[str] = mapped_column(String(20), nullable=False)
     message: Mapped[str] = mapped_column(Text, nullable=False)
@@ -50,7 +59,7 @@ class UserProductHistory(Base):
     """store products viewed or interacted by the user in a chat session"""
     __tablename__ = "user_product_history"
 
-    id: Mapped[str] = mapped_column(String(64), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(UuidKey, primary_key=True, default=new_id)
     session_id: Mapped[str] = mapped_column(
         String(64),
         ForeignKey("chat_sessions.session_id"),
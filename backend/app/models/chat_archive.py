@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ChatArchiveEntry(Base):
+    """one archived segment's rows of one session (see app/services/chat_archive.py)"""
+    __tablename__ = "chat_archive_index"
+    # no foreign key: the session row is usually gone by the time anyone reads this
+    __table_args__ = (Index("ix_chat_archive_index_session_table", "session_id", "table_name"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    session_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    # chat_history | user_product_history | human_flags
+    table_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    # relative to CHAT_ARCHIVE_DIR
+    segment: Mapped[str] = mapped_column(String(255), nullable=False)
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import uuid
 from datetime import datetime
 from typing import Optional
 
@@ -8,12 +7,13 @@ from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
+from app.db.ids import UuidKey, new_id
 
 
 class HumanFlag(Base):
     __tablename__ = "human_flags"
 
-    id: Mapped[str] = mapped_column(String(64), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(UuidKey, primary_key=True, default=new_id)
     session_id: Mapped[str] = mapped_column(
         String(64),
         ForeignKey("chat_sessions.session_id"),
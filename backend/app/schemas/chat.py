@@ -1,25 +1,26 @@
 # app/schemas/chat.py
 from datetime import datetime
 from typing import Optional
-import uuid
 
 from pydantic import BaseModel, Field, field_validator
 
+from app.core.session_tokens import is_valid_session_id
+
 
 class CreateSessionResponse(BaseModel):
-    session_id: str = Field(..., description="UUID string for the chat session")
+    session_id: str = Field(..., description="Chat session id (UUID, or a signed token with LAZY_SESSIONS)")
 
 
 class ChatRequest(BaseModel):
-    session_id: str = Field(..., description="UUID string for the chat session")
+    session_id: str = Field(..., description="Chat session id from /create_session")
     message: str = Field(..., min_length=1, max_length=1000)
+    # same id on a retry => the stored reply is returned (the Idempotency-Key header works too)
+    client_message_id: Optional[str] = Field(None, min_length=1, max_length=128)
 
     @field_validator("session_id")
-    def validate_uuid(cls, value: str) -> str:
-        try:
-            uuid.UUID(value)
-        except ValueError as exc:
-            raise ValueError("session_id must be a valid UUID string") from exc
+    def validate_session_id(cls, value: str) -> str:
+        if not is_valid_session_id(value):
+            raise ValueError("session_id must be a UUID or a session token from /create_session")
         return value
 
 
@@ -0,0 +1,309 @@
+# app/services/analytics_export.py
+"""
+Incremental columnar export of chat_history, user_product_history and
+human_flags, so heavy analytics run on files instead of the OLTP database.
+Run it from cron (or by hand) as often as you like:
+
+    cd backend && python -m app.services.analytics_export
+    cd backend && python -m app.services.analytics_export --tables chat_history --format ndjson
+
+Per table, rows are read in (watermark, id) keyset order, ANALYTICS_EXPORT_BATCH_ROWS
+at a time, through a ReadSessionLocal session (a read replica when configured), and
+written to
+
+    ANALYTICS_EXPORT_DIR/<table>/dt=<YYYY-MM-DD>/part-<first watermark>-<first id>.parquet
+
+Parquet (zstd) needs the optional `pyarrow` package; without it files are compressed
+NDJSON as in the archive tier. A file holds at most ANALYTICS_EXPORT_FILE_ROWS rows of
+one day; memory use is one batch. The watermark is created_at, except for human_flags,
+whose rows change after insert: updated_at, so a changed flag is exported again (the
+newest row per id wins). Rows trimmed before an export ran are in the archive tier
+(CHAT_ARCHIVE_DIR), not here.
+
+ANALYTICS_EXPORT_DIR/_checkpoints/<table>.json holds the last exported (watermark, id).
+It advances only after a file is complete and renamed into place, so a run that dies
+resumes from the last complete file and rewrites the same-named file. Rows younger
+than ANALYTICS_EXPORT_LAG_SECONDS are left for the next run: a transaction that commits
+late, or a replica still catching up, cannot slip in behind the watermark.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, Optional, Sequence
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric, Table, and_, or_, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.replicas import ReadSessionLocal
+from app.models import ChatHistory, HumanFlag, UserProductHistory
+from app.services.chat_archive import SEGMENT_SUFFIX, json_default, segment_writer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no protection against overlapping runs
+    fcntl = None
+
+# table -> (model, watermark column)
+EXPORT_TABLES = {
+    "chat_history": (ChatHistory, "created_at"),
+    "user_product_history": (UserProductHistory, "created_at"),
+    "human_flags": (HumanFlag, "updated_at"),
+}
+
+
+@dataclass
+class Checkpoint:
+    watermark: Optional[str] = None  # ISO timestamp of the last exported row
+    last_id: Optional[str] = None
+    rows: int = 0
+    files: int = 0
+
+
+def _checkpoint_path(root: str, table: str) -> str:
+    return os.path.join(root, "_checkpoints", f"{table}.json")
+
+
+def load_checkpoint(root: str, table: str) -> Checkpoint:
+    try:
+        with open(_checkpoint_path(root, table), encoding="utf-8") as fh:
+            return Checkpoint(**json.load(fh))
+    except FileNotFoundError:
+        return Checkpoint()
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_checkpoint(root: str, table: str, checkpoint: Checkpoint) -> None:
+    path = _checkpoint_path(root, table)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(asdict(checkpoint), fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _run_lock(root: str) -> Iterator[None]:
+    """One export at a time per directory (cron runs may overlap)."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.join(root, "_checkpoints"), exist_ok=True)
+    with open(os.path.join(root, "_checkpoints", ".lock"), "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SystemExit(f"another export is running in {root}") from None
+        yield
+
+
+def _arrow_type(column: Any) -> Any:
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, (Float, Numeric)):
+        return pyarrow.float64()
+    return pyarrow.string()  # String, Text, UuidKey
+
+
+class _ParquetPart:
+    suffix = ".parquet"
+
+    def __init__(self, path: str, table: Table) -> None:
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._schema = pyarrow.schema([(c.name, _arrow_type(c)) for c in table.columns])
+        self._writer = pyarrow.parquet.ParquetWriter(self._tmp, self._schema, compression="zstd")
+
+    def write(self, rows: Sequence[Row]) -> None:
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(self._schema.names)}
+        self._writer.write_batch(pyarrow.RecordBatch.from_pydict(columns, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+        _fsync(self._tmp)
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._writer.close()
+        os.remove(self._tmp)
+
+
+class _NdjsonPart:
+    suffix = SEGMENT_SUFFIX
+
+    def __init__(self, path: str, table: Table) -> None:
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._names = [c.name for c in table.columns]
+        self._stack = ExitStack()
+        self._out = self._stack.enter_context(segment_writer(self._tmp))
+
+    def write(self, rows: Sequence[Row]) -> None:
+        for row in rows:
+            record = dict(zip(self._names, row))
+            self._out.write(json.dumps(record, default=json_default, ensure_ascii=False).encode("utf-8"))
+            self._out.write(b"\n")
+
+    def close(self) -> None:
+        self._stack.close()  # flushes and fsyncs
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._stack.close()
+        os.remove(self._tmp)
+
+
+def _part_name(watermark: datetime, row_id: Any) -> str:
+    return f"part-{watermark:%Y%m%dT%H%M%S%f}-{row_id}"
+
+
+def export_table(
+    db: Session,
+    root: str,
+    name: str,
+    fmt: str = "parquet",
+    batch_rows: int = 5000,
+    file_rows: int = 1_000_000,
+    lag_seconds: float = 60.0,
+) -> int:
+    """Export `name`'s rows past its checkpoint. Returns the number of rows exported."""
+    model, watermark_name = EXPORT_TABLES[name]
+    table = model.__table__
+    watermark_col, id_col = table.c[watermark_name], table.c.id
+    wm_index = list(table.columns).index(watermark_col)
+    id_index = list(table.columns).index(id_col)
+    part_cls = _ParquetPart if fmt == "parquet" else _NdjsonPart
+
+    checkpoint = load_checkpoint(root, name)
+    last_wm = datetime.fromisoformat(checkpoint.watermark) if checkpoint.watermark else None
+    last_id = checkpoint.last_id
+    upper = datetime.utcnow() - timedelta(seconds=lag_seconds)
+
+    part: Any = None
+    part_day: Optional[date] = None
+    part_rows = 0
+    chunk: list[Row] = []
+    exported = 0
+
+    def finish_part() -> None:
+        nonlocal part
+        part.write(chunk)
+        chunk.clear()
+        part.close()
+        part = None
+        checkpoint.watermark, checkpoint.last_id = last_wm.isoformat(), str(last_id)
+        checkpoint.files += 1
+        checkpoint.rows += part_rows
+        save_checkpoint(root, name, checkpoint)
+
+    try:
+        while True:
+            query = select(*table.columns).where(watermark_col < upper)
+            if last_wm is not None:
+                query = query.where(
+                    or_(watermark_col > last_wm, and_(watermark_col == last_wm, id_col > last_id))
+                )
+            rows = db.execute(query.order_by(watermark_col, id_col).limit(batch_rows)).all()
+            db.commit()  # no transaction (or replica snapshot) held between batches
+            if not rows:
+                break
+
+            for row in rows:
+                day = row[wm_index].date()
+                if part is not None and (day != part_day or part_rows >= file_rows):
+                    finish_part()
+                if part is None:
+                    directory = os.path.join(root, name, f"dt={day:%Y-%m-%d}")
+                    os.makedirs(directory, exist_ok=True)
+                    filename = _part_name(row[wm_index], row[id_index]) + part_cls.suffix
+                    part = part_cls(os.path.join(directory, filename), table)
+                    part_day, part_rows = day, 0
+                chunk.append(row)
+                part_rows += 1
+                last_wm, last_id = row[wm_index], row[id_index]
+            exported += len(rows)
+
+            part.write(chunk)  # memory stays at one batch
+            chunk.clear()
+            if len(rows) < batch_rows:
+                break
+        if part is not None:
+            finish_part()
+    except BaseException:
+        if part is not None:
+            part.abort()  # the checkpoint still points at the last complete file
+        raise
+    return exported
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=settings.analytics_export_dir, help="default: ANALYTICS_EXPORT_DIR")
+    parser.add_argument("--tables", default=",".join(EXPORT_TABLES), help="comma-separated subset")
+    parser.add_argument("--format", choices=("auto", "parquet", "ndjson"), default="auto")
+    args = parser.parse_args(argv)
+
+    if not args.dir:
+        raise SystemExit("set ANALYTICS_EXPORT_DIR or pass --dir")
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = sorted(set(tables) - set(EXPORT_TABLES))
+    if unknown:
+        raise SystemExit(f"unknown table(s): {', '.join(unknown)}")
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "parquet" if pyarrow is not None else "ndjson"
+    if fmt == "parquet" and pyarrow is None:
+        raise SystemExit("--format parquet needs the pyarrow package")
+
+    with _run_lock(args.dir):
+        for name in tables:
+            started = time.perf_counter()
+            db = ReadSessionLocal()
+            try:
+                exported = export_table(
+                    db,
+                    args.dir,
+                    name,
+                    fmt=fmt,
+                    batch_rows=settings.analytics_export_batch_rows,
+                    file_rows=settings.analytics_export_file_rows,
+                    lag_seconds=settings.analytics_export_lag_seconds,
+                )
+            finally:
+                db.close()
+            checkpoint = load_checkpoint(args.dir, name)
+            logger.info(
+                "Exported %s: %d rows in %.2fs (%s, watermark %s)",
+                name, exported, time.perf_counter() - started, fmt, checkpoint.watermark,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# app/services/chat_archive.py
+"""
+Archive tier for rows evicted by the retention trims (chat_maintenance). With
+CHAT_ARCHIVE_DIR set, the rows are streamed into a compressed NDJSON segment
+before the bulk delete:
+
+    CHAT_ARCHIVE_DIR/<table>/dt=<YYYY-MM-DD>/<uuid7>.ndjson.zst    (.gz without `zstandard`)
+
+partitioned by eviction day, one JSON object per row (column name -> value).
+chat_archive_index gets one row per (segment, session) with the row count and
+created_at range, so GET /history reads only the segments of its session.
+The sweep that archived a session's rows merges its segments into one once it
+has CHAT_ARCHIVE_COMPACT_SEGMENTS of them (compact_sessions).
+
+Order of work: segment written to a temp file, fsynced and renamed; index rows
+added; the caller deletes the rows and commits index and delete together. A
+failure before the commit leaves at most an unindexed segment (ignored by
+readers), never deleted rows without an archive.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+from contextlib import contextmanager, suppress
+from datetime import date, datetime
+from typing import IO, Any, Iterable, Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.ids import new_id
+from app.models import ChatArchiveEntry
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    if settings.chat_archive_dir:
+        logger.warning("CHAT_ARCHIVE_DIR is set but zstandard is not installed; archive segments use gzip.")
+
+ARCHIVED_ROWS = metrics.counter("chat_archive_rows_total", "Rows written to archive segments before deletion")
+ARCHIVE_SEGMENTS = metrics.counter("chat_archive_segments_total", "Archive segment files written")
+ARCHIVE_BYTES = metrics.counter("chat_archive_bytes_total", "Compressed bytes written to archive segments")
+ARCHIVE_COMPACTIONS = metrics.counter("chat_archive_compactions_total", "Sessions whose archive segments were merged into one")
+ARCHIVE_READS = metrics.counter("chat_archive_segment_reads_total", "Archive segments read back (result=ok|missing|error)")
+
+SEGMENT_SUFFIX = ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+
+_BATCH = 1000  # rows fetched per round trip while streaming
+
+
+def archive_enabled() -> bool:
+    return bool(settings.chat_archive_dir)
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+@contextmanager
+def segment_writer(path: str) -> Iterator[IO[bytes]]:
+    with open(path, "wb") as raw:
+        if path.removesuffix(".tmp").endswith(".zst"):
+            out = zstandard.ZstdCompressor(level=settings.chat_archive_zstd_level).stream_writer(raw, closefd=False)
+        else:
+            out = gzip.GzipFile(fileobj=raw, mode="wb")
+        with out:
+            yield out
+        raw.flush()
+        os.fsync(raw.fileno())  # the rows are deleted right after
+
+
+def _read_segment(path: str) -> Iterator[dict[str, Any]]:
+    with open(path, "rb") as raw:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"{path} needs the zstandard package")
+            stream = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8")
+        else:
+            stream = io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="rb"), encoding="utf-8")
+        with stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+def _new_segment(table: str) -> str:
+    return os.path.join(table, f"dt={datetime.utcnow():%Y-%m-%d}", f"{new_id()}{SEGMENT_SUFFIX}")
+
+
+def _write_segment(table: str, records: Iterable[dict[str, Any]]) -> tuple[Optional[str], dict[str, list[Any]], int]:
+    """
+    Write `records` (ordered by session_id, created_at) to a new segment.
+    Returns (segment, session_id -> [rows, first created_at, last created_at],
+    compressed size); segment is None when there were no records.
+    """
+    segment = _new_segment(table)
+    path = os.path.join(settings.chat_archive_dir, segment)
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    sessions: dict[str, list[Any]] = {}
+    try:
+        with segment_writer(tmp) as out:
+            for record in records:
+                out.write(json.dumps(record, default=json_default, ensure_ascii=False).encode("utf-8"))
+                out.write(b"\n")
+                stats = sessions.get(record["session_id"])
+                if stats is None:
+                    sessions[record["session_id"]] = [1, record["created_at"], record["created_at"]]
+                else:
+                    stats[0] += 1
+                    stats[2] = record["created_at"]
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+    if not sessions:
+        os.remove(tmp)
+        return None, sessions, 0
+    size = os.path.getsize(tmp)
+    os.replace(tmp, path)
+    return segment, sessions, size
+
+
+def _index(db: Session, table: str, segment: str, sessions: dict[str, list[Any]]) -> list[ChatArchiveEntry]:
+    entries = [
+        ChatArchiveEntry(
+            session_id=session_id,
+            table_name=table,
+            segment=segment,
+            row_count=count,
+            first_created_at=first,
+            last_created_at=last,
+        )
+        for session_id, (count, first, last) in sessions.items()
+    ]
+    db.add_all(entries)
+    return entries
+
+
+def archive_query(db: Session, query: Query) -> int:
+    """
+    Stream the rows of `query` (a query of one model with a session_id and a
+    created_at column, e.g. delete_before_query) into a new segment and index
+    it in `db`. Not committed: the caller deletes the same rows and commits.
+    Returns the number of rows archived (0 = no segment written).
+    """
+    table = query.column_descriptions[0]["entity"].__table__
+    rows = (
+        query.with_entities(*table.columns)
+        .order_by(None)
+        .order_by(table.c.session_id, table.c.created_at)
+        .yield_per(_BATCH)
+    )
+
+    segment, sessions, size = _write_segment(table.name, (row._asdict() for row in rows))
+    if segment is None:
+        return 0
+    _index(db, table.name, segment, sessions)
+
+    archived = sum(stats[0] for stats in sessions.values())
+    ARCHIVED_ROWS.inc(archived, table=table.name)
+    ARCHIVE_SEGMENTS.inc(table=table.name)
+    ARCHIVE_BYTES.inc(size, table=table.name)
+    logger.info("Archived %d %s rows of %d sessions to %s", archived, table.name, len(sessions), segment)
+    return archived
+
+
+def _entries(db: Session, session_id: str, table: str) -> list[ChatArchiveEntry]:
+    return (
+        db.query(ChatArchiveEntry)
+        .filter(ChatArchiveEntry.session_id == session_id, ChatArchiveEntry.table_name == table)
+        .order_by(ChatArchiveEntry.first_created_at)
+        .all()
+    )
+
+
+def _load(segments: Iterable[str], session_id: str, strict: bool) -> tuple[list[dict[str, Any]], bool]:
+    """Rows of `session_id` from `segments`, oldest first; True if a segment was missing."""
+    rows: list[dict[str, Any]] = []
+    missing = False
+    for segment in segments:
+        path = os.path.join(settings.chat_archive_dir, segment)
+        try:
+            rows.extend(r for r in _read_segment(path) if r.get("session_id") == session_id)
+        except FileNotFoundError:
+            if strict:
+                raise
+            ARCHIVE_READS.inc(result="missing")
+            missing = True
+            continue
+        except Exception:
+            if strict:
+                raise
+            ARCHIVE_READS.inc(result="error")
+            logger.warning("Archive segment %s is unreadable (session=%s)", segment, session_id, exc_info=True)
+            continue
+        ARCHIVE_READS.inc(result="ok")
+
+    for row in rows:
+        if row.get("created_at"):
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+    rows.sort(key=lambda r: r.get("created_at") or datetime.min)
+    return rows, missing
+
+
+def archived_rows(db: Session, session_id: str, table: str = "chat_history") -> list[dict[str, Any]]:
+    """
+    This session's archived rows of `table`, oldest first. created_at comes back
+    as a datetime; other values as stored (ids as strings). A missing or
+    unreadable segment is logged and skipped.
+    """
+    segments = [e.segment for e in _entries(db, session_id, table)]
+    rows, missing = _load(segments, session_id, strict=False)
+    if missing:
+        # most likely compacted away since the index read: read the new index once
+        db.rollback()
+        retry = [e.segment for e in _entries(db, session_id, table)]
+        if retry != segments:
+            rows, missing = _load(retry, session_id, strict=False)
+    if missing:
+        logger.warning("Archive segment(s) missing for session=%s", session_id)
+    return rows
+
+
+def compact_sessions(db: Session, session_ids: Iterable[str], table: str = "chat_history") -> int:
+    """
+    Rewrite the archive of every session in `session_ids` that is spread over
+    CHAT_ARCHIVE_COMPACT_SEGMENTS or more segments into a single segment, so
+    GET /history opens one file per session. Segments no longer referenced by
+    any index row are deleted after the commit. Returns the sessions compacted.
+    """
+    min_segments = settings.chat_archive_compact_segments
+    if min_segments <= 1:
+        return 0
+    candidates = [
+        session_id
+        for (session_id,) in db.query(ChatArchiveEntry.session_id)
+        .filter(ChatArchiveEntry.session_id.in_(list(session_ids)), ChatArchiveEntry.table_name == table)
+        .group_by(ChatArchiveEntry.session_id)
+        .having(func.count(ChatArchiveEntry.id) >= min_segments)
+    ]
+
+    compacted = 0
+    for session_id in candidates:
+        try:
+            compacted += _compact(db, session_id, table)
+        except Exception:
+            db.rollback()
+            logger.warning("Archive compaction failed session=%s", session_id, exc_info=True)
+    return compacted
+
+
+def _compact(db: Session, session_id: str, table: str) -> bool:
+    entries = _entries(db, session_id, table)
+    old = {e.segment for e in entries}
+    rows, _ = _load(old, session_id, strict=True)  # never drop rows we could not read
+    segment, sessions, size = _write_segment(table, rows)
+    if segment is None:
+        return False
+    removed = (
+        db.query(ChatArchiveEntry)
+        .filter(ChatArchiveEntry.id.in_([e.id for e in entries]))
+        .delete(synchronize_session=False)
+    )
+    if removed != len(entries):  # compacted concurrently by another worker
+        db.rollback()
+        os.remove(os.path.join(settings.chat_archive_dir, segment))
+        return False
+    for entry in entries:
+        db.expunge(entry)  # deleted in bulk; their ids may be reused by the new rows
+    _index(db, table, segment, sessions)
+    db.commit()
+    ARCHIVE_SEGMENTS.inc(table=table)
+    ARCHIVE_BYTES.inc(size, table=table)
+    ARCHIVE_COMPACTIONS.inc(table=table)
+
+    still_used = {s for (s,) in db.query(ChatArchiveEntry.segment).filter(ChatArchiveEntry.segment.in_(old)).distinct()}
+    for unused in old - still_used:
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(settings.chat_archive_dir, unused))
+    logger.info("Compacted %d archive segments of session=%s into %s", len(old), session_id, segment)
+    return True
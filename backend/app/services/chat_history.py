@@ -0,0 +1,67 @@
+# app/services/chat_history.py
+"""
+Every chat_history read filters by session_id and orders by created_at, so all of
+them are served by the composite index ix_chat_history_session_created (no
+filesort). bench/explain_plans.py checks these exact queries with EXPLAIN.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Query, Session
+
+from app.models import ChatHistory
+
+SESSION_CREATED_INDEX = "ix_chat_history_session_created"
+
+
+def session_history_query(db: Session, session_id: str) -> Query:
+    """Whole conversation, oldest first (GET /history)."""
+    return (
+        db.query(ChatHistory)
+        .filter(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.created_at.asc())
+    )
+
+
+def recent_messages_query(db: Session, session_id: str, limit: int) -> Query:
+    """Newest `limit` messages, newest first: a short backward index range scan."""
+    return (
+        db.query(ChatHistory)
+        .filter(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.created_at.desc())
+        .limit(limit)
+    )
+
+
+def messages_after_query(db: Session, session_id: str, after: datetime | None) -> Query:
+    """Messages newer than `after` (all if None), oldest first."""
+    q = db.query(ChatHistory).filter(ChatHistory.session_id == session_id)
+    if after is not None:
+        q = q.filter(ChatHistory.created_at > after)
+    return q.order_by(ChatHistory.created_at.asc())
+
+
+def cap_boundary_query(db: Session, session_id: str, keep: int) -> Query:
+    """
+    created_at of the `keep`-th and (`keep`+1)-th newest messages: a two-row
+    index-only probe. A second row means the session is over the cap.
+    """
+    return (
+        db.query(ChatHistory.created_at)
+        .filter(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.created_at.desc())
+        .offset(keep - 1)
+        .limit(2)
+    )
+
+
+def delete_before_query(db: Session, session_id: str, cutoff: datetime) -> Query:
+    return db.query(ChatHistory).filter(ChatHistory.session_id == session_id, ChatHistory.created_at < cutoff)
+
+
+def recent_messages(db: Session, session_id: str, limit: int) -> list[ChatHistory]:
+    """Newest `limit` messages in chronological order."""
+    rows = recent_messages_query(db, session_id, limit).all()
+    rows.reverse()
+    return rows
@@ -1,64 +1,277 @@
 # app/services/chat_maintenance.py
 from __future__ import annotations
 
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
+from app.core import metrics
+from app.core.config import settings
 from app.core.logging import logger
-from app.models import ChatHistory, ChatSession, HumanFlag
+from app.db.instrumentation import background_job
+from app.db.session import SessionLocal
+from app.models import ChatHistory, ChatSession, HumanFlag, UserProductHistory
+from app.services.chat_archive import archive_enabled, archive_query, compact_sessions
+from app.services.chat_history import cap_boundary_query, delete_before_query
+from app.services.session_cache import invalidate_sessions
+
+HISTORY_TRIMS = metrics.counter("chat_history_trims_total", "Chat history trim work by step (probe, queued, sweep, deleted_rows)")
 
+# sessions deleted per transaction by trim_chat_sessions
+SESSION_TRIM_BATCH = 500
 
-def trim_chat_history(db: Session, session_id: str, max_messages: int = 50) -> None:
+
+class _SweepLatch:
     """
-    Keep only latest `max_messages` rows in chat_history for this session.
+    Lets one background sweep be scheduled at a time. A BackgroundTasks run can be
+    dropped (client disconnect, shutdown), so a sweep that never ran is re-armed
+    after SWEEP_REARM_SECONDS. Used under _pending_lock.
+    """
+
+    def __init__(self) -> None:
+        self.scheduled_at: Optional[float] = None
+
+    def arm(self) -> bool:
+        now = time.monotonic()
+        if self.scheduled_at is not None and now - self.scheduled_at < SWEEP_REARM_SECONDS:
+            return False
+        self.scheduled_at = now
+        return True
+
+    def release(self) -> None:
+        self.scheduled_at = None  # work queued from now on schedules the next sweep
+
+
+SWEEP_REARM_SECONDS = 30.0
+_pending_lock = threading.Lock()
+
+# sessions found over the cap, waiting for the next background sweep
+_pending_trims: set[str] = set()
+_history_sweep = _SweepLatch()
+
+# session retention for the next sweep: smallest requested cap, sessions in use
+_session_trim_cap: Optional[int] = None
+_session_trim_keep: set[str] = set()
+_session_sweep = _SweepLatch()
+
+
+def _trim_cutoff(db: Session, session_id: str, max_messages: int) -> Optional[datetime]:
+    """created_at of the `max_messages`-th newest row if the session is over the cap, else None."""
+    rows = cap_boundary_query(db, session_id, keep=max_messages).all()
+    return rows[0][0] if len(rows) == 2 else None
+
+
+def history_needs_trim(
+    db: Session,
+    session_id: str,
+    max_messages: int = 50,
+    known_count: Optional[int] = None,
+    slack: Optional[int] = None,
+) -> bool:
+    """
+    Cheap over-cap check: True once the session holds more than `max_messages`
+    + `slack` (CHAT_HISTORY_TRIM_SLACK) rows; the trim then goes back down to
+    `max_messages`, so a session is swept once per `slack` messages. Pass
+    `known_count` when the caller already loaded the whole session (e.g. the
+    chat context query returned fewer rows than its limit): then no query runs.
     """
     if max_messages <= 0:
-        return
+        return False
+    limit = max_messages + max(0, settings.chat_history_trim_slack if slack is None else slack)
+    if known_count is not None:
+        return known_count > limit
+    HISTORY_TRIMS.inc(step="probe")
+    return _trim_cutoff(db, session_id, limit) is not None
 
-    # get ids to delete (older than newest max_messages)
-    old_ids = (
-        db.query(ChatHistory.id)
-        .filter(ChatHistory.session_id == session_id)
-        .order_by(ChatHistory.created_at.desc())
-        .offset(max_messages)
-        .all()
-    )
-    if not old_ids:
-        return
 
-    old_ids_list = [row[0] for row in old_ids]
-    db.query(ChatHistory).filter(ChatHistory.id.in_(old_ids_list)).delete(synchronize_session=False)
+def trim_chat_history(db: Session, session_id: str, max_messages: int = 50) -> int:
+    """
+    Keep only latest `max_messages` rows in chat_history for this session:
+    one bounded DELETE of everything older than the `max_messages`-th newest row.
+    Rows sharing that row's created_at are kept, so a session may briefly hold a
+    few more than `max_messages`. Returns the number of deleted rows.
+    """
+    return trim_chat_histories(db, [session_id], max_messages=max_messages)
+
+
+def trim_chat_histories(db: Session, session_ids: list[str], max_messages: int = 50) -> int:
+    """
+    trim_chat_history for several sessions in one transaction. With the archive
+    tier enabled, all their evicted rows go to a single segment first.
+    """
+    if max_messages <= 0:
+        return 0
+
+    cutoffs = {}
+    for session_id in session_ids:
+        cutoff = _trim_cutoff(db, session_id, max_messages)
+        if cutoff is not None:
+            cutoffs[session_id] = cutoff
+    if not cutoffs:
+        return 0
+
+    if archive_enabled():
+        archive_query(
+            db,
+            db.query(ChatHistory).filter(
+                or_(*(delete_before_query(db, sid, cutoff).whereclause for sid, cutoff in cutoffs.items()))
+            ),
+        )
+    deleted = {
+        sid: delete_before_query(db, sid, cutoff).delete(synchronize_session=False) for sid, cutoff in cutoffs.items()
+    }
     db.commit()
 
-    logger.info("Trimmed chat history session=%s deleted=%d", session_id, len(old_ids_list))
+    for session_id, count in deleted.items():
+        HISTORY_TRIMS.inc(count, step="deleted_rows")
+        logger.info("Trimmed chat history session=%s deleted=%d", session_id, count)
+    if archive_enabled():
+        compact_sessions(db, cutoffs)
+    return sum(deleted.values())
+
+
+def queue_history_trim(session_id: str) -> bool:
+    """Queue an over-cap session for the next sweep. True if a sweep should be scheduled."""
+    with _pending_lock:
+        _pending_trims.add(session_id)
+        schedule = _history_sweep.arm()
+    HISTORY_TRIMS.inc(step="queued")
+    return schedule
+
+
+@background_job
+def sweep_history_trims(max_messages: int = 50) -> None:
+    """
+    Background job: trim every queued session in one pass with its own DB session.
+    """
+    with _pending_lock:
+        batch = list(_pending_trims)
+        _pending_trims.clear()
+        _history_sweep.release()
+    if not batch:
+        return
+
+    HISTORY_TRIMS.inc(step="sweep")
+    db = SessionLocal()
+    try:
+        trim_chat_histories(db, batch, max_messages=max_messages)
+    except Exception:
+        db.rollback()  # still over the cap: queued again on their next turn
+        logger.exception("Chat history trim failed sessions=%d", len(batch))
+    finally:
+        db.close()
+
+
+def queue_session_trim(max_sessions: int, keep_session_id: Optional[str] = None) -> bool:
+    """
+    Ask the next session sweep to keep at most `max_sessions` sessions (the
+    smallest cap queued since the last sweep wins), never deleting
+    `keep_session_id`. True if a sweep should be scheduled.
+    """
+    global _session_trim_cap
+    with _pending_lock:
+        _session_trim_cap = max_sessions if _session_trim_cap is None else min(_session_trim_cap, max_sessions)
+        if keep_session_id:
+            _session_trim_keep.add(keep_session_id)
+        return _session_sweep.arm()
+
+
+@background_job
+def sweep_session_trims() -> None:
+    """
+    Background job: session retention off the request path (with the archive
+    tier enabled it writes and fsyncs segment files).
+    """
+    global _session_trim_cap
+    with _pending_lock:
+        max_sessions, keep = _session_trim_cap, set(_session_trim_keep)
+        _session_trim_cap = None
+        _session_trim_keep.clear()
+        _session_sweep.release()
+    if max_sessions is None:
+        return
+
+    db = SessionLocal()
+    try:
+        trim_chat_sessions(db, max_sessions=max_sessions, keep_session_ids=keep)
+    except Exception:
+        db.rollback()
+        logger.exception("Chat session trim failed")
+    finally:
+        db.close()
 
 
-def trim_chat_sessions(db: Session, max_sessions: int = 20, keep_session_id: str | None = None) -> None:
+def trim_chat_sessions(
+    db: Session,
+    max_sessions: int = 20,
+    keep_session_id: str | None = None,
+    keep_session_ids: Iterable[str] = (),
+) -> None:
     """
     Keep only latest `max_sessions` sessions by created_at.
-    Will not delete `keep_session_id` if provided.
-    Deletes HumanFlag rows for deleted sessions to avoid FK issues.
+    Will not delete `keep_session_id` / `keep_session_ids` if provided.
+    A one-row probe finds the newest session past the cap; older sessions are then
+    deleted oldest first in SESSION_TRIM_BATCH pages, keyed on (created_at,
+    session_id), one transaction per page. Their history, product history and flags
+    go with them (archived first with the archive tier enabled).
     """
     if max_sessions <= 0:
         return
 
-    sessions = db.query(ChatSession).order_by(ChatSession.created_at.desc()).all()
-    if len(sessions) <= max_sessions:
+    boundary = (
+        db.query(ChatSession.created_at, ChatSession.session_id)
+        .order_by(ChatSession.created_at.desc(), ChatSession.session_id.desc())
+        .offset(max_sessions)
+        .first()
+    )
+    if boundary is None:
         return
 
-    to_delete = sessions[max_sessions:]  # older sessions
-    if keep_session_id:
-        to_delete = [s for s in to_delete if s.session_id != keep_session_id]
+    keep = {*keep_session_ids, *([keep_session_id] if keep_session_id else [])}
+    last_at, last_id = boundary
+    within = or_(
+        ChatSession.created_at < last_at,
+        and_(ChatSession.created_at == last_at, ChatSession.session_id <= last_id),
+    )
+    after: Optional[tuple[datetime, str]] = None
+    deleted_ids: list[str] = []
+    while True:
+        page = db.query(ChatSession.created_at, ChatSession.session_id).filter(within)
+        if after is not None:
+            page = page.filter(
+                or_(
+                    ChatSession.created_at > after[0],
+                    and_(ChatSession.created_at == after[0], ChatSession.session_id > after[1]),
+                )
+            )
+        rows = page.order_by(ChatSession.created_at, ChatSession.session_id).limit(SESSION_TRIM_BATCH).all()
+        if not rows:
+            break
+        after = tuple(rows[-1])
+        ids = [sid for _, sid in rows if sid not in keep]
+        if ids:
+            _delete_sessions(db, ids)
+            deleted_ids.extend(ids)
+        if len(rows) < SESSION_TRIM_BATCH:
+            break
 
-    if not to_delete:
+    if not deleted_ids:
         return
+    logger.info("Trimmed chat sessions deleted=%d", len(deleted_ids))
+    if archive_enabled():
+        compact_sessions(db, deleted_ids)
 
-    deleted_count = 0
-    for s in to_delete:
-        # delete flags first (chat history is cascaded via relationship on ChatSession)
-        db.query(HumanFlag).filter(HumanFlag.session_id == s.session_id).delete(synchronize_session=False)
-
-        db.delete(s)
-        deleted_count += 1
 
+def _delete_sessions(db: Session, ids: list[str]) -> None:
+    """One page of trim_chat_sessions: child rows first (foreign keys), then the sessions."""
+    if archive_enabled():
+        for model in (ChatHistory, UserProductHistory, HumanFlag):
+            archive_query(db, db.query(model).filter(model.session_id.in_(ids)))
+    for model in (ChatHistory, UserProductHistory, HumanFlag, ChatSession):
+        db.query(model).filter(model.session_id.in_(ids)).delete(synchronize_session=False)
     db.commit()
-    logger.info("Trimmed chat sessions deleted=%d", deleted_count)
\ No newline at end of file
+    invalidate_sessions(ids)
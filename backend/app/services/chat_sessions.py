@@ -0,0 +1,70 @@
+# app/services/chat_sessions.py
+"""
+ChatSession rows. Eager mode inserts the row in /create_session; lazy mode
+(LAZY_SESSIONS=true) hands out a signed id and `upsert_chat_session` creates
+the row with the first /chat message, in the same transaction. A token whose
+session the retention trim would already have deleted is retired instead
+(`lazy_session_retired`): its row is not created, or recreated, again.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.session_tokens import issue_session_token, token_issued_at
+from app.models import ChatSession
+
+SESSIONS = metrics.counter("chat_sessions_total", "Chat session lifecycle by event (created, issued, materialized, retired)")
+
+
+def issue_lazy_session() -> str:
+    """Lazy mode: a signed id, no database write."""
+    SESSIONS.inc(event="issued")
+    return issue_session_token()
+
+
+def lazy_session_retired(db: Session, session_id: str, max_sessions: int) -> bool:
+    """
+    True once `max_sessions` sessions were created after the token was issued:
+    trim_chat_sessions keeps the newest `max_sessions`, so this session has been
+    (or, never materialized, would have been) trimmed. Sessions only get newer,
+    so a retired token stays retired. One index probe on ix_chat_sessions_created.
+    """
+    issued_at = token_issued_at(session_id)
+    if issued_at is None:
+        return True
+    newer = (
+        db.query(ChatSession.session_id)
+        .filter(ChatSession.created_at > issued_at)
+        .order_by(ChatSession.created_at)
+        .offset(max_sessions - 1)
+        .first()
+    )
+    if newer is not None:
+        SESSIONS.inc(event="retired")
+        return True
+    return False
+
+
+def upsert_chat_session(db: Session, session_id: str) -> None:
+    """
+    INSERT the session row unless it already exists (two first messages may race).
+    Not committed: the caller commits it together with the first chat message.
+    """
+    values = {"session_id": session_id, "created_at": datetime.utcnow()}
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(ChatSession).values(**values)
+        stmt = stmt.on_duplicate_key_update(session_id=stmt.inserted.session_id)
+        db.execute(stmt)
+    elif dialect == "sqlite":
+        db.execute(sqlite_insert(ChatSession).values(**values).on_conflict_do_nothing(index_elements=["session_id"]))
+    else:
+        if db.get(ChatSession, session_id) is None:
+            db.add(ChatSession(**values))
+            db.flush()
+    SESSIONS.inc(event="materialized")
@@ -0,0 +1,172 @@
+# app/services/conversation_summary.py
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.instrumentation import background_job
+from app.db.session import SessionLocal
+from app.models import ChatHistory, ChatSession
+from app.services.chat_history import messages_after_query
+from app.services.gemini_client import gemini_summarize_conversation
+from app.services.prompt_builder import estimate_tokens
+from app.services.session_cache import invalidate_sessions
+
+# hard cap on raw messages sent to Gemini (summary or not)
+MAX_RAW_MESSAGES = 12
+
+SUMMARY_REFRESHES = metrics.counter("conversation_summary_refreshes_total", "Summary refresh jobs by outcome")
+SUMMARY_TOKENS = metrics.histogram(
+    "conversation_summary_tokens_estimated", "Estimated tokens per stored summary", buckets=metrics.TOKEN_BUCKETS
+)
+
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ConversationWindow:
+    summary: Optional[str]
+    messages: list[dict[str, str]]
+    refresh_due: bool
+
+
+def summaries_enabled() -> bool:
+    return settings.summary_every_n_turns > 0
+
+
+def context_fetch_limit() -> int:
+    """
+    Newest messages a chat turn needs to load: enough for the raw window and to
+    notice that a summary refresh is due (pending count only has to reach the
+    threshold, so a truncated list never hides a due refresh).
+    """
+    due_at = 2 * settings.summary_every_n_turns + max(0, settings.summary_keep_raw_messages)
+    return max(MAX_RAW_MESSAGES, due_at) + MAX_RAW_MESSAGES
+
+
+def _unsummarized(summary_upto: Optional[datetime], history: Sequence[ChatHistory]) -> list[ChatHistory]:
+    if summary_upto is None:
+        return list(history)
+    return [h for h in history if h.created_at > summary_upto]
+
+
+def _summary_cut(pending: Sequence[ChatHistory]) -> int:
+    """
+    Number of leading pending messages to fold into the summary.
+    Never splits rows sharing a created_at (DATETIME has second precision),
+    otherwise `created_at > summary_upto` would silently drop the remainder.
+    """
+    cut = len(pending) - max(0, settings.summary_keep_raw_messages)
+    while 0 < cut < len(pending) and pending[cut - 1].created_at == pending[cut].created_at:
+        cut -= 1
+    return max(0, cut)
+
+
+def _refresh_due(cut: int) -> bool:
+    return cut > 0 and cut >= 2 * settings.summary_every_n_turns
+
+
+def _fit_token_budget(messages: list[dict[str, str]], budget: int) -> list[dict[str, str]]:
+    """
+    Keep the newest messages that fit in `budget` tokens (always keeps the last one).
+    """
+    if budget <= 0:
+        return messages[-1:]
+    kept: list[dict[str, str]] = []
+    used = 0
+    for msg in reversed(messages):
+        cost = estimate_tokens(msg["content"]) + 2  # role label + newline
+        if kept and used + cost > budget:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def build_conversation_window(
+    history: Sequence[ChatHistory],
+    *,
+    summary: Optional[str],
+    summary_upto: Optional[datetime],
+) -> ConversationWindow:
+    """
+    Prompt history for Gemini: rolling summary + the newest raw messages not
+    covered by it, trimmed to PROMPT_HISTORY_TOKEN_BUDGET.
+    """
+    enabled = summaries_enabled()
+    pending = _unsummarized(summary_upto, history) if enabled else list(history)
+    summary = summary if enabled else None
+
+    messages = [{"role": h.role, "content": h.message} for h in pending][-MAX_RAW_MESSAGES:]
+    budget = settings.prompt_history_token_budget
+    if budget > 0:
+        messages = _fit_token_budget(messages, budget - estimate_tokens(summary or ""))
+
+    refresh_due = enabled and _refresh_due(_summary_cut(pending))
+    return ConversationWindow(summary=summary, messages=messages, refresh_due=refresh_due)
+
+
+@background_job
+def refresh_conversation_summary(session_id: str) -> None:
+    """
+    Background job: fold older unsummarized messages into ChatSession.summary.
+    At most one refresh per chat session at a time. No DB connection is held
+    during the Gemini call: one short session reads the window, another writes
+    the summary (only if summary_upto has not moved meanwhile).
+    """
+    with _refreshing_lock:
+        if session_id in _refreshing:
+            return
+        _refreshing.add(session_id)
+
+    try:
+        with SessionLocal() as db:
+            session = db.get(ChatSession, session_id)
+            if not session:
+                return
+            previous, previous_upto = session.summary, session.summary_upto
+
+            # only rows the summary does not cover yet (index range on session_id, created_at)
+            history = messages_after_query(db, session_id, previous_upto).all()
+            pending = _unsummarized(previous_upto, history)
+            cut = _summary_cut(pending)
+            # same threshold that scheduled the job: a turn that saw stale session metadata
+            # (a refresh just committed) must not start a second, tiny summarization
+            if not _refresh_due(cut):
+                return
+            folded = [{"role": h.role, "content": h.message} for h in pending[:cut]]
+            folded_upto = pending[cut - 1].created_at
+
+        summary = gemini_summarize_conversation(previous, folded, max_tokens=settings.summary_max_tokens)
+
+        with SessionLocal() as db:
+            unchanged = (
+                ChatSession.summary_upto.is_(None) if previous_upto is None else ChatSession.summary_upto == previous_upto
+            )
+            updated = (
+                db.query(ChatSession)
+                .filter(ChatSession.session_id == session_id, unchanged)
+                .update({"summary": summary, "summary_upto": folded_upto}, synchronize_session=False)
+            )
+            db.commit()
+        if not updated:  # refreshed by another worker, or the session was trimmed
+            SUMMARY_REFRESHES.inc(status="stale")
+            return
+        invalidate_sessions([session_id])
+
+        SUMMARY_REFRESHES.inc(status="ok")
+        SUMMARY_TOKENS.observe(estimate_tokens(summary))
+        logger.info("Conversation summary refreshed session=%s folded=%d", session_id, len(folded))
+    except Exception:
+        SUMMARY_REFRESHES.inc(status="error")
+        logger.exception("Conversation summary refresh failed session=%s", session_id)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(session_id)
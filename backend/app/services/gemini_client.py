@@ -1,13 +1,77 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-from google import genai
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
+from app.core import metrics, tracing
 from app.core.config import settings
 from app.core.logging import logger
+from app.services.gemini_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    GeminiUnavailableError,
+    ResilientCaller,
+    SingleFlight,
+)
+from app.services.gemini_scheduler import Priority, SchedulerOverloaded, scheduler
+from app.services.prompt_builder import PromptBuilder, estimate_tokens
+
+if TYPE_CHECKING:  # google.genai takes ~0.3 s to import: loaded on first use (_configure)
+    from google import genai
+    from google.genai import types
+
+PROMPT_TOKENS = metrics.histogram(
+    "gemini_prompt_tokens_estimated", "Estimated input tokens per Gemini prompt", buckets=metrics.TOKEN_BUCKETS
+)
+HISTORY_TOKENS = metrics.histogram(
+    "gemini_history_tokens_estimated",
+    "Estimated tokens of summary + raw history per prompt",
+    buckets=metrics.TOKEN_BUCKETS,
+)
+USAGE_TOKENS = metrics.counter("gemini_tokens_total", "Tokens reported by Gemini usage metadata")
+FALLBACKS = metrics.counter("gemini_fallback_answers_total", "Answers served without a fresh Gemini call")
+
+# served when Gemini is unavailable and no cached answer exists for the prompt
+FALLBACK_ANSWER = (
+    "Sorry, I'm having trouble answering right now. "
+    "Please try again in a moment, or ask to talk to customer service."
+)
+# served immediately when the Gemini queue is full (load shedding)
+BUSY_ANSWER = (
+    "We're getting a lot of messages right now. "
+    "Please send your question again in a few seconds."
+)
+_ANSWER_CACHE_SIZE = 256
+
+
+class FallbackAnswer(str):
+    """A reply served without a fresh Gemini answer: shed, or a cached/static fallback."""
+
+
+_caller = ResilientCaller(
+    deadline=settings.gemini_deadline_seconds,
+    max_attempts=settings.gemini_max_attempts,
+    hedge=settings.gemini_hedge_enabled,
+    hedge_min_delay=settings.gemini_hedge_min_delay_seconds,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.gemini_breaker_failures,
+        reset_timeout=settings.gemini_breaker_reset_seconds,
+    ),
+    max_workers=settings.gemini_max_workers,
+)
+
+# concurrent identical prompts (same model + final context) share one upstream call
+_single_flight: SingleFlight[Any] = SingleFlight("gemini")
+
+_answer_cache: "OrderedDict[str, str]" = OrderedDict()
+_answer_cache_lock = threading.Lock()
 
 _client: Optional[genai.Client] = None
 _configured: bool = False
+_configure_lock = threading.Lock()
 
 
 def _configure() -> None:
@@ -21,9 +85,38 @@ def _configure() -> None:
         )
         return
 
-    # google-genai uses a Client instead of genai.configure(...)
-    _client = genai.Client(api_key=settings.gemini_api_key)
-    _configured = True
+    with _configure_lock:  # the first calls may arrive together; build one client
+        if _configured:
+            return
+        from google import genai
+
+        # google-genai uses a Client instead of genai.configure(...)
+        _client = genai.Client(api_key=settings.gemini_api_key, http_options=_http_options())
+        _configured = True
+
+
+def _reset_after_fork() -> None:
+    # a forked worker builds its own client: the parent's HTTP connections and
+    # executor threads must not be shared (gunicorn --preload)
+    global _client, _configured, _configure_lock
+    _client = None
+    _configured = False
+    _configure_lock = threading.Lock()
+    _caller.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _http_options() -> types.HttpOptions:
+    from google.genai import types
+
+    # per-attempt HTTP timeout; the overall deadline is enforced by ResilientCaller
+    options: Dict[str, Any] = {"timeout": int(settings.gemini_attempt_timeout_seconds * 1000)}
+    if settings.gemini_base_url:
+        options["base_url"] = settings.gemini_base_url
+    return types.HttpOptions(**options)
 
 
 def _get_client() -> genai.Client:
@@ -33,59 +126,6 @@ def _get_client() -> genai.Client:
     return _client
 
 
-def _safe_product_text(products: List[Dict[str, Any]], max_chars: int = 3000) -> str:
-    blocks: List[str] = []
-    for p in products:
-        name = str(p.get("name", ""))[:500]
-        category = p.get("category", "")
-        brand = p.get("brand", "")
-        screen = p.get("screen", "")
-        processor = p.get("processor", "")
-        ram = p.get("ram", "")
-        storage = p.get("storage", "")
-        camera = p.get("camera", "")
-        price = p.get("price")
-
-        lines: List[str] = []
-        title = f"• {name}"
-        if category:
-            title += f" ({category})"
-        lines.append(title)
-
-        if brand:
-            lines.append(f"  - Brand: {brand}")
-        if screen:
-            lines.append(f"  - Screen: {screen}")
-        if processor:
-            lines.append(f"  - Processor: {processor}")
-        if ram:
-            lines.append(f"  - RAM: {ram}")
-        if storage:
-            lines.append(f"  - Storage: {storage}")
-        if camera:
-            lines.append(f"  - Camera: {camera}")
-        if price is not None:
-            lines.append(f"  - Price: Rs {price}")
-
-        blocks.append("\n".join(lines))
-
-    text = "\n\n".join(blocks)
-    if len(text) > max_chars:
-        text = text[: max_chars - len("...")]
-    return text
-
-
-def _format_conversation_history(conversation_history: List[Dict[str, str]]) -> str:
-    if not conversation_history:
-        return "No previous conversation."
-    lines: List[str] = ["PREVIOUS CONVERSATION:"]
-    for msg in conversation_history:
-        role = msg.get("role", "user").upper()
-        content = msg.get("content", "")
-        lines.append(f"{role}: {content}")
-    return "\n".join(lines)
-
-
 def _extract_text(response: Any) -> str:
     # google-genai responses typically expose `.text`
     text = getattr(response, "text", None)
@@ -879,33 +919,245 @@ WHY WRONG:
 - BE STRICT with recommendations (only use search results)"""
 
 
-def gemini_product_answer(
+# condensed rules for small-talk turns routed to the light model (no products involved)
+LIGHT_SYSTEM_INSTRUCTION = """# Product Advisor (small talk)
+
+You are a friendly advisor for an electronics store (laptops, mobiles, tablets, gadgets).
+- Reply in at most 2 short sentences, in the customer's language (English, Nepali or mixed).
+- Write Nepali only in Roman/English script, never Devanagari.
+- NEVER say you are an AI or a bot; never mention a database, catalog, inventory, search results or system.
+- NEVER name, recommend or price any specific product; instead ask what they are looking for (use case, budget).
+- If they ask for something the store does not sell, say so briefly and ask:
+  "Customer service sanga chat garnu huncha?"
+- If they confirm they want customer service (yes/ok/ho/thik cha), output exactly [HUMAN_INTERVENTION_REQUIRED] and nothing else."""
+
+
+_prompt_builder = PromptBuilder(SYSTEM_INSTRUCTION)
+_light_prompt_builder = PromptBuilder(LIGHT_SYSTEM_INSTRUCTION)
+
+
+SUMMARY_INSTRUCTION = """Summarize this shop chat between a customer and a product advisor.
+Keep: what the customer wants (category, budget, use case, must-have features), products already
+suggested with prices, and any open question or customer-service request. Drop greetings and filler.
+Write plain notes, at most {max_words} words. Do not invent details."""
+
+
+def _record_usage(response: Any, kind: str) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens:
+        USAGE_TOKENS.inc(prompt_tokens, call=kind, direction="input")
+    if output_tokens:
+        USAGE_TOKENS.inc(output_tokens, call=kind, direction="output")
+
+
+def _total_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None) if usage is not None else None
+    return int(total) if total else None
+
+
+def _generate(model: str, contents: str, priority: Priority) -> Any:
+    """
+    One logical Gemini call: every attempt (retry or hedge) is admitted by the
+    quota scheduler, and the whole call is governed by the resilience layer.
+    """
+    client = _get_client()
+    estimated = estimate_tokens(contents) + settings.gemini_expected_output_tokens
+
+    def attempt(usage: dict) -> Any:
+        with tracing.span("gemini.generate_content", model=model):
+            # google-genai call style:
+            response = client.models.generate_content(model=model, contents=contents)
+        usage["actual_tokens"] = _total_tokens(response)
+        return response
+
+    # admitted before an executor thread is taken: queue by priority, shed when full
+    return _caller.call(attempt, admit=lambda: scheduler.slot(estimated, priority))
+
+
+def _generate_shared(model: str, contents: str, cache_key: str, priority: Priority) -> tuple[Any, bool]:
+    """(response, shared): shared responses were produced by another request's call."""
+    if not settings.gemini_single_flight:
+        return _generate(model, contents, priority), False
+    # a follower never waits longer than the leader itself can take
+    timeout = settings.gemini_max_queue_wait_seconds + settings.gemini_deadline_seconds + 1.0
+    return _single_flight.do((model, cache_key), lambda: _generate(model, contents, priority), timeout)
+
+
+def _remember_answer(cache_key: str, answer: str) -> None:
+    with _answer_cache_lock:
+        _answer_cache[cache_key] = answer
+        _answer_cache.move_to_end(cache_key)
+        while len(_answer_cache) > _ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+
+
+def _fallback_answer(cache_key: str, exc: Exception) -> str:
+    with _answer_cache_lock:
+        cached = _answer_cache.get(cache_key)
+    reason = "circuit_open" if isinstance(exc, CircuitOpenError) else "unavailable"
+    FALLBACKS.inc(reason=reason, source="cache" if cached else "static")
+    logger.warning("Gemini %s; serving %s fallback answer.", reason, "cached" if cached else "static")
+    return FallbackAnswer(cached or FALLBACK_ANSWER)
+
+
+def _answer(
+    builder: PromptBuilder,
+    model: str,
+    route: str,
     prompt: str,
     products: List[Dict[str, Any]],
     conversation_history: List[Dict[str, str]],
+    conversation_summary: Optional[str],
+    priority: Priority,
+    prompt_prefix: Optional[str] = None,
 ) -> str:
     if not prompt:
         return "I didn't receive any question."
     # if len(prompt) > 2000:
     #     prompt = prompt[:1987] + " … (truncated)"
 
-    context = f"""
-{SYSTEM_INSTRUCTION}
+    with tracing.span("prompt_build", route=route, products=len(products)):
+        if prompt_prefix is None:
+            prompt_prefix = builder.prefix(prompt, conversation_history, conversation_summary)
+        context = builder.complete(prompt_prefix, products)
 
-{_format_conversation_history(conversation_history)}
+    PROMPT_TOKENS.observe(estimate_tokens(context), route=route)
+    HISTORY_TOKENS.observe(
+        estimate_tokens(conversation_summary or "")
+        + sum(estimate_tokens(m.get("content", "")) for m in conversation_history),
+        route=route,
+    )
 
-USER QUESTION:
-{prompt}
+    cache_key = hashlib.sha256(context.encode("utf-8")).hexdigest()
 
-AVAILABLE PRODUCTS:
-{_safe_product_text(products)}
-""".strip()
+    try:
+        with tracing.span("gemini", route=route, model=model) as sp:
+            response, shared = _generate_shared(model, context, cache_key, priority)
+            if sp is not None:
+                sp.set_attribute("shared", shared)
+    except SchedulerOverloaded as exc:
+        FALLBACKS.inc(reason="overloaded", source="static")
+        logger.warning("Gemini queue %s; shedding request.", exc.reason)
+        return FallbackAnswer(BUSY_ANSWER)
+    except (CircuitOpenError, GeminiUnavailableError) as exc:
+        return _fallback_answer(cache_key, exc)
+
+    if not shared:  # usage belongs to the request that made the call
+        _record_usage(response, route)
+    answer = _extract_text(response)
+    _remember_answer(cache_key, answer)
+    return answer
+
+
+def gemini_product_answer(
+    prompt: str,
+    products: List[Dict[str, Any]],
+    conversation_history: List[Dict[str, str]],
+    conversation_summary: Optional[str] = None,
+    priority: Priority = Priority.NEW_SESSION,
+    prompt_prefix: Optional[str] = None,
+) -> str:
+    return _answer(
+        _prompt_builder,
+        settings.gemini_model,
+        "full",
+        prompt,
+        products,
+        conversation_history,
+        conversation_summary,
+        priority,
+        prompt_prefix,
+    )
 
-    client = _get_client()
 
-    # google-genai call style:
-    response = client.models.generate_content(
-        model=settings.gemini_model,
-        contents=context,
+def gemini_light_answer(
+    prompt: str,
+    conversation_history: List[Dict[str, str]],
+    conversation_summary: Optional[str] = None,
+    priority: Priority = Priority.NEW_SESSION,
+    prompt_prefix: Optional[str] = None,
+) -> str:
+    """
+    Small-talk turns: lighter model, short system prompt, no product block.
+    """
+    return _answer(
+        _light_prompt_builder,
+        settings.gemini_light_model,
+        "light",
+        prompt,
+        [],
+        conversation_history,
+        conversation_summary,
+        priority,
+        prompt_prefix,
     )
-    return _extract_text(response)
\ No newline at end of file
+
+
+def build_prompt_prefix(
+    light: bool,
+    prompt: str,
+    conversation_history: List[Dict[str, str]],
+    conversation_summary: Optional[str] = None,
+) -> str:
+    """Prompt up to the product block, for gemini_light_answer / gemini_product_answer(prompt_prefix=...)."""
+    builder = _light_prompt_builder if light else _prompt_builder
+    return builder.prefix(prompt, conversation_history, conversation_summary)
+
+
+def warm_up_client(preflight: bool = True) -> bool:
+    """
+    Startup: build the client (SDK import, HTTP client) and optionally send one
+    1-token request so the connection pool and TLS session exist before the
+    first /chat. False if Gemini is unconfigured or unreachable; not fatal.
+    """
+    if not settings.gemini_api_key:
+        return False
+    try:
+        client = _get_client()
+        if not preflight:
+            return True
+        contents = "ping"
+        with scheduler.slot(estimate_tokens(contents) + 1, Priority.BACKGROUND) as usage:
+            response = client.models.generate_content(
+                model=settings.gemini_light_model, contents=contents, config={"max_output_tokens": 1}
+            )
+            usage["actual_tokens"] = _total_tokens(response)
+        _record_usage(response, "warmup")
+    except Exception:
+        logger.warning("Gemini warm-up failed; the first request will set up the client.", exc_info=True)
+        return False
+    return True
+
+
+def gemini_summarize_conversation(
+    previous_summary: Optional[str],
+    messages: List[Dict[str, str]],
+    max_tokens: int = 300,
+) -> str:
+    """
+    Fold `messages` into `previous_summary` and return the new rolling summary.
+    """
+    lines: List[str] = [SUMMARY_INSTRUCTION.format(max_words=max(20, int(max_tokens * 0.75)))]
+    if previous_summary:
+        lines.append("")
+        lines.append("SUMMARY SO FAR:")
+        lines.append(previous_summary)
+    lines.append("")
+    lines.append("NEW MESSAGES:")
+    for msg in messages:
+        lines.append(f"{msg.get('role', 'user').upper()}: {msg.get('content', '')}")
+
+    response = _generate(settings.summary_model, "\n".join(lines), Priority.BACKGROUND)
+    _record_usage(response, "summary")
+    summary = _extract_text(response)
+
+    # hard cap: the summary must never outgrow its own budget
+    max_chars = max_tokens * 4
+    if len(summary) > max_chars:
+        summary = summary[:max_chars]
+    return summary
\ No newline at end of file
@@ -0,0 +1,386 @@
+# app/services/gemini_resilience.py
+"""
+Resilience for upstream Gemini calls:
+  - overall per-call deadline (attempts run on a bounded executor)
+  - optional admission (`admit`, the quota scheduler) before an attempt takes an
+    executor thread, so excess calls queue by priority there, not FIFO here
+  - jittered exponential retries on retryable status codes / transport errors
+  - optional hedged second request once an attempt exceeds the observed p95
+  - circuit breaker that fails fast while the upstream is unhealthy
+  - single-flight: concurrent identical calls share one upstream request
+"""
+from __future__ import annotations
+
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, ExitStack
+from typing import Any, Callable, Deque, Generic, Hashable, Optional, TypeVar
+
+import httpx
+
+from app.core import metrics
+from app.core.logging import logger
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+ATTEMPTS = metrics.counter("gemini_attempts_total", "Upstream Gemini attempts by outcome")
+HEDGES = metrics.counter("gemini_hedged_requests_total", "Hedged second requests issued")
+BREAKER_STATE = metrics.gauge("gemini_circuit_open", "1 while the Gemini circuit breaker is open")
+LATENCY = metrics.histogram("gemini_latency_seconds", "Latency of successful Gemini attempts")
+COALESCED = metrics.counter(
+    "gemini_single_flight_total", "Single-flight callers by role (leader, follower) and outcome"
+)
+GROUP_SIZE = metrics.histogram(
+    "gemini_single_flight_group_size",
+    "Callers served by one upstream call",
+    buckets=(1, 2, 3, 5, 10, 25, 50, 100),
+)
+
+
+# context manager factory run before each attempt (quota admission)
+Admit = Callable[[], AbstractContextManager[Any]]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while the breaker is open."""
+
+
+class GeminiUnavailableError(RuntimeError):
+    """Retries/deadline exhausted on retryable failures."""
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None)  # google.genai.errors.APIError
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failed calls;
+    open -> half-open after `reset_timeout` seconds (one probe call allowed);
+    half-open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._opened_at is not None:
+                logger.info("Gemini circuit breaker closed")
+            self._opened_at = None
+        BREAKER_STATE.set(0)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            was_probe = self._probe_in_flight
+            self._probe_in_flight = False
+            if was_probe or self._failures >= self.failure_threshold:
+                if self._opened_at is None or was_probe:
+                    logger.warning("Gemini circuit breaker open (consecutive failures=%d)", self._failures)
+                self._opened_at = time.monotonic()
+        if self._opened_at is not None:
+            BREAKER_STATE.set(1)
+
+    def release_probe(self) -> None:
+        # non-retryable outcome: says nothing about upstream health
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies (seconds)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class ResilientCaller:
+    def __init__(
+        self,
+        *,
+        deadline: float,
+        max_attempts: int = 3,
+        backoff_base: float = 0.25,
+        backoff_max: float = 2.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32,
+        name: str = "gemini",
+    ) -> None:
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+
+    def reset_after_fork(self) -> None:
+        """In a forked child: the parent's executor threads do not exist here."""
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-call")
+
+    def _submit(self, fn: Callable[..., T], admit: Optional[Admit] = None, admit_here: bool = True) -> Future:
+        # run in a copy of the caller's context so request tracing follows the attempt
+        ctx = contextvars.copy_context()
+        if admit is None:
+            return self._executor.submit(ctx.run, fn)
+        if not admit_here:
+            # hedge: admitted in the worker, the caller keeps watching the first attempt
+            def admitted_in_worker() -> T:
+                with admit() as slot:
+                    return fn(slot)
+
+            return self._executor.submit(ctx.run, admitted_in_worker)
+
+        # blocks this thread until admitted (or raises): callers wait in the scheduler's
+        # priority queue and are shed there, never in the executor's unbounded FIFO
+        gate = admit()
+        slot = gate.__enter__()
+
+        def admitted() -> T:
+            with ExitStack() as stack:
+                stack.push(gate)  # released when the attempt ends, in the worker
+                return fn(slot)
+
+        try:
+            fut = self._executor.submit(ctx.run, admitted)
+        except BaseException:
+            gate.__exit__(None, None, None)
+            raise
+        # cancelled before it started: admitted() never runs, release here
+        fut.add_done_callback(lambda f: f.cancelled() and gate.__exit__(None, None, None))
+        return fut
+
+    def _record_latency(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        self.latency.record(elapsed)
+        LATENCY.observe(elapsed, call=self.name)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p95 = self.latency.p95()
+        if p95 is None:
+            return None
+        return max(self.hedge_min_delay, p95)
+
+    def _attempt(self, fn: Callable[..., T], timeout: float, admit: Optional[Admit]) -> T:
+        end = time.monotonic() + timeout
+        started: dict[Future, float] = {self._submit(fn, admit): time.monotonic()}
+        pending: set[Future] = set(started)
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, pending = wait(pending, timeout=hedge_delay)
+            if not done:
+                HEDGES.inc(call=self.name)
+                hedged = self._submit(fn, admit, admit_here=False)
+                started[hedged] = time.monotonic()
+                pending.add(hedged)
+            else:
+                pending |= done
+
+        last_exc: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                exc = fut.exception()
+                if exc is None:
+                    for other in pending:
+                        other.cancel()  # a running loser just finishes in the background
+                    # only winners feed the p95, so slow losers cannot disable hedging
+                    self._record_latency(started[fut])
+                    return fut.result()
+                last_exc = exc
+
+        if pending or last_exc is None:
+            raise DeadlineExceeded(f"{self.name} attempt exceeded {timeout:.2f}s")
+        raise last_exc
+
+    def call(self, fn: Callable[..., T], admit: Optional[Admit] = None) -> T:
+        """
+        Run `fn` with retries, hedging and the deadline. With `admit` (a context
+        manager factory, e.g. a scheduler slot) every attempt is admitted first
+        and `fn` gets the entered value: `fn(slot)`.
+        """
+        if not self.breaker.allow():
+            ATTEMPTS.inc(call=self.name, outcome="circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit breaker is open")
+
+        deadline = time.monotonic() + self.deadline
+        last_exc: Optional[BaseException] = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                result = self._attempt(fn, remaining, admit)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    ATTEMPTS.inc(call=self.name, outcome="error")
+                    self.breaker.release_probe()
+                    raise
+                ATTEMPTS.inc(call=self.name, outcome="retryable_error")
+                last_exc = exc
+                if attempt == self.max_attempts:
+                    break
+                # full jitter backoff, never past the deadline
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+                sleep_for = min(backoff, deadline - time.monotonic())
+                logger.warning(
+                    "%s attempt %d/%d failed (%s); retrying in %.2fs",
+                    self.name, attempt, self.max_attempts, exc, max(0.0, sleep_for),
+                )
+                if sleep_for > 0:
+                    time.sleep(sleep_for)
+                continue
+
+            ATTEMPTS.inc(call=self.name, outcome="ok")
+            self.breaker.record_success()
+            return result
+
+        self.breaker.record_failure()
+        raise GeminiUnavailableError(f"{self.name} unavailable after retries") from last_exc
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("done", "result", "error", "abandoned", "callers")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[Exception] = None
+        self.abandoned = False
+        self.callers = 1
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key: the first caller (leader)
+    runs `fn`, callers arriving while it runs (followers) wait and get the
+    same result or the same exception. Nothing is cached after completion.
+
+    Cancellation: a follower that gives up (`timeout`) just stops waiting; the
+    leader's call is unaffected. If the leader is interrupted by a
+    BaseException (e.g. its worker is cancelled or shutting down), followers
+    are not failed with it: they retry and one of them becomes the new leader.
+    """
+
+    def __init__(self, name: str = "gemini") -> None:
+        self.name = name
+        self._flights: dict[Hashable, _Flight[T]] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> tuple[T, bool]:
+        """Returns (result, shared); shared is True for followers."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                else:
+                    flight.callers += 1
+            if leader:
+                return self._lead(key, flight, fn), False
+
+            remaining = None if end is None else max(0.0, end - time.monotonic())
+            if not flight.done.wait(remaining):
+                COALESCED.inc(call=self.name, role="follower", outcome="timeout")
+                raise GeminiUnavailableError(f"{self.name} shared call still running after {timeout:.2f}s")
+            if flight.abandoned:
+                COALESCED.inc(call=self.name, role="follower", outcome="leader_cancelled")
+                continue
+            if flight.error is not None:
+                COALESCED.inc(call=self.name, role="follower", outcome="error")
+                raise flight.error
+            COALESCED.inc(call=self.name, role="follower", outcome="ok")
+            return flight.result, True  # type: ignore[return-value]
+
+    def _lead(self, key: Hashable, flight: _Flight[T], fn: Callable[[], T]) -> T:
+        outcome = "ok"
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as exc:
+            outcome = "error"
+            flight.error = exc
+            raise
+        except BaseException:
+            outcome = "cancelled"
+            flight.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                callers = flight.callers
+            flight.done.set()
+            COALESCED.inc(call=self.name, role="leader", outcome=outcome)
+            GROUP_SIZE.observe(callers, call=self.name)
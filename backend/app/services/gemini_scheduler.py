@@ -0,0 +1,248 @@
+# app/services/gemini_scheduler.py
+"""
+Process-wide admission control for Gemini calls.
+
+Two token buckets (requests/min and tokens/min) plus a concurrency cap.
+Callers queue by priority (ongoing conversations before new sessions before
+background work) with a bounded wait; when the queue is full or the wait runs
+out, SchedulerOverloaded is raised so the caller can shed load quickly.
+
+Admission blocks a thread. /chat runs its Gemini work with `run_in_gemini_thread`,
+on a limiter of its own that is larger than what can be admitted or queued, so
+excess turns reach `acquire` and are shed (queue_full) or ordered by priority
+there, instead of waiting FIFO for one of the request threadpool's threads,
+which the DB stages need.
+"""
+from __future__ import annotations
+
+import functools
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+import anyio
+import anyio.to_thread
+
+from app.core import metrics, tracing
+from app.core.config import settings
+
+QUEUE_DEPTH = metrics.gauge("gemini_queue_depth", "Gemini calls waiting for admission")
+IN_FLIGHT = metrics.gauge("gemini_in_flight", "Gemini calls currently admitted")
+QUEUE_WAIT = metrics.histogram("gemini_queue_wait_seconds", "Time spent waiting for Gemini admission")
+SHED = metrics.counter("gemini_shed_total", "Gemini calls rejected by the scheduler")
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    # lower value is admitted first
+    ONGOING = 0
+    NEW_SESSION = 1
+    BACKGROUND = 2
+
+
+class SchedulerOverloaded(RuntimeError):
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"Gemini scheduler overloaded: {reason}")
+        self.reason = reason
+
+
+class TokenBucket:
+    """
+    Continuous-refill bucket. Not thread-safe on its own (guarded by the scheduler lock).
+    The level may go negative after `adjust()` when real usage exceeds the estimate.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = float(per_minute)
+        self._stamp = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 when it is available now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self.level -= delta
+
+
+class _Waiter:
+    __slots__ = ("admitted",)
+
+    def __init__(self) -> None:
+        self.admitted = False
+
+
+class RateScheduler:
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        max_queue: int,
+        max_wait: float,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _admission_wait(self, tokens: int) -> float:
+        # caller holds the lock; 0 => admissible now
+        if self._in_flight >= self.max_concurrency:
+            return float("inf")  # woken by release()
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _publish(self) -> None:
+        QUEUE_DEPTH.set(len(self._queue))
+        IN_FLIGHT.set(self._in_flight)
+
+    def _admit(self, tokens: int) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self._in_flight += 1
+        self._publish()
+
+    def acquire(self, tokens: int, priority: Priority = Priority.NEW_SESSION) -> float:
+        """
+        Block until admitted; returns seconds waited.
+        Raises SchedulerOverloaded when the queue is full or `max_wait` elapses.
+        """
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        waiter = _Waiter()
+        entry = (int(priority), next(self._seq), waiter)
+
+        with self._cond:
+            if not self._queue and self._admission_wait(tokens) <= 0:
+                self._admit(tokens)
+                QUEUE_WAIT.observe(0.0, priority=priority.name.lower())
+                return 0.0
+            if len(self._queue) >= self.max_queue:
+                SHED.inc(reason="queue_full")
+                raise SchedulerOverloaded("queue_full")
+            heapq.heappush(self._queue, entry)
+            self._publish()
+            try:
+                while True:
+                    if self._queue[0] is entry:
+                        wait_for = self._admission_wait(tokens)
+                        if wait_for <= 0:
+                            heapq.heappop(self._queue)
+                            self._admit(tokens)
+                            waiter.admitted = True
+                            # the next head may be admissible too
+                            self._cond.notify_all()
+                            break
+                    else:
+                        wait_for = float("inf")
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        SHED.inc(reason="wait_timeout")
+                        raise SchedulerOverloaded("wait_timeout")
+                    self._cond.wait(timeout=min(wait_for, remaining))
+            finally:
+                if not waiter.admitted:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                self._publish()
+
+        waited = time.monotonic() - start
+        QUEUE_WAIT.observe(waited, priority=priority.name.lower())
+        return waited
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None) -> None:
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            if actual_tokens is not None:
+                # settle TPM with what Gemini actually billed
+                self.tokens.adjust(actual_tokens - estimated_tokens)
+            self._publish()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int, priority: Priority = Priority.NEW_SESSION) -> Iterator[dict]:
+        """
+        `with scheduler.slot(n) as usage: ...; usage["actual_tokens"] = ...`
+        """
+        with tracing.span("gemini.queue_wait", priority=priority.name.lower(), tokens=tokens):
+            self.acquire(tokens, priority)
+        usage: dict = {"actual_tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(tokens, usage["actual_tokens"])
+
+
+# GEMINI_RPM/TPM are the project quota: each worker process admits its share
+scheduler = RateScheduler(
+    requests_per_minute=settings.gemini_rpm / max(1, settings.web_concurrency),
+    tokens_per_minute=settings.gemini_tpm / max(1, settings.web_concurrency),
+    max_concurrency=settings.gemini_max_concurrency,
+    max_queue=settings.gemini_max_queue,
+    max_wait=settings.gemini_max_queue_wait_seconds,
+)
+
+# admitted + queued, plus room for single-flight followers (they hold a thread, not a queue slot)
+_gemini_threads = anyio.CapacityLimiter(2 * scheduler.max_concurrency + scheduler.max_queue)
+
+
+async def run_in_gemini_thread(fn: Callable[..., T], *args: Any) -> T:
+    """run_in_threadpool for blocking work that admits through `scheduler`."""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args), limiter=_gemini_threads)
+
+
+def check_thread_budget(threadpool_size: int) -> None:
+    """
+    Startup check. Gemini calls made from the shared threadpool (summary refresh,
+    warm-up) can hold max_concurrency + max_queue of its threads while admitted
+    or queued; some must be left for the DB stages.
+    """
+    held = scheduler.max_concurrency + scheduler.max_queue
+    if held >= threadpool_size:
+        raise RuntimeError(
+            f"GEMINI_MAX_CONCURRENCY + GEMINI_MAX_QUEUE ({held}) must be below the threadpool size ({threadpool_size})"
+        )
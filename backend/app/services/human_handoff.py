@@ -3,8 +3,11 @@ from __future__ import annotations
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from app.core import metrics
 from app.models import HumanFlag
 
+HUMAN_FLAG_ACTIVATIONS = metrics.counter("human_flag_activations_total", "Chats handed over to customer service")
+
 
 def get_flag(db: Session, session_id: str) -> HumanFlag | None:
     return db.query(HumanFlag).filter(HumanFlag.session_id == session_id).first()
@@ -51,4 +54,5 @@ def activate_flag(db: Session, session_id: str, reason: str, user_message: str)
     flag.updated_at = now
     db.commit()
     db.refresh(flag)
+    HUMAN_FLAG_ACTIVATIONS.inc()
     return flag
\ No newline at end of file
@@ -0,0 +1,196 @@
+# app/services/idempotency.py
+"""
+Idempotent /chat turns: a retried or double-submitted message (same session,
+same Idempotency-Key / client_message_id) gets the stored ChatResponse instead
+of a second user message and a second Gemini generation.
+
+    stored = acquire(key, fp)   # None: we own the key, run the turn
+    ... then complete(key, fp, response), or release(key) on failure
+
+A duplicate that arrives while the first request is still running waits for
+it (in-process: an Event; across workers: polling the shared Redis entry).
+If the owner fails the key is released and one waiter takes over. Results are
+kept IDEMPOTENCY_TTL_SECONDS; reusing a key for a different message is an error.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+
+REQUESTS = metrics.counter("chat_idempotent_requests_total", "Keyed /chat requests by outcome (new, replayed, waited, conflict, mismatch)")
+
+_POLL_SECONDS = 0.05
+
+
+class IdempotencyKeyReused(RuntimeError):
+    """Same key, different request body."""
+
+
+class IdempotencyInFlight(RuntimeError):
+    """The original request is still running after `wait` seconds."""
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires: float
+    done: threading.Event = field(default_factory=threading.Event)
+    response: Optional[dict[str, Any]] = None
+
+
+class _RedisStore:
+    """
+    Shared layer so a retry routed to another worker still replays. Any Redis
+    error degrades to in-process behaviour, never a failed request.
+    """
+
+    PREFIX = "chatbot:idem:"
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+
+    def claim(self, key: str, fp: str, ttl: float) -> Optional[dict[str, Any]]:
+        """None if we now own the key, else the current entry."""
+        entry = json.dumps({"fp": fp, "response": None})
+        try:
+            if self._client.set(self.PREFIX + key, entry, nx=True, px=int(ttl * 1000)):
+                return None
+            raw = self._client.get(self.PREFIX + key)
+        except Exception:
+            logger.warning("Idempotency store unavailable (claim)", exc_info=True)
+            return None
+        return json.loads(raw) if raw else None
+
+    def complete(self, key: str, fp: str, response: dict[str, Any], ttl: float) -> None:
+        try:
+            self._client.set(self.PREFIX + key, json.dumps({"fp": fp, "response": response}), px=int(ttl * 1000))
+        except Exception:
+            logger.warning("Idempotency store unavailable (complete)", exc_info=True)
+
+    def release(self, key: str) -> None:
+        try:
+            self._client.delete(self.PREFIX + key)
+        except Exception:
+            logger.warning("Idempotency store unavailable (release)", exc_info=True)
+
+
+_entries: OrderedDict[str, _Entry] = OrderedDict()
+_lock = threading.Lock()
+
+_shared: Optional[_RedisStore] = None
+if settings.idempotency_redis_url:
+    try:
+        _shared = _RedisStore(settings.idempotency_redis_url)
+    except ImportError:
+        logger.warning("IDEMPOTENCY_REDIS_URL is set but redis is not installed; idempotency keys are per worker.")
+
+
+def _in_flight_ttl() -> float:
+    # an owner that died without release() must not block its key forever
+    return settings.gemini_deadline_seconds + settings.idempotency_wait_seconds
+
+
+def _claim_local(key: str, fp: str) -> tuple[_Entry, bool]:
+    """(entry, owned): a fresh entry we own, or the existing one to wait on."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.expires <= now:
+            del _entries[key]
+            entry = None
+        if entry is None:
+            entry = _Entry(fp, now + _in_flight_ttl())
+            _entries[key] = entry
+            while len(_entries) > settings.idempotency_max_entries:
+                _entries.popitem(last=False)
+            return entry, True
+        _entries.move_to_end(key)
+        return entry, False
+
+
+def acquire(key: str, fp: str, wait: Optional[float] = None) -> Optional[dict[str, Any]]:
+    """
+    None: the caller owns `key` and must call complete() or release().
+    Otherwise the stored response of the earlier request.
+    Raises IdempotencyKeyReused or IdempotencyInFlight.
+    """
+    deadline = time.monotonic() + (settings.idempotency_wait_seconds if wait is None else wait)
+    waited = False
+    while True:
+        entry, owned = _claim_local(key, fp)
+        if owned:
+            shared = _shared.claim(key, fp, _in_flight_ttl()) if _shared is not None else None
+            if shared is None:
+                REQUESTS.inc(outcome="new")
+                return None
+            # another worker owns it: drop our local claim and follow the shared entry
+            release(key, shared=False)
+            if shared["fp"] != fp:
+                REQUESTS.inc(outcome="mismatch")
+                raise IdempotencyKeyReused(key)
+            if shared["response"] is not None:
+                REQUESTS.inc(outcome="waited" if waited else "replayed")
+                return shared["response"]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                REQUESTS.inc(outcome="conflict")
+                raise IdempotencyInFlight(key)
+            waited = True
+            time.sleep(min(_POLL_SECONDS, remaining))
+            continue
+
+        if entry.fingerprint != fp:
+            REQUESTS.inc(outcome="mismatch")
+            raise IdempotencyKeyReused(key)
+        if entry.response is not None:
+            REQUESTS.inc(outcome="waited" if waited else "replayed")
+            return entry.response
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            REQUESTS.inc(outcome="conflict")
+            raise IdempotencyInFlight(key)
+        waited = True
+        entry.done.wait(remaining)  # set by complete() or release(); then re-check
+
+
+def complete(key: str, fp: str, response: dict[str, Any]) -> None:
+    ttl = settings.idempotency_ttl_seconds
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:  # evicted while running: store it anyway
+            entry = _entries[key] = _Entry(fp, 0.0)
+        entry.response = response
+        entry.expires = time.monotonic() + ttl
+    entry.done.set()
+    if _shared is not None:
+        _shared.complete(key, fp, response, ttl)
+
+
+def release(key: str, *, shared: bool = True) -> None:
+    """Forget an in-flight key (the request failed); a waiting duplicate takes over."""
+    with _lock:
+        entry = _entries.pop(key, None)
+    if entry is not None:
+        entry.done.set()
+    if shared and _shared is not None:
+        _shared.release(key)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
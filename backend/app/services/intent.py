@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
-_ID_PATTERN = re.compile(r"(?:^|\s)(?:#|id\s*[:#]?\s*|product\s+)(\d+)\b", re.IGNORECASE)
+from app.services.product_resolver import find_product_id
 
 # English + Nepali-ish keywords
 CS_TRIGGERS = (
@@ -106,7 +106,7 @@ def looks_like_exact_product(text: str) -> bool:
     and is not phrased like a budget/recommendation request.
     """
     t = normalize(text)
-    if _ID_PATTERN.search(text):
+    if find_product_id(text) is not None:
         return True
 
     if any(k in t for k in RECO_TRIGGERS):
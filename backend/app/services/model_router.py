@@ -0,0 +1,114 @@
+# app/services/model_router.py
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.gemini_client import gemini_light_answer, gemini_product_answer, build_prompt_prefix
+from app.services.gemini_scheduler import Priority
+from app.services.intent import GREETINGS, Intent, normalize
+
+# the system prompt mandates exactly this reply to a greeting
+GREETING_REPLY = "Hi! How can I help you today?"
+
+ROUTE_TURNS = metrics.counter("chat_route_turns_total", "Chat turns by model route")
+ROUTE_LATENCY = metrics.histogram("chat_route_latency_seconds", "Reply generation latency by model route")
+
+
+class Route(str, Enum):
+    TEMPLATE = "template"  # deterministic reply, no LLM call
+    LIGHT = "light"        # small talk: light model + short prompt
+    FULL = "full"          # product turns: full model + full prompt + products
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    route: Route
+    reason: str
+    reply: Optional[str] = None
+
+
+def _pending_handoff_offer(conversation_context: list[dict[str, str]]) -> bool:
+    """
+    The last bot message offered customer service: a short "yes"/"ok" reply
+    must go through the full prompt, which carries the handoff protocol.
+    """
+    for msg in reversed(conversation_context):
+        if msg.get("role") == "assistant":
+            return "customer service" in msg.get("content", "").lower()
+    return False
+
+
+def route_turn(
+    *,
+    user_message: str,
+    intent: Intent,
+    conversation_context: list[dict[str, str]],
+    retrieval_used: bool,
+) -> RouteDecision:
+    if not settings.model_routing_enabled:
+        return RouteDecision(Route.FULL, "routing disabled")
+
+    if retrieval_used or intent != Intent.CHAT:
+        return RouteDecision(Route.FULL, f"intent={intent.value}")
+
+    if _pending_handoff_offer(conversation_context):
+        return RouteDecision(Route.FULL, "handoff offer pending")
+
+    if normalize(user_message) in GREETINGS:
+        return RouteDecision(Route.TEMPLATE, "greeting", reply=GREETING_REPLY)
+
+    return RouteDecision(Route.LIGHT, "small talk")
+
+
+def prepare_prompt_prefix(
+    decision: RouteDecision,
+    *,
+    user_message: str,
+    conversation_history: list[dict[str, str]],
+    conversation_summary: Optional[str],
+) -> Optional[str]:
+    """Product-independent part of the prompt for `decision` (None for template replies)."""
+    if decision.route is Route.TEMPLATE:
+        return None
+    return build_prompt_prefix(decision.route is Route.LIGHT, user_message, conversation_history, conversation_summary)
+
+
+def generate_reply(
+    decision: RouteDecision,
+    *,
+    user_message: str,
+    products: list[dict[str, Any]],
+    conversation_history: list[dict[str, str]],
+    conversation_summary: Optional[str],
+    priority: Priority,
+    prompt_prefix: Optional[str] = None,
+) -> str:
+    """`prompt_prefix` must come from prepare_prompt_prefix() for this same decision."""
+    start = time.perf_counter()
+    try:
+        if decision.route is Route.TEMPLATE and decision.reply is not None:
+            return decision.reply
+        if decision.route is Route.LIGHT:
+            return gemini_light_answer(
+                prompt=user_message,
+                conversation_history=conversation_history,
+                conversation_summary=conversation_summary,
+                priority=priority,
+                prompt_prefix=prompt_prefix,
+            )
+        return gemini_product_answer(
+            prompt=user_message,
+            products=products,
+            conversation_history=conversation_history,
+            conversation_summary=conversation_summary,
+            priority=priority,
+            prompt_prefix=prompt_prefix,
+        )
+    finally:
+        ROUTE_TURNS.inc(route=decision.route.value)
+        ROUTE_LATENCY.observe(time.perf_counter() - start, route=decision.route.value)
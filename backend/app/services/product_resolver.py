@@ -0,0 +1,47 @@
+# app/services/product_resolver.py
+from __future__ import annotations
+
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Product
+
+_ID_PATTERN = re.compile(r"(?:^|\s)(?:#|id\s*[:#]?\s*|product\s+)(\d+)\b", re.IGNORECASE)
+
+# Session.info key; the session lives for one request, so this cache does too
+_CACHE_KEY = "product_by_id"
+
+
+def _cache(db: Session) -> dict[int, Optional[Product]]:
+    return db.info.setdefault(_CACHE_KEY, {})
+
+
+def find_product_id(text: str) -> int | None:
+    """Product id the user typed explicitly (#12, id 12, product 12), if any."""
+    m = _ID_PATTERN.search(text)
+    return int(m.group(1)) if m else None
+
+
+def get_product(db: Session, product_id: int) -> Optional[Product]:
+    """
+    Load a product once per request. Misses are cached too, so an unknown id
+    is not looked up again by the next caller.
+    """
+    cache = _cache(db)
+    if product_id not in cache:
+        cache[product_id] = db.get(Product, product_id)
+    return cache[product_id]
+
+
+def remember_products(db: Session, products: Iterable[Product]) -> None:
+    """Seed the cache with rows another query already loaded."""
+    cache = _cache(db)
+    for p in products:
+        cache.setdefault(p.id, p)
+
+
+def resolve_product_in_text(db: Session, text: str) -> Optional[Product]:
+    pid = find_product_id(text)
+    return get_product(db, pid) if pid is not None else None
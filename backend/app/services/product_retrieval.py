@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.models import Product
 from app.services.intent import Intent, parse_budget, extract_category, infer_context_from_history
+from app.services.product_resolver import get_product, remember_products
 from app.services.product_search import recommend_search, keyword_search
 
 # configurable cap for prompt safety (DB can be huge; Gemini context cannot)
@@ -88,7 +89,7 @@ def retrieve_products_for_prompt(
     # Exact lookup: prefer explicit #id, else keyword search
     if intent == Intent.EXACT_PRODUCT:
         if matched_product_id is not None:
-            p = db.query(Product).filter(Product.id == matched_product_id).first()
+            p = get_product(db, matched_product_id)  # already loaded by id extraction
             return RetrievalResult(
                 products=[p] if p else [],
                 used=True,
@@ -97,6 +98,7 @@ def retrieve_products_for_prompt(
 
         # model-ish token usually means exact lookup; keyword_search is fine
         prods = keyword_search(db, user_message, limit=limit)
+        remember_products(db, prods)
         return RetrievalResult(products=prods, used=True, reason="exact: keyword_search")
 
     # Recommendation / clarification: infer budget/category then recommend_search
@@ -109,10 +111,12 @@ def retrieve_products_for_prompt(
         category = category if category is not None else inferred.category
 
     prods = recommend_search(db, category=category, budget=budget, limit=limit)
+    remember_products(db, prods)
 
     # fallback: if recommendation filters yielded nothing, try keyword_search
     if not prods:
         prods = keyword_search(db, user_message, limit=limit)
+        remember_products(db, prods)
         return RetrievalResult(products=prods, used=True, reason="reco: fallback_keyword", budget=budget, category=category)
 
     return RetrievalResult(products=prods, used=True, reason="reco: recommend_search", budget=budget, category=category)
@@ -0,0 +1,173 @@
+# app/services/prompt_builder.py
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+# rendered product blocks kept in memory (one short string per catalog row)
+PRODUCT_BLOCK_CACHE_SIZE = int(os.getenv("PRODUCT_BLOCK_CACHE_SIZE", "4096"))
+
+PRODUCT_FIELDS = ("name", "category", "brand", "screen", "processor", "ram", "storage", "camera", "price")
+
+_SPEC_LABELS = (
+    ("brand", "Brand"),
+    ("screen", "Screen"),
+    ("processor", "Processor"),
+    ("ram", "RAM"),
+    ("storage", "Storage"),
+    ("camera", "Camera"),
+)
+
+_NO_HISTORY = "No previous conversation."
+_SUMMARY_HEADER = "CONVERSATION SUMMARY (earlier messages):\n"
+_HISTORY_HEADER = "PREVIOUS CONVERSATION:"
+_QUESTION_HEADER = "\n\nUSER QUESTION:\n"
+_PRODUCTS_HEADER = "\n\nAVAILABLE PRODUCTS:\n"
+_BLOCK_SEP = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 chars per token); good enough for budgets and metrics.
+    """
+    return (len(text) + 3) // 4
+
+
+def _render_product_block(values: tuple) -> str:
+    fields = dict(zip(PRODUCT_FIELDS, values))
+    name = str(fields["name"])[:500]
+
+    title = f"• {name}"
+    if fields["category"]:
+        title += f" ({fields['category']})"
+    lines: List[str] = [title]
+
+    for key, label in _SPEC_LABELS:
+        if fields[key]:
+            lines.append(f"  - {label}: {fields[key]}")
+    if fields["price"] is not None:
+        lines.append(f"  - Price: Rs {fields['price']}")
+
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=PRODUCT_BLOCK_CACHE_SIZE)
+def _cached_product_block(values: tuple) -> str:
+    return _render_product_block(values)
+
+
+def product_block(product: Dict[str, Any]) -> str:
+    """
+    Rendered prompt block for one product payload.
+    The payload has no id/updated_at (see products_to_gemini_payload), so the
+    field values themselves are the cache key: any edit to the row is a new key.
+    """
+    values = (
+        product.get("name", ""),
+        product.get("category", ""),
+        product.get("brand", ""),
+        product.get("screen", ""),
+        product.get("processor", ""),
+        product.get("ram", ""),
+        product.get("storage", ""),
+        product.get("camera", ""),
+        product.get("price"),
+    )
+    try:
+        return _cached_product_block(values)
+    except TypeError:
+        # unhashable value (not produced by our own payloads) -> render uncached
+        return _render_product_block(values)
+
+
+class PromptBuilder:
+    """
+    Builds the Gemini prompt from string parts: prefix (system prompt, history,
+    question) and the product block, each joined once.
+    Output is byte-identical to the original f-string template.
+    """
+
+    def __init__(self, system_instruction: str, max_product_chars: int = 3000) -> None:
+        # precompiled static prefix (the ~20 KB system prompt + separator)
+        self._prefix = system_instruction.lstrip() + "\n\n"
+        self.max_product_chars = max_product_chars
+
+    def _append_history(
+        self,
+        parts: List[str],
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: str | None,
+    ) -> None:
+        if conversation_summary:
+            parts.append(_SUMMARY_HEADER)
+            parts.append(conversation_summary)
+            parts.append("\n\n")
+        if not conversation_history:
+            parts.append(_NO_HISTORY)
+            return
+        parts.append(_HISTORY_HEADER)
+        for msg in conversation_history:
+            parts.append("\n")
+            parts.append(msg.get("role", "user").upper())
+            parts.append(": ")
+            parts.append(msg.get("content", ""))
+
+    def _append_products(self, parts: List[str], products: List[Dict[str, Any]]) -> None:
+        max_chars = self.max_product_chars
+        blocks: List[str] = []
+        used = 0
+        for p in products:
+            block = product_block(p)
+            used += len(block) + (len(_BLOCK_SEP) if blocks else 0)
+            blocks.append(block)
+            if used > max_chars:
+                # over budget: later blocks would be cut anyway, stop rendering
+                parts.append(_BLOCK_SEP.join(blocks)[: max_chars - len("...")].rstrip())
+                return
+
+        if not blocks:
+            return
+        last = len(blocks) - 1
+        for i, block in enumerate(blocks):
+            parts.append(block.rstrip() if i == last else block)
+            if i != last:
+                parts.append(_BLOCK_SEP)
+
+    def prefix(
+        self,
+        prompt: str,
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: str | None = None,
+    ) -> str:
+        """
+        Everything before the product block. Independent of retrieval, so the
+        chat pipeline prepares it while products are still being fetched.
+        """
+        parts: List[str] = [self._prefix]
+        self._append_history(parts, conversation_history, conversation_summary)
+        parts.append(_QUESTION_HEADER)
+        parts.append(prompt)
+        return "".join(parts)
+
+    def complete(self, prefix: str, products: List[Dict[str, Any]]) -> str:
+        parts: List[str] = [prefix]
+        if products:
+            parts.append(_PRODUCTS_HEADER)
+            self._append_products(parts, products)
+        else:
+            parts.append(_PRODUCTS_HEADER.rstrip())
+        return "".join(parts)
+
+    def build(
+        self,
+        prompt: str,
+        products: List[Dict[str, Any]],
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: str | None = None,
+    ) -> str:
+        return self.complete(self.prefix(prompt, conversation_history, conversation_summary), products)
+
+
+def cache_info() -> Any:
+    return _cached_product_block.cache_info()
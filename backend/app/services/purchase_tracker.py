@@ -8,8 +8,8 @@ from sqlalchemy.orm import Session
 
 from app.core.logging import logger
 from app.models import Product, UserProductHistory
+from app.services.product_resolver import resolve_product_in_text
 
-_ID_PATTERN = re.compile(r"(?:^|\s)(?:#|id\s*[:#]?\s*|product\s+)(\d+)\b", re.IGNORECASE)
 _TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
 
 # English + Nepali-ish purchase triggers
@@ -32,11 +32,8 @@ def _looks_like_purchase(text: str) -> bool:
     return any(w in t for w in _PURCHASE_TRIGGERS)
 
 def _find_product_by_id(db: Session, text: str) -> Optional[Product]:
-    m = _ID_PATTERN.search(text)
-    if not m:
-        return None
-    pid = int(m.group(1))
-    return db.query(Product).filter(Product.id == pid).first()
+    # through the session's product cache (product_resolver)
+    return resolve_product_in_text(db, text)
 
 def _find_product_by_keywords(db: Session, text: str) -> Optional[Product]:
     tokens = [t.lower() for t in _TOKEN_RE.findall(text)]
@@ -75,11 +72,12 @@ def save_user_product_history_if_purchase(db: Session, session_id: str, user_mes
         logger.info("Purchase intent detected but no product matched: %s", user_message)
         return
 
+    product_id = product.id  # read before the commit expires `product`
     entry = UserProductHistory(
         session_id=session_id,
-        product_id=product.id,
+        product_id=product_id,
         product_name=product.name,
     )
     db.add(entry)
     db.commit()
-    logger.info("Saved purchase tracking: session=%s product_id=%s", session_id, product.id)
\ No newline at end of file
+    logger.info("Saved purchase tracking: session=%s product_id=%s", session_id, product_id)
\ No newline at end of file
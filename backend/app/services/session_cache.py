@@ -0,0 +1,218 @@
+# app/services/session_cache.py
+"""
+Session metadata cache: answers "does this chat session exist, and what is its
+rolling summary" without a ChatSession query on every request.
+
+In-process TTL/LRU, optionally backed by Redis (SESSION_CACHE_REDIS_URL) so
+several workers share creations and retention deletes. Unknown ids are cached
+briefly as negatives to absorb floods of bad ids. The cache is invalidated on
+retention deletes and summary refreshes; a stale summary is still consistent
+with its own `summary_upto`, so at worst a turn sends a few more raw messages.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.models import ChatSession
+
+LOOKUPS = metrics.counter("session_cache_lookups_total", "Session metadata lookups by result (hit, negative_hit, miss)")
+
+_MISSING = object()  # not cached (distinct from a cached "does not exist")
+
+
+@dataclass(frozen=True)
+class SessionMeta:
+    summary: Optional[str] = None
+    summary_upto: Optional[datetime] = None
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+
+
+class _LocalCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, max_entries)
+        self._data: OrderedDict[str, tuple[float, Optional[SessionMeta]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Optional[SessionMeta], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _RedisStore:
+    """Shared layer. Any Redis error degrades to a cache miss, never a failed request."""
+
+    PREFIX = "chatbot:session:"
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+
+    @staticmethod
+    def _dump(value: Optional[SessionMeta]) -> str:
+        if value is None:
+            return json.dumps({"exists": False})
+        upto = value.summary_upto.isoformat() if value.summary_upto else None
+        return json.dumps({"exists": True, "summary": value.summary, "summary_upto": upto})
+
+    @staticmethod
+    def _load(raw: bytes) -> Optional[SessionMeta]:
+        data = json.loads(raw)
+        if not data.get("exists"):
+            return None
+        upto = data.get("summary_upto")
+        return SessionMeta(data.get("summary"), datetime.fromisoformat(upto) if upto else None)
+
+    def get(self, key: str) -> Any:
+        try:
+            raw = self._client.get(self.PREFIX + key)
+        except Exception:
+            logger.warning("Session cache store unavailable (get)", exc_info=True)
+            return _MISSING
+        return _MISSING if raw is None else self._load(raw)
+
+    def set(self, key: str, value: Optional[SessionMeta], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        try:
+            self._client.set(self.PREFIX + key, self._dump(value), px=int(ttl * 1000))
+        except Exception:
+            logger.warning("Session cache store unavailable (set)", exc_info=True)
+
+    def delete(self, keys: list[str]) -> None:
+        try:
+            self._client.delete(*(self.PREFIX + k for k in keys))
+        except Exception:
+            logger.warning("Session cache store unavailable (delete)", exc_info=True)
+
+
+_local = _LocalCache(settings.session_cache_max_entries)
+_shared: Optional[_RedisStore] = None
+if settings.session_cache_redis_url:
+    try:
+        _shared = _RedisStore(settings.session_cache_redis_url)
+    except ImportError:
+        logger.warning("SESSION_CACHE_REDIS_URL is set but redis is not installed; using the in-process cache only.")
+
+_hits = 0
+_misses = 0
+_stats_lock = threading.Lock()
+
+
+def _count(result: str) -> None:
+    global _hits, _misses
+    with _stats_lock:
+        if result == "miss":
+            _misses += 1
+        else:
+            _hits += 1
+    LOOKUPS.inc(result=result)
+
+
+def _ttl(value: Optional[SessionMeta]) -> float:
+    return settings.session_cache_ttl_seconds if value is not None else settings.session_cache_negative_ttl_seconds
+
+
+def _local_ttl(value: Optional[SessionMeta]) -> float:
+    # with a shared store, keep the per-worker copy short so other workers' deletes show up quickly
+    ttl = _ttl(value)
+    return min(ttl, settings.session_cache_local_ttl_seconds) if _shared is not None else ttl
+
+
+def _store(session_id: str, value: Optional[SessionMeta]) -> None:
+    _local.set(session_id, value, _local_ttl(value))
+    if _shared is not None:
+        _shared.set(session_id, value, _ttl(value))
+
+
+def get_session_meta(db: Session, session_id: str) -> Optional[SessionMeta]:
+    """Metadata of an existing session, or None if it does not exist."""
+    value = _local.get(session_id)
+    if value is _MISSING and _shared is not None:
+        value = _shared.get(session_id)
+        if value is not _MISSING:
+            _local.set(session_id, value, _local_ttl(value))
+    if value is not _MISSING:
+        _count("hit" if value is not None else "negative_hit")
+        return value
+
+    _count("miss")
+    row = (
+        db.query(ChatSession.summary, ChatSession.summary_upto)
+        .filter(ChatSession.session_id == session_id)
+        .first()
+    )
+    meta = SessionMeta(row.summary, row.summary_upto) if row else None
+    _store(session_id, meta)
+    return meta
+
+
+def session_exists(db: Session, session_id: str) -> bool:
+    return get_session_meta(db, session_id) is not None
+
+
+def remember_session(session_id: str, meta: SessionMeta = SessionMeta()) -> None:
+    """Prime the cache after creating a session (also clears a cached negative)."""
+    _store(session_id, meta)
+
+
+def invalidate_sessions(session_ids: Iterable[str]) -> None:
+    keys = list(session_ids)
+    if not keys:
+        return
+    for key in keys:
+        _local.delete(key)
+    if _shared is not None:
+        _shared.delete(keys)
+
+
+def cache_info() -> CacheInfo:
+    return CacheInfo(_hits, _misses, len(_local))
+
+
+def clear() -> None:
+    _local.clear()
@@ -0,0 +1,188 @@
+# app/services/warmup.py
+"""
+Startup warm-up, so the first users after a deploy don't pay for it:
+
+  db       open WARMUP_DB_CONNECTIONS pooled connections (TCP, auth, pre-ping)
+  replicas the same for each read replica, plus its first lag check
+  queries  run the hot /chat reads once (SQLAlchemy compiled-statement cache)
+  catalog  load each category's products and render their prompt blocks
+  intent   intent detection, routing and prompt prefixes for sample messages
+  gemini   SDK import, client construction and a 1-token preflight (in parallel)
+
+The worker reports ready (/readyz) only after `warm_up` returns. Every step is
+best effort: a failure is logged and counted, it never keeps the worker down.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.replicas import ReadSessionLocal, replicas
+from app.db.session import SessionLocal
+from app.models import ChatSession
+from app.services.chat_history import recent_messages
+from app.services.gemini_client import warm_up_client
+from app.services.human_handoff import get_flag
+from app.services.intent import CATEGORY_WORDS, Intent, detect_intent
+from app.services.model_router import prepare_prompt_prefix, route_turn
+from app.services.product_resolver import resolve_product_in_text
+from app.services.product_retrieval import products_to_gemini_payload, retrieve_products_for_prompt
+from app.services.prompt_builder import product_block
+
+WARMUP_SECONDS = metrics.gauge("app_warmup_seconds", "Startup warm-up duration by step")
+WARMUP_FAILURES = metrics.counter("app_warmup_failures_total", "Warm-up steps that failed (the worker still starts)")
+READY = metrics.gauge("app_ready", "1 when the worker reports ready on /readyz")
+
+# one per route and retrieval path
+_SAMPLE_MESSAGES = (
+    "hi",
+    "thanks, that helps",
+    "best phone under 40k",
+    "laptop for students under rs 80000",
+    "galaxy a54 price",
+    "#1",
+    "i want to talk to customer service",
+)
+
+_ready = threading.Event()
+_status = "starting"
+_status_lock = threading.Lock()
+_steps: dict[str, float] = {}
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def readiness() -> dict[str, Any]:
+    return {"status": _status, "warmup_seconds": dict(_steps)}
+
+
+def mark_ready() -> None:
+    """No-op once the worker is stopping: a cancelled warm-up still finishes in its thread."""
+    global _status
+    with _status_lock:
+        if _status == "stopping":
+            return
+        _status = "ready"
+        _ready.set()
+        READY.set(1)
+
+
+def mark_not_ready(status: str) -> None:
+    """e.g. "stopping": the load balancer drains the worker before it exits."""
+    global _status
+    with _status_lock:
+        _ready.clear()
+        _status = status
+        READY.set(0)
+
+
+def _open_connections(engine: Engine, count: int) -> None:
+    size = getattr(engine.pool, "size", None)
+    count = min(count, size()) if callable(size) else count  # overflow connections are not kept
+    if count <= 0:
+        return
+
+    def checkout(_: int) -> Connection:
+        conn = engine.connect()
+        conn.execute(text("SELECT 1"))
+        return conn
+
+    # held together, so the pool opens `count` distinct connections (in parallel)
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        conns = list(pool.map(checkout, range(count)))
+    for conn in conns:
+        conn.close()
+
+
+def _warm_replicas() -> None:
+    for replica in replicas:
+        _open_connections(replica.engine, settings.warmup_db_connections)
+        replica.refresh()  # lag unknown = replica unused; measure it before serving
+
+
+def _run_queries() -> None:
+    probe = str(uuid.uuid4())  # never exists: same statements, no rows, no cache entries
+    db = SessionLocal()
+    try:
+        db.get(ChatSession, probe)
+        get_flag(db, probe)
+        recent_messages(db, probe, 10)
+        resolve_product_in_text(db, "#1")
+    finally:
+        db.close()
+
+
+def _prime_catalog() -> None:
+    db = ReadSessionLocal()
+    try:
+        for category in CATEGORY_WORDS:
+            rr = retrieve_products_for_prompt(
+                db,
+                user_message=f"best {category}",
+                intent=Intent.RECOMMENDATION,
+                conversation_context=[],
+                matched_product_id=None,
+            )
+            for product in products_to_gemini_payload(rr.products):
+                product_block(product)
+    finally:
+        db.close()
+
+
+def _prime_intent() -> None:
+    for message in _SAMPLE_MESSAGES:
+        intent = detect_intent(message, [])
+        decision = route_turn(
+            user_message=message,
+            intent=intent,
+            conversation_context=[],
+            retrieval_used=intent in (Intent.EXACT_PRODUCT, Intent.RECOMMENDATION),
+        )
+        prepare_prompt_prefix(decision, user_message=message, conversation_history=[], conversation_summary=None)
+
+
+def _warm_gemini() -> None:
+    if not warm_up_client(preflight=settings.warmup_gemini_preflight) and settings.gemini_api_key:
+        WARMUP_FAILURES.inc(step="gemini")  # logged by warm_up_client
+
+
+def _step(name: str, fn: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception:
+        WARMUP_FAILURES.inc(step=name)
+        logger.warning("Warm-up step %s failed", name, exc_info=True)
+    _steps[name] = round(time.perf_counter() - started, 4)
+    WARMUP_SECONDS.set(_steps[name], step=name)
+
+
+def warm_up(engine: Engine) -> float:
+    """Run every step, then mark the worker ready. Returns the total seconds."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        gemini = pool.submit(_step, "gemini", _warm_gemini)  # network bound: overlaps the DB steps
+        _step("db", lambda: _open_connections(engine, settings.warmup_db_connections))
+        if replicas:
+            _step("replicas", _warm_replicas)
+        _step("queries", _run_queries)
+        _step("catalog", _prime_catalog)
+        _step("intent", _prime_intent)
+        gemini.result()
+    total = time.perf_counter() - started
+    mark_ready()
+    logger.info(
+        "Warm-up done in %.3fs (%s)", total, ", ".join(f"{name} {seconds:.3f}s" for name, seconds in _steps.items())
+    )
+    return total
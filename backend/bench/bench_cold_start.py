@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark: spawn a uvicorn worker and time how long it takes to
+listen, to report ready (/readyz) and to answer its first /chat, in three modes:
+
+  schema_at_boot      STARTUP_CREATE_SCHEMA=true,  WARMUP_ENABLED=false
+  migrate_per_deploy  STARTUP_CREATE_SCHEMA=false, WARMUP_ENABLED=false
+  warmed              STARTUP_CREATE_SCHEMA=false, WARMUP_ENABLED=true
+
+    cd backend && python bench/bench_cold_start.py --runs 5
+    cd backend && python bench/bench_cold_start.py --database-url mysql+pymysql://u:p@127.0.0.1/chatbot_bench
+
+The schema is migrated and a catalog seeded once up front, as a deploy would.
+Gemini is the in-process fake server. The first /chat is sent as soon as the
+worker is ready (for the unwarmed modes: as soon as it listens), so its latency
+includes whatever the worker did not set up in advance.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gemini import FakeGeminiConfig, start_fake_gemini  # noqa: E402
+from load_test import Client, _free_port  # noqa: E402
+
+MODES = (
+    ("schema_at_boot", "true", "false"),
+    ("migrate_per_deploy", "false", "false"),
+    ("warmed", "false", "true"),
+)
+_GAUGE = 'app_startup_seconds{phase="%s"}'
+
+
+def _gauges(text: str) -> dict[str, float]:
+    values = {}
+    for line in text.splitlines():
+        for phase in ("import", "startup", "warmup"):
+            if line.startswith(_GAUGE % phase):
+                values[phase] = float(line.split()[-1])
+    return values
+
+
+def _wait_for(client: Client, path: str, deadline: float, proc: subprocess.Popen) -> None:
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}:\n{proc.stderr.read().decode()[-2000:]}")
+        status, _ = client.request("GET", path)
+        if status == 200:
+            return
+        time.sleep(0.01)
+    raise SystemExit(f"{path} did not answer 200 in time")
+
+
+def cold_start(env: dict[str, str], timeout: float = 60.0) -> dict[str, float]:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    client = Client(f"http://127.0.0.1:{port}", timeout=timeout)
+    try:
+        deadline = started + timeout
+        _wait_for(client, "/healthz", deadline, proc)
+        listening = time.perf_counter() - started
+        _wait_for(client, "/readyz", deadline, proc)
+        ready = time.perf_counter() - started
+
+        status, body = client.request("POST", "/create_session")
+        if status != 201:
+            raise SystemExit(f"/create_session returned {status}: {body}")
+        t0 = time.perf_counter()
+        status, body = client.request("POST", "/chat", {"session_id": body["session_id"], "message": "best phone under 40k"})
+        first_chat = time.perf_counter() - t0
+        if status != 200:
+            raise SystemExit(f"/chat returned {status}: {body}")
+
+        _, text = client.request("GET", "/metrics")
+        return {"listening": listening, "ready": ready, "first_chat": first_chat, **_gauges(text or "")}
+    finally:
+        client.close()
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _p50(values: list[float]) -> float:
+    return sorted(values)[len(values) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'chatbot-cold-start.db')}",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--gemini-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    gemini = start_fake_gemini(config=FakeGeminiConfig(latency_ms=args.gemini_latency_ms))
+    base_env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url,
+        GEMINI_API_KEY="fake",
+        GEMINI_BASE_URL=gemini.base_url,
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+    )
+    subprocess.run(
+        [sys.executable, os.path.join(BENCH_DIR, "seed_catalog.py"), "--products", str(args.products),
+         "--sessions", "0", "--reset"],
+        cwd=BACKEND_DIR, env=base_env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+    cols = ("listening", "ready", "first_chat", "import", "startup", "warmup")
+    print(f"{'mode':>18}  " + "  ".join(f"{c + '_s':>12}" for c in cols))
+    for mode, create_schema, warmup in MODES:
+        env = dict(base_env, STARTUP_CREATE_SCHEMA=create_schema, WARMUP_ENABLED=warmup)
+        runs = [cold_start(env) for _ in range(args.runs)]
+        row = [_p50([r.get(c, 0.0) for r in runs]) for c in cols]
+        print(f"{mode:>18}  " + "  ".join(f"{v:>12.3f}" for v in row))
+    gemini.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Primary-key layout benchmark for chat_history: random UUIDv4 strings vs
+time-ordered UUIDv7 strings vs UUIDv7 as BINARY(16).
+
+    cd backend && python bench/bench_keys.py --rows 200000
+    cd backend && python bench/bench_keys.py --database-url mysql+pymysql://u:p@127.0.0.1/chatbot_bench --rows 10000000
+
+Each variant gets its own table shaped like chat_history (same secondary indexes).
+Rows are inserted in --batch sized transactions in created_at order, like live traffic.
+Reported per variant:
+  - insert rate overall and over the last 10% of rows (page splits show up as the
+    index outgrows the buffer pool, so the tail rate is the interesting one)
+  - data + index size
+  - p50/p95 of the per-session history read (session_id, ORDER BY created_at DESC LIMIT 50)
+  - p50/p95 of a primary-key range scan (ORDER BY id DESC LIMIT 1000: newest rows for v7)
+With SQLite each variant uses its own database file so file size is comparable.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Index, LargeBinary, MetaData, String, Table, Text, bindparam, create_engine, text  # noqa: E402
+from sqlalchemy.dialects.mysql import BINARY  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app.db.ids import uuid7  # noqa: E402
+
+VARIANTS = ("uuid4_str", "uuid7_str", "uuid7_bin")
+
+
+def _table(metadata: MetaData, variant: str, mysql: bool) -> Table:
+    if variant == "uuid7_bin":
+        key = BINARY(16) if mysql else LargeBinary(16)
+    else:
+        key = String(64)
+    name = f"kb_{variant}"
+    return Table(
+        name,
+        metadata,
+        Column("id", key, primary_key=True),
+        Column("session_id", String(64), nullable=False),
+        Column("role", String(20), nullable=False),
+        Column("message", Text, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index(f"ix_{name}_session_id", "session_id"),
+        Index(f"ix_{name}_created_at", "created_at"),
+    )
+
+
+def _key(variant: str):
+    if variant == "uuid4_str":
+        return lambda: str(uuid.uuid4())
+    if variant == "uuid7_str":
+        return lambda: str(uuid7())
+    return lambda: uuid7().bytes
+
+
+def _engine(url_template: str, variant: str) -> Engine:
+    url = url_template.format(variant=variant)
+    return create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+
+
+def _size_mb(engine: Engine, table: Table) -> float:
+    with engine.connect() as conn:
+        if engine.dialect.name == "mysql":
+            conn.execute(text(f"ANALYZE TABLE {table.name}"))
+            row = conn.execute(
+                text(
+                    "SELECT data_length + index_length FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = :t"
+                ),
+                {"t": table.name},
+            ).first()
+            return round((row[0] or 0) / 1e6, 1)
+        page_count = conn.execute(text("PRAGMA page_count")).scalar_one()
+        page_size = conn.execute(text("PRAGMA page_size")).scalar_one()
+        return round(page_count * page_size / 1e6, 1)
+
+
+def _pct(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000 if ordered else 0.0
+
+
+def run_variant(engine: Engine, variant: str, *, rows: int, batch: int, sessions: int, scans: int, seed: int) -> dict:
+    mysql = engine.dialect.name == "mysql"
+    metadata = MetaData()
+    table = _table(metadata, variant, mysql)
+    metadata.drop_all(engine, tables=[table])
+    metadata.create_all(engine, tables=[table])
+
+    rng = random.Random(seed)
+    make_key = _key(variant)
+    session_ids = [str(uuid7()) for _ in range(sessions)]
+    ts = datetime(2025, 1, 1)
+    tail_from = rows - max(1, rows // 10)
+
+    inserted = 0
+    started = time.perf_counter()
+    tail_started = started
+    while inserted < rows:
+        n = min(batch, rows - inserted)
+        payload = []
+        for _ in range(n):
+            ts += timedelta(milliseconds=5)
+            payload.append(
+                {
+                    "id": make_key(),
+                    "session_id": rng.choice(session_ids),
+                    "role": "user" if inserted % 2 else "assistant",
+                    "message": "best phone under 40k",
+                    "created_at": ts,
+                }
+            )
+        if inserted <= tail_from < inserted + n:
+            tail_started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(table.insert(), payload)
+        inserted += n
+    finished = time.perf_counter()
+
+    history_times = []
+    pk_times = []
+    with engine.connect() as conn:
+        history_sql = table.select().where(table.c.session_id == bindparam("sid")).order_by(table.c.created_at.desc()).limit(50)
+        pk_sql = table.select().order_by(table.c.id.desc()).limit(1000)
+        for _ in range(scans):
+            t0 = time.perf_counter()
+            conn.execute(history_sql, {"sid": rng.choice(session_ids)}).fetchall()
+            history_times.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            conn.execute(pk_sql).fetchall()
+            pk_times.append(time.perf_counter() - t0)
+
+    tail_rows = rows - tail_from
+    return {
+        "variant": variant,
+        "insert_rows_per_s": round(rows / (finished - started)),
+        "tail_insert_rows_per_s": round(tail_rows / max(finished - tail_started, 1e-9)),
+        "size_mb": _size_mb(engine, table),
+        "history_p50_ms": round(_pct(history_times, 50), 3),
+        "history_p95_ms": round(_pct(history_times, 95), 3),
+        "pk_range_p50_ms": round(_pct(pk_times, 50), 3),
+        "pk_range_p95_ms": round(_pct(pk_times, 95), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'chatbot-keys-{variant}.db')}",
+        help="SQLAlchemy URL; '{variant}' is replaced per variant (SQLite: one file each)",
+    )
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark tables")
+    args = parser.parse_args()
+
+    results = []
+    for variant in args.variants.split(","):
+        variant = variant.strip()
+        if variant not in VARIANTS:
+            raise SystemExit(f"unknown variant {variant!r}; choose from {', '.join(VARIANTS)}")
+        engine = _engine(args.database_url, variant)
+        print(f"{variant}: inserting {args.rows} rows ...", flush=True)
+        results.append(
+            run_variant(engine, variant, rows=args.rows, batch=args.batch, sessions=args.sessions, scans=args.scans, seed=args.seed)
+        )
+        if not args.keep:
+            metadata = MetaData()
+            _table(metadata, variant, engine.dialect.name == "mysql")
+            metadata.drop_all(engine)
+        engine.dispose()
+
+    cols = ("variant", "insert_rows_per_s", "tail_insert_rows_per_s", "size_mb",
+            "history_p50_ms", "history_p95_ms", "pk_range_p50_ms", "pk_range_p95_ms")
+    print()
+    print("  ".join(f"{c:>22}" for c in cols))
+    for r in results:
+        print("  ".join(f"{r[c]!s:>22}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+/chat critical-path benchmark: sequential stages vs the concurrent stage graph
+(CHAT_CONCURRENT_STAGES=false / true) against a slow fake DB.
+
+    cd backend && python bench/bench_pipeline.py --db-latency-ms 5 --turns 60
+    cd backend && python bench/bench_pipeline.py --db-latency-ms 2 --gemini-latency-ms 300 --turns 40
+
+Every SQL statement sleeps --db-latency-ms before it executes (a network round trip
+to a remote MySQL), on a seeded SQLite catalog. Gemini is the in-process fake server.
+One user sends --turns chat turns one at a time (greetings, budget recommendations,
+exact lookups by #id, follow-ups), so the latency measured is the turn's critical
+path, not throughput. Each mode runs in its own process with a fresh database.
+
+Reports p50/p95/mean turn latency per mode, DB statements per turn, and the
+reduction of the concurrent graph relative to the sequential one. Statements are
+counted at the engine, and TestClient returns only after the turn's background
+summary/trim jobs, so those are included here (db_queries_per_request reports
+them separately, under route="background:<job>").
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+TURNS = (
+    "hi",
+    "best phone under 40k",
+    "which one has the best camera?",
+    "#{pid}",
+    "laptop under 80k for students",
+    "tell me more about the first one",
+    "thanks",
+)
+
+
+def _pct(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000 if ordered else 0.0
+
+
+def run_worker(args: argparse.Namespace) -> dict:
+    """Runs inside a child process whose environment selects the mode."""
+    from fake_gemini import FakeGeminiConfig, start_fake_gemini
+    from seed_catalog import seed_database
+
+    server = start_fake_gemini(config=FakeGeminiConfig(latency_ms=args.gemini_latency_ms))
+    os.environ["GEMINI_BASE_URL"] = server.base_url
+
+    seed_database(products=args.products, sessions=0, messages_per_session=0, batch_size=1000, reset=True, seed=7)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.db import engine
+    from app.main import app
+
+    delay = args.db_latency_ms / 1000.0
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _slow(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        nonlocal statements
+        statements += 1
+        if delay:
+            time.sleep(delay)
+
+    latencies: list[float] = []
+    measured_statements = 0
+    with TestClient(app) as client:
+        session_id = client.post("/create_session").json()["session_id"]
+        for turn in range(args.warmup + args.turns):
+            message = TURNS[turn % len(TURNS)].format(pid=1 + turn % max(1, args.products))
+            before = statements
+            t0 = time.perf_counter()
+            r = client.post("/chat", json={"session_id": session_id, "message": message})
+            elapsed = time.perf_counter() - t0
+            if r.status_code != 200:
+                raise SystemExit(f"/chat returned {r.status_code}: {r.text}")
+            if turn >= args.warmup:
+                latencies.append(elapsed)
+                measured_statements += statements - before
+    server.shutdown()
+    return {
+        "p50_ms": round(_pct(latencies, 50), 2),
+        "p95_ms": round(_pct(latencies, 95), 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "statements_per_turn": round(measured_statements / len(latencies), 1),
+    }
+
+
+def run_mode(args: argparse.Namespace, concurrent: bool) -> dict:
+    db_path = os.path.join(tempfile.gettempdir(), f"chatbot-pipeline-{'concurrent' if concurrent else 'sequential'}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        CHAT_CONCURRENT_STAGES="true" if concurrent else "false",
+        GEMINI_API_KEY="fake",
+        GEMINI_RPM="0",
+        GEMINI_TPM="0",
+        GEMINI_SINGLE_FLIGHT="false",
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+        TRACING_ENABLED=os.environ.get("TRACING_ENABLED", "false"),
+    )
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--turns", str(args.turns), "--warmup", str(args.warmup), "--products", str(args.products),
+        "--db-latency-ms", str(args.db_latency_ms), "--gemini-latency-ms", str(args.gemini_latency_ms),
+    ]
+    out = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(f"worker failed:\n{out.stderr[-4000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--warmup", type=int, default=7)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="sleep before every SQL statement")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    results = {}
+    for name, concurrent in (("sequential", False), ("concurrent", True)):
+        print(f"{name}: {args.turns} turns, db latency {args.db_latency_ms} ms ...", flush=True)
+        results[name] = run_mode(args, concurrent)
+
+    print()
+    cols = ("p50_ms", "p95_ms", "mean_ms", "statements_per_turn")
+    print(f"{'mode':>12}  " + "  ".join(f"{c:>20}" for c in cols))
+    for name, r in results.items():
+        print(f"{name:>12}  " + "  ".join(f"{r[c]!s:>20}" for c in cols))
+    seq, conc = results["sequential"], results["concurrent"]
+    for c in ("p50_ms", "p95_ms", "mean_ms"):
+        saved = seq[c] - conc[c]
+        print(f"{c}: -{saved:.2f} ms ({saved / seq[c] * 100 if seq[c] else 0:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Prompt-build benchmark: original f-string assembly vs PromptBuilder.
+
+    cd backend && python bench/bench_prompt_build.py --products 200 --iterations 2000
+
+The original assembly (legacy_build and its two helpers, formerly in
+gemini_client) is kept here as the reference; tests/test_prompt_builder.py
+checks that PromptBuilder output stays byte-identical to it.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.gemini_client import SYSTEM_INSTRUCTION  # noqa: E402
+from app.services.prompt_builder import PromptBuilder, cache_info  # noqa: E402
+
+
+def make_products(n: int) -> list[dict]:
+    return [
+        {
+            "name": f"Acme Phone {i} Pro",
+            "category": "mobile" if i % 2 else "laptop",
+            "brand": "Acme",
+            "screen": '6.5" AMOLED',
+            "processor": "Snapdragon 7 Gen 1",
+            "ram": "8GB",
+            "storage": "256GB",
+            "camera": "50MP" if i % 3 else None,
+            "price": 30000.0 + i * 250,
+        }
+        for i in range(n)
+    ]
+
+
+def make_history(n: int) -> list[dict[str, str]]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message number {i} about phones under 50k"}
+        for i in range(n)
+    ]
+
+
+def _safe_product_text(products: List[Dict[str, Any]], max_chars: int = 3000) -> str:
+    blocks: List[str] = []
+    for p in products:
+        name = str(p.get("name", ""))[:500]
+        category = p.get("category", "")
+        brand = p.get("brand", "")
+        screen = p.get("screen", "")
+        processor = p.get("processor", "")
+        ram = p.get("ram", "")
+        storage = p.get("storage", "")
+        camera = p.get("camera", "")
+        price = p.get("price")
+
+        lines: List[str] = []
+        title = f"• {name}"
+        if category:
+            title += f" ({category})"
+        lines.append(title)
+
+        if brand:
+            lines.append(f"  - Brand: {brand}")
+        if screen:
+            lines.append(f"  - Screen: {screen}")
+        if processor:
+            lines.append(f"  - Processor: {processor}")
+        if ram:
+            lines.append(f"  - RAM: {ram}")
+        if storage:
+            lines.append(f"  - Storage: {storage}")
+        if camera:
+            lines.append(f"  - Camera: {camera}")
+        if price is not None:
+            lines.append(f"  - Price: Rs {price}")
+
+        blocks.append("\n".join(lines))
+
+    text = "\n\n".join(blocks)
+    if len(text) > max_chars:
+        text = text[: max_chars - len("...")]
+    return text
+
+
+def _format_conversation_history(conversation_history: List[Dict[str, str]]) -> str:
+    if not conversation_history:
+        return "No previous conversation."
+    lines: List[str] = ["PREVIOUS CONVERSATION:"]
+    for msg in conversation_history:
+        role = msg.get("role", "user").upper()
+        content = msg.get("content", "")
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+def legacy_build(prompt: str, products: list[dict], history: list[dict[str, str]]) -> str:
+    return f"""
+{SYSTEM_INSTRUCTION}
+
+{_format_conversation_history(history)}
+
+USER QUESTION:
+{prompt}
+
+AVAILABLE PRODUCTS:
+{_safe_product_text(products)}
+""".strip()
+
+
+def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--history", type=int, default=12)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    history = make_history(args.history)
+    prompt = "laptop under 80k for gaming"
+    builder = PromptBuilder(SYSTEM_INSTRUCTION)
+
+    for p, h in ((products, history), ([], []), (products[:3], history[:1])):
+        assert builder.build(prompt, p, h) == legacy_build(prompt, p, h), "builder output differs from legacy prompt"
+
+    legacy_us = timed(lambda: legacy_build(prompt, products, history), args.iterations)
+    builder_us = timed(lambda: builder.build(prompt, products, history), args.iterations)
+
+    print(f"products={args.products} history={args.history} iterations={args.iterations}")
+    print(f"legacy  : {legacy_us:8.1f} us/prompt")
+    print(f"builder : {builder_us:8.1f} us/prompt  ({legacy_us / builder_us:.1f}x)")
+    print(f"block cache: {cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
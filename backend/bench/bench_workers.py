@@ -0,0 +1,160 @@
+"""
+Multi-worker scaling benchmark: throughput of the gunicorn profile
+(gunicorn.conf.py, preloaded and forked) at 1, 2, 4, ... workers.
+
+    cd backend && python bench/bench_workers.py --workers 1,2,4 --duration 30
+    cd backend && python bench/bench_workers.py --database-url mysql+pymysql://u:p@127.0.0.1/chatbot_bench \\
+        --workers 1,2,4,8 --users-per-worker 16 --load-procs 4
+
+For each worker count the app is started with WEB_CONCURRENCY=N against the fake
+Gemini server (its own process), and --load-procs bench/load_test.py processes drive
+it with N * --users-per-worker virtual users in total (--app-url mode), so the load
+generator is not the bottleneck. Reported: total requests/s, /chat p95, and scaling
+efficiency (throughput / (N * throughput at the first worker count)).
+
+Scaling is only linear up to the number of free cores (the load generator and the
+fake Gemini need some too) and with a database that takes concurrent writes: on
+SQLite every /chat write serializes on the file lock, so use MySQL for real numbers.
+--server uvicorn runs `uvicorn --workers N` (spawned, not forked) for comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import Client, _free_port  # noqa: E402
+
+
+def start_app(server: str, workers: int, env: dict[str, str], log_path: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    if server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"]
+        env = dict(env, BIND=f"127.0.0.1:{port}")
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+    with open(log_path, "ab") as log:
+        proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=dict(env, WEB_CONCURRENCY=str(workers)),
+                                stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    # every worker warms up on its own: wait until many consecutive probes say ready
+    client = Client(base_url, timeout=2)
+    deadline, streak = time.monotonic() + 120, 0
+    try:
+        while streak < 4 * workers:
+            if proc.poll() is not None:
+                raise SystemExit(f"server exited with {proc.returncode}; see {log_path}")
+            if time.monotonic() > deadline:
+                raise SystemExit(f"server not ready after 120s; see {log_path}")
+            status, _ = client.request("GET", "/readyz")
+            streak = streak + 1 if status == 200 else 0
+            time.sleep(0.02 if streak else 0.2)
+    finally:
+        client.close()
+    return proc, base_url
+
+
+def drive(args: argparse.Namespace, base_url: str, users: int) -> dict:
+    procs = max(1, min(args.load_procs, users))
+    reports = [os.path.join(tempfile.gettempdir(), f"chatbot-workers-load-{i}.json") for i in range(procs)]
+    children = []
+    for i, report in enumerate(reports):
+        cmd = [
+            sys.executable, os.path.join(BENCH_DIR, "load_test.py"), "--app-url", base_url, "--no-seed",
+            "--products", str(args.products), "--users", str(users // procs + (1 if i < users % procs else 0)),
+            "--duration", str(args.duration), "--warmup", str(args.warmup), "--mix", args.mix,
+            "--seed", str(args.seed + i), "--report", report,
+        ]
+        children.append(subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE))
+    results = []
+    for child, report in zip(children, reports):
+        _, err = child.communicate()
+        if child.returncode != 0:
+            raise SystemExit(f"load generator failed:\n{err.decode()[-2000:]}")
+        with open(report, encoding="utf-8") as fh:
+            results.append(json.load(fh))
+
+    chat = [r["endpoints"].get("POST /chat", {}) for r in results]
+    return {
+        "rps": round(sum(r["throughput_rps"] for r in results), 2),
+        "chat_p95_ms": max((c.get("p95_ms", 0.0) for c in chat), default=0.0),
+        "errors": sum(sum(r["errors"].values()) for r in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--database-url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'chatbot-workers.db')}"
+    )
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--users-per-worker", type=int, default=8)
+    parser.add_argument("--load-procs", type=int, default=2, help="load generator processes")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--mix", default="greeting=30,budget=30,exact=30,history=10")
+    parser.add_argument("--gemini-latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server-log", default=os.path.join(tempfile.gettempdir(), "chatbot-workers-server.log"))
+    args = parser.parse_args()
+
+    gemini_port = _free_port()
+    gemini = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_gemini.py"), "--port", str(gemini_port),
+         "--latency-ms", str(args.gemini_latency_ms)],
+        stdout=subprocess.DEVNULL,
+    )
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url,
+        GEMINI_API_KEY="fake",
+        GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+        GEMINI_RPM="0",
+        GEMINI_TPM="0",
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+        TRACING_ENABLED=os.environ.get("TRACING_ENABLED", "false"),
+    )
+    subprocess.run([sys.executable, "-m", "app.db.migrate"], cwd=BACKEND_DIR, env=env, check=True)
+    subprocess.run(
+        [sys.executable, os.path.join(BENCH_DIR, "seed_catalog.py"), "--products", str(args.products),
+         "--sessions", "0", "--seed", str(args.seed)],
+        cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+    print(f"cores: {os.cpu_count()}, server: {args.server}, db: {args.database_url.split(':', 1)[0]}")
+    print(f"{'workers':>8}  {'users':>6}  {'req/s':>9}  {'chat_p95_ms':>12}  {'errors':>7}  {'efficiency':>10}")
+    base = None
+    try:
+        for workers in (int(w) for w in args.workers.split(",")):
+            proc, base_url = start_app(args.server, workers, env, args.server_log)
+            try:
+                users = workers * args.users_per_worker
+                r = drive(args, base_url, users)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            base = base or (r["rps"] / workers)
+            efficiency = r["rps"] / (base * workers) if base else 0.0
+            print(
+                f"{workers:>8}  {users:>6}  {r['rps']:>9}  {r['chat_p95_ms']:>12}  {r['errors']:>7}  {efficiency:>10.2f}",
+                flush=True,
+            )
+    finally:
+        gemini.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+EXPLAIN check for the chat_history hot queries. Exits 1 if any of them stops
+using ix_chat_history_session_created, falls back to a full scan, or needs a
+filesort / temp B-tree for ORDER BY. Run it after schema or query changes (CI).
+
+    cd backend && DATABASE_URL=sqlite:////tmp/chatbot-loadtest.db python bench/explain_plans.py
+    cd backend && DATABASE_URL=mysql+pymysql://u:p@127.0.0.1/chatbot_bench python bench/explain_plans.py --analyze
+
+The queries are built by app/services/chat_history.py, i.e. exactly what the app runs.
+MySQL may ignore an index on an (almost) empty table; seed first (bench/seed_catalog.py).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.engine import Connection  # noqa: E402
+from sqlalchemy.orm import Query  # noqa: E402
+
+from app import models as _models  # noqa: E402,F401
+from app.db import engine  # noqa: E402
+from app.db.migrate import migrate  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.services.chat_history import (  # noqa: E402
+    SESSION_CREATED_INDEX,
+    cap_boundary_query,
+    delete_before_query,
+    messages_after_query,
+    recent_messages_query,
+    session_history_query,
+)
+
+SAMPLE_SESSION = "00000000-0000-7000-8000-000000000000"
+
+
+def _explain(conn: Connection, query: Query) -> list[dict]:
+    compiled = query.statement.compile(dialect=engine.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    result = conn.exec_driver_sql(prefix + str(compiled), params)
+    return [dict(row._mapping) for row in result]
+
+
+def _problems(plan: list[dict]) -> list[str]:
+    problems: list[str] = []
+    if engine.dialect.name == "sqlite":
+        details = [str(row.get("detail", "")) for row in plan]
+        if not any(SESSION_CREATED_INDEX in d for d in details):
+            problems.append(f"does not use {SESSION_CREATED_INDEX}")
+        if any("TEMP B-TREE" in d for d in details):
+            problems.append("sorts in a temp B-tree")
+        return problems
+
+    for row in plan:
+        if row.get("table") != "chat_history":
+            continue
+        if row.get("type") == "ALL":
+            problems.append("full table scan")
+        if row.get("key") != SESSION_CREATED_INDEX:
+            problems.append(f"uses index {row.get('key')!r}, expected {SESSION_CREATED_INDEX}")
+        if "filesort" in str(row.get("Extra") or ""):
+            problems.append("filesort")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyze", action="store_true", help="refresh table statistics first (MySQL)")
+    args = parser.parse_args()
+
+    migrate(engine)
+
+    db = SessionLocal()
+    queries = {
+        "history (GET /history)": session_history_query(db, SAMPLE_SESSION),
+        "chat context (newest N)": recent_messages_query(db, SAMPLE_SESSION, 36),
+        "summary refresh (after upto)": messages_after_query(db, SAMPLE_SESSION, datetime(2025, 1, 1)),
+        "trim probe (cap boundary)": cap_boundary_query(db, SAMPLE_SESSION, keep=50),
+        "trim delete (rows before cutoff)": delete_before_query(db, SAMPLE_SESSION, datetime(2025, 1, 1)),
+    }
+
+    failed = 0
+    with engine.connect() as conn:
+        if args.analyze and engine.dialect.name == "mysql":
+            conn.execute(text("ANALYZE TABLE chat_history"))
+        for name, query in queries.items():
+            plan = _explain(conn, query)
+            problems = _problems(plan)
+            print(f"[{'FAIL' if problems else 'ok'}] {name}")
+            for row in plan:
+                print(f"       {row}")
+            for problem in problems:
+                print(f"       -> {problem}")
+            failed += bool(problems)
+    db.close()
+
+    if failed:
+        print(f"\n{failed} query plan(s) regressed")
+        sys.exit(1)
+    print("\nall chat_history queries use the composite index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Fake Gemini API server (generateContent only) for tests and benchmarks.
+
+    cd backend && python bench/fake_gemini.py --port 8765 --latency-ms 800 --jitter-ms 200 --error-rate 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake uvicorn app.main:app
+
+Replies are deterministic per prompt; latency and failures are configurable and can be
+changed at runtime on the returned server object (server.config).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class FakeGeminiConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_code: int = 503
+    hang_rate: float = 0.0  # requests that sleep `hang_ms` (deadline/hedging tests)
+    hang_ms: float = 60000.0
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: FakeGeminiConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+def _question(contents: str) -> str:
+    marker = "USER QUESTION:\n"
+    start = contents.find(marker)
+    if start < 0:
+        return contents[-200:]
+    start += len(marker)
+    end = contents.find("\n\n", start)
+    return contents[start:end if end >= 0 else None]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeGeminiServer
+
+    def log_message(self, format: str, *args: object) -> None:  # keep benchmark output clean
+        return
+
+    def _send(self, code: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        if ":generateContent" not in self.path:
+            self._send(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+            return
+
+        self.server.count()
+        cfg = self.server.config
+        if cfg.hang_rate and random.random() < cfg.hang_rate:
+            time.sleep(cfg.hang_ms / 1000.0)
+        delay = max(0.0, cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms))
+        if delay:
+            time.sleep(delay / 1000.0)
+
+        if cfg.error_rate and random.random() < cfg.error_rate:
+            self._send(cfg.error_code, {"error": {"code": cfg.error_code, "message": "fake failure", "status": "UNAVAILABLE"}})
+            return
+
+        try:
+            req = json.loads(raw or b"{}")
+            contents = req["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            contents = ""
+        question = _question(contents)
+        text = f"Fake answer: {question[:120]}"
+        self._send(
+            200,
+            {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": {
+                    "promptTokenCount": (len(contents) + 3) // 4,
+                    "candidatesTokenCount": (len(text) + 3) // 4,
+                    "totalTokenCount": (len(contents) + len(text) + 6) // 4,
+                },
+            },
+        )
+
+
+def start_fake_gemini(host: str = "127.0.0.1", port: int = 0, config: FakeGeminiConfig | None = None) -> FakeGeminiServer:
+    """Start in a daemon thread; port=0 picks a free port (see server.base_url)."""
+    server = FakeGeminiServer((host, port), config or FakeGeminiConfig())
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-code", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_code=args.error_code,
+        hang_rate=args.hang_rate,
+    )
+    server = FakeGeminiServer((args.host, args.port), config)
+    print(f"fake gemini listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+End-to-end load test: app.main:app + fake Gemini + seeded catalog, mixed chat traffic.
+
+    cd backend && python bench/load_test.py --products 10000 --users 16 --duration 60 --gemini-latency-ms 800
+    cd backend && python bench/load_test.py --database-url mysql+pymysql://u:p@127.0.0.1/chatbot_bench \\
+        --products 1000000 --users 32 --report bench/results/mysql-1m.json
+    cd backend && python bench/load_test.py --report new.json --baseline base.json --tolerance 0.15
+
+Starts the fake Gemini server in-process and uvicorn (one worker) as a subprocess, seeds
+the catalog (bench/seed_catalog.py, idempotent for products), then runs --users virtual
+users for --duration seconds. Each user opens a session and sends a weighted mix of turns
+(--mix): greetings, budget recommendations, exact lookups by #id or model name,
+follow-ups, and history reads. Samples taken during --warmup are discarded.
+
+Reports throughput, p50/p95/p99 per endpoint (and per chat turn kind), error counts,
+DB statements per chat turn (from /metrics) and server RSS. With --baseline, exits 1
+when p95/p99 or statements per turn grow, or throughput drops, by more than --tolerance.
+
+GEMINI_RPM/GEMINI_TPM default to 0 (unlimited) for the spawned app; export them to
+benchmark with quota shaping. Other app settings pass through the environment.
+
+Note: the app keeps only the newest 20 sessions, so with many users some sessions are
+trimmed mid-conversation; those turns show up as 404s and the user opens a new session.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gemini import FakeGeminiConfig, start_fake_gemini  # noqa: E402
+from seed_catalog import product_names  # noqa: E402
+
+DEFAULT_MIX = "greeting=15,budget=30,exact=25,followup=20,history=10"
+
+GREETINGS = ("hi", "hello", "namaste", "hey")
+BUDGET_TURNS = (
+    "best phone under {k}k",
+    "suggest a laptop within rs {rs}",
+    "good camera mobile under {k}k",
+    "tablet for study under {k}k",
+    "gaming laptop bhitra {k}k",
+)
+FOLLOWUPS = (
+    "which one has the better camera?",
+    "what about the battery?",
+    "is there something cheaper?",
+    "compare the first two",
+    "ok, and the storage?",
+)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(raw: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("greeting", "budget", "exact", "followup", "history"):
+            raise SystemExit(f"unknown turn kind in --mix: {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+@dataclass
+class Stats:
+    warm_until: float
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, endpoint: str, started: float, seconds: float, status: int) -> None:
+        if started < self.warm_until:
+            return
+        with self._lock:
+            if 200 <= status < 300:
+                self.latencies[endpoint].append(seconds)
+            else:
+                self.errors[f"{endpoint} {status}"] += 1
+
+
+class Client:
+    """One keep-alive HTTP connection per virtual user."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> tuple[int, Any]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        for attempt in (1, 2):  # one reconnect if the server closed the idle connection
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                resp = self.conn.getresponse()
+                raw = resp.read()
+                try:
+                    data = json.loads(raw) if raw else None
+                except ValueError:
+                    data = raw.decode("utf-8", "replace")
+                return resp.status, data
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    return 599, None  # transport error
+        return 599, None
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+class VirtualUser(threading.Thread):
+    def __init__(
+        self,
+        index: int,
+        *,
+        base_url: str,
+        stats: Stats,
+        deadline: float,
+        mix: dict[str, float],
+        exact_targets: list[tuple[int, str]],
+        turns_per_session: int,
+        think_ms: float,
+        timeout: float,
+    ) -> None:
+        super().__init__(name=f"vu-{index}", daemon=True)
+        self.rng = random.Random(index)
+        self.client = Client(base_url, timeout)
+        self.stats = stats
+        self.deadline = deadline
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.exact_targets = exact_targets
+        self.turns_per_session = turns_per_session
+        self.think_ms = think_ms
+
+    def _timed(self, endpoint: str, method: str, path: str, body: Optional[dict] = None) -> tuple[int, Any]:
+        started = time.perf_counter()
+        status, data = self.client.request(method, path, body)
+        self.stats.record(endpoint, started, time.perf_counter() - started, status)
+        return status, data
+
+    def _new_session(self) -> Optional[str]:
+        status, data = self._timed("POST /create_session", "POST", "/create_session")
+        return data.get("session_id") if status == 201 and isinstance(data, dict) else None
+
+    def _message(self, kind: str, turn: int) -> str:
+        rng = self.rng
+        if kind == "greeting":
+            return rng.choice(GREETINGS)
+        if kind == "budget":
+            k = rng.choice((25, 40, 60, 80, 120, 150))
+            return rng.choice(BUDGET_TURNS).format(k=k, rs=k * 1000)
+        if kind == "exact":
+            product_id, name = rng.choice(self.exact_targets)
+            if rng.random() < 0.5:
+                return f"details of product #{product_id}"
+            return f"do you have {name}?"
+        if turn == 0:  # nothing to follow up on yet
+            return rng.choice(GREETINGS)
+        return rng.choice(FOLLOWUPS)
+
+    def run(self) -> None:
+        session_id: Optional[str] = None
+        turn = 0
+        while time.perf_counter() < self.deadline:
+            if session_id is None or turn >= self.turns_per_session:
+                session_id, turn = self._new_session(), 0
+                if session_id is None:
+                    time.sleep(0.1)
+                    continue
+
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            if kind == "history":
+                status, _ = self._timed("GET /history", "GET", f"/history/{session_id}")
+            else:
+                started = time.perf_counter()
+                status, _ = self.client.request(
+                    "POST", "/chat", {"session_id": session_id, "message": self._message(kind, turn)}
+                )
+                elapsed = time.perf_counter() - started
+                self.stats.record("POST /chat", started, elapsed, status)
+                self.stats.record(f"POST /chat [{kind}]", started, elapsed, status)
+                turn += 1
+            if status == 404:  # session trimmed by retention
+                session_id = None
+
+            if self.think_ms:
+                time.sleep(self.rng.uniform(0.5, 1.5) * self.think_ms / 1000.0)
+        self.client.close()
+
+
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+def scrape(base_url: str) -> dict[str, float]:
+    """Sum every sample of each metric name (label sets collapsed)."""
+    client = Client(base_url, timeout=10)
+    status, text = client.request("GET", "/metrics")
+    client.close()
+    totals: dict[str, float] = defaultdict(float)
+    if status != 200 or not isinstance(text, str):
+        return totals
+    for line in text.splitlines():
+        m = _SAMPLE.match(line)
+        if m:
+            try:
+                totals[m.group(1)] += float(m.group(3))
+            except ValueError:
+                pass
+    return totals
+
+
+def _proc_kb(pid: int, field_name: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith(field_name + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: dict[str, str], port: int, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "ab")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}; see {log_path}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                if scrape(base_url):
+                    return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"server did not become ready in 60s; see {log_path}")
+
+
+def summarize(stats: Stats, seconds: float) -> dict[str, Any]:
+    endpoints: dict[str, Any] = {}
+    for endpoint, values in sorted(stats.latencies.items()):
+        ordered = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / seconds, 2),
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+    total = sum(len(v) for k, v in stats.latencies.items() if not k.startswith("POST /chat ["))
+    return {"throughput_rps": round(total / seconds, 2), "endpoints": endpoints, "errors": dict(stats.errors)}
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_rps']} < baseline {baseline['throughput_rps']}")
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        cur = report["endpoints"].get(endpoint)
+        if cur is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if cur[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{endpoint} {key} {cur[key]} > baseline {base[key]}")
+    base_q, cur_q = baseline.get("db_statements_per_chat_turn"), report.get("db_statements_per_chat_turn")
+    if base_q and cur_q and cur_q > base_q * (1 + tolerance):
+        regressions.append(f"db statements per chat turn {cur_q} > baseline {base_q}")
+    return regressions
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(f"\nthroughput: {report['throughput_rps']} req/s over {report['measured_seconds']}s")
+    print(f"{'endpoint':<30} {'count':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, row in report["endpoints"].items():
+        print(
+            f"{endpoint:<30} {row['requests']:>7} {row['rps']:>8} {row['p50_ms']:>9} "
+            f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}"
+        )
+    if report["errors"]:
+        print("errors:", ", ".join(f"{k}={v}" for k, v in sorted(report["errors"].items())))
+    print(f"db statements per chat turn: {report['db_statements_per_chat_turn']}")
+    print(f"gemini calls per chat turn: {report['gemini_calls_per_chat_turn']}")
+    if report.get("server_rss_mb") is not None:
+        print(f"server rss: {report['server_rss_mb']} MB (peak {report['server_peak_rss_mb']} MB)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'chatbot-loadtest.db')}")
+    parser.add_argument("--app-url", default="", help="drive an already running app instead of starting one")
+    parser.add_argument("--products", type=int, default=1000, help="catalog size to seed (tops up)")
+    parser.add_argument("--sessions", type=int, default=100, help="pre-existing sessions to seed")
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--turns-per-session", type=int, default=8)
+    parser.add_argument("--think-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server-log", default=os.path.join(tempfile.gettempdir(), "chatbot-loadtest-server.log"))
+    parser.add_argument("--report", default="", help="write the JSON report here")
+    parser.add_argument("--baseline", default="", help="JSON report to gate against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    gemini = start_fake_gemini(
+        config=FakeGeminiConfig(
+            latency_ms=args.gemini_latency_ms,
+            jitter_ms=args.gemini_jitter_ms,
+            error_rate=args.gemini_error_rate,
+        )
+    )
+
+    proc: Optional[subprocess.Popen] = None
+    if args.app_url:
+        base_url = args.app_url.rstrip("/")
+    else:
+        os.environ["DATABASE_URL"] = args.database_url
+        if not args.no_seed:
+            from seed_catalog import seed_database
+
+            seeded = seed_database(
+                products=args.products,
+                sessions=args.sessions,
+                messages_per_session=6,
+                batch_size=5000,
+                reset=False,
+                seed=args.seed,
+            )
+            print(f"seeded: {seeded}")
+        env = {
+            **os.environ,
+            "DATABASE_URL": args.database_url,
+            "GEMINI_BASE_URL": gemini.base_url,
+            "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "fake",
+            "LOG_FILE": "",
+        }
+        # measure the app, not the quota shaper, unless limits are set explicitly
+        env.setdefault("GEMINI_RPM", "0")
+        env.setdefault("GEMINI_TPM", "0")
+        port = _free_port()
+        proc = start_server(env, port, args.server_log)
+        base_url = f"http://127.0.0.1:{port}"
+
+    rng = random.Random(args.seed)
+    ids = {rng.randint(1, max(1, args.products)) for _ in range(200)}
+    exact_targets = sorted(product_names(ids, args.seed).items())
+
+    try:
+        before = scrape(base_url)
+        gemini_before = gemini.requests
+        start = time.perf_counter()
+        stats = Stats(warm_until=start + args.warmup)
+        deadline = start + args.warmup + args.duration
+        users = [
+            VirtualUser(
+                i,
+                base_url=base_url,
+                stats=stats,
+                deadline=deadline,
+                mix=mix,
+                exact_targets=exact_targets,
+                turns_per_session=args.turns_per_session,
+                think_ms=args.think_ms,
+                timeout=args.timeout,
+            )
+            for i in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        after = scrape(base_url)
+
+        report = summarize(stats, args.duration)
+        chat_turns = after.get("chat_turn_seconds_count", 0) - before.get("chat_turn_seconds_count", 0)
+        statements = after.get("db_query_seconds_count", 0) - before.get("db_query_seconds_count", 0)
+        # covers warmup too; all statements (incl. session/history endpoints) over chat turns
+        report["db_statements_per_chat_turn"] = round(statements / chat_turns, 2) if chat_turns else None
+        report["gemini_calls_per_chat_turn"] = (
+            round((gemini.requests - gemini_before) / chat_turns, 3) if chat_turns else None
+        )
+        rss = _proc_kb(proc.pid, "VmRSS") if proc else None
+        peak = _proc_kb(proc.pid, "VmHWM") if proc else None
+        report["server_rss_mb"] = round(rss / 1024, 1) if rss else None
+        report["server_peak_rss_mb"] = round(peak / 1024, 1) if peak else None
+        report["measured_seconds"] = args.duration
+        report["config"] = {
+            "database": urlsplit(args.database_url).scheme if not args.app_url else "external",
+            "products": args.products,
+            "users": args.users,
+            "mix": mix,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "gemini_jitter_ms": args.gemini_jitter_ms,
+            "gemini_error_rate": args.gemini_error_rate,
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        gemini.shutdown()
+
+    print_report(report)
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nwithin {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Seed a benchmark database with a synthetic catalog and chat sessions.
+
+    cd backend && DATABASE_URL=sqlite:////tmp/chatbot-loadtest.db python bench/seed_catalog.py --products 100000 --sessions 500
+    cd backend && DATABASE_URL=mysql+pymysql://u:p@127.0.0.1/chatbot_bench python bench/seed_catalog.py --products 1000000 --reset
+
+Uses DATABASE_URL (or the MYSQL_* settings) like the app. The data is deterministic for
+a given --seed, so runs against the same catalog size are comparable.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANDS = {
+    "mobile": ("Samsung", "Xiaomi", "Apple", "Oppo", "Vivo", "Realme", "OnePlus", "Motorola"),
+    "laptop": ("Dell", "HP", "Lenovo", "Asus", "Acer", "Apple", "MSI"),
+    "tablet": ("Samsung", "Apple", "Lenovo", "Xiaomi"),
+}
+SERIES = {
+    "mobile": ("Galaxy A", "Redmi Note ", "iPhone ", "Reno", "V", "Narzo ", "Nord ", "Moto G"),
+    "laptop": ("Inspiron ", "Pavilion ", "IdeaPad ", "VivoBook ", "Aspire ", "MacBook Air M", "Katana "),
+    "tablet": ("Galaxy Tab S", "iPad Air ", "Tab P", "Pad "),
+}
+PRICE_RANGE = {"mobile": (12000, 220000), "laptop": (45000, 350000), "tablet": (20000, 180000)}
+PROCESSORS = ("Snapdragon 7 Gen 1", "Dimensity 7050", "Helio G99", "A16 Bionic", "Intel Core i5-1235U", "Ryzen 7 7730U", "Apple M2")
+RAMS = ("4GB", "6GB", "8GB", "12GB", "16GB", "32GB")
+STORAGES = ("64GB", "128GB", "256GB", "512GB", "1TB")
+CAMERAS = ("12MP", "48MP", "50MP", "64MP", "108MP", "200MP")
+
+CONVERSATION = (
+    ("user", "hi"),
+    ("assistant", "Hi! How can I help you today?"),
+    ("user", "best phone under 40k"),
+    ("assistant", "Here are a few good options under Rs 40,000."),
+    ("user", "which one has the better camera?"),
+    ("assistant", "The first one has the better main camera."),
+)
+
+
+def product_rows(count: int, seed: int) -> Iterator[dict]:
+    """Deterministic rows; ids are 1..count so exact lookups (#id) can target them."""
+    rng = random.Random(seed)
+    categories = tuple(BRANDS)
+    now = datetime.utcnow()
+    for i in range(1, count + 1):
+        category = categories[i % len(categories)]
+        k = rng.randrange(len(BRANDS[category]))
+        lo, hi = PRICE_RANGE[category]
+        yield {
+            "id": i,
+            "name": f"{BRANDS[category][k]} {SERIES[category][k]}{i}",
+            "category": category,
+            "brand": BRANDS[category][k],
+            "screen": f'{rng.choice((6.1, 6.5, 6.7, 11.0, 13.3, 14.0, 15.6))}" display',
+            "processor": rng.choice(PROCESSORS),
+            "ram": rng.choice(RAMS),
+            "storage": rng.choice(STORAGES),
+            "camera": rng.choice(CAMERAS) if category != "laptop" else None,
+            "price": float(rng.randrange(lo, hi, 500)),
+            "created_at": now,
+        }
+
+
+def product_names(ids: set[int], seed: int) -> dict[int, str]:
+    """Names of the given product ids as seeded with `seed` (one pass, no DB access)."""
+    names: dict[int, str] = {}
+    for row in product_rows(max(ids, default=0), seed):
+        if row["id"] in ids:
+            names[row["id"]] = row["name"]
+    return names
+
+
+def _batches(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch: list[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_database(*, products: int, sessions: int, messages_per_session: int, batch_size: int, reset: bool, seed: int) -> dict:
+    from sqlalchemy import delete, func, insert, select
+
+    from app.db import engine
+    from app.db.ids import new_id
+    from app.db.migrate import migrate
+    from app.models import ChatHistory, ChatSession, HumanFlag, Product, UserProductHistory
+
+    migrate(engine)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if reset:
+            for model in (UserProductHistory, HumanFlag, ChatHistory, ChatSession, Product):
+                conn.execute(delete(model))
+        existing = conn.execute(select(func.count()).select_from(Product)).scalar_one()
+
+    # products are only ever appended, so re-running with a larger --products tops up
+    if existing < products:
+        rows = (r for r in product_rows(products, seed) if r["id"] > existing)
+        for batch in _batches(rows, batch_size):
+            with engine.begin() as conn:
+                conn.execute(insert(Product), batch)
+
+    base = datetime.utcnow() - timedelta(days=1)
+    session_rows = []
+    history_rows = []
+    for s in range(sessions):
+        session_id = new_id()
+        created = base + timedelta(seconds=s)
+        session_rows.append({"session_id": session_id, "created_at": created})
+        for m in range(messages_per_session):
+            role, message = CONVERSATION[m % len(CONVERSATION)]
+            history_rows.append(
+                {
+                    "id": new_id(),
+                    "session_id": session_id,
+                    "role": role,
+                    "message": message,
+                    "created_at": created + timedelta(milliseconds=m),
+                }
+            )
+    for batch in _batches(iter(session_rows), batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(ChatSession), batch)
+    for batch in _batches(iter(history_rows), batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(ChatHistory), batch)
+
+    with engine.connect() as conn:
+        total_products = conn.execute(select(func.count()).select_from(Product)).scalar_one()
+    return {
+        "products": total_products,
+        "sessions_added": sessions,
+        "messages_added": len(history_rows),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--messages-per-session", type=int, default=6)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete existing products, sessions and history first")
+    args = parser.parse_args()
+
+    result = seed_database(
+        products=args.products,
+        sessions=args.sessions,
+        messages_per_session=args.messages_per_session,
+        batch_size=args.batch_size,
+        reset=args.reset,
+        seed=args.seed,
+    )
+    print(
+        f"catalog: {result['products']} products; added {result['sessions_added']} sessions, "
+        f"{result['messages_added']} messages in {result['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+"""
+Multi-process production profile (one uvicorn event loop per worker):
+
+    cd backend && python -m app.db.migrate
+    cd backend && WEB_CONCURRENCY=4 DB_MAX_CONNECTIONS=120 gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app) and forked. Each worker
+then drops the inherited DB pool, Gemini client, executor and log thread and
+builds its own (os.register_at_fork hooks in app.db.session,
+app.services.gemini_client and app.core.logging). Pool sizes and the Gemini
+quota are divided by WEB_CONCURRENCY, so all workers together stay within
+DB_MAX_CONNECTIONS and GEMINI_RPM/GEMINI_TPM.
+"""
+import multiprocessing
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# read by app.core.config when the master preloads the app
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# DDL runs once per deploy (python -m app.db.migrate), not in every worker at once
+os.environ.setdefault("STARTUP_CREATE_SCHEMA", "false")
+# several processes must not rotate the same log file: log to stdout
+os.environ.setdefault("LOG_FILE", "")
+
+worker_class = "uvicorn_worker.UvicornWorker"  # uvicorn-worker package; uvicorn.workers is deprecated
+bind = os.getenv("BIND", "0.0.0.0:8000")
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
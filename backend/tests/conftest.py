@@ -0,0 +1,56 @@
+"""
+Test setup: a fresh SQLite database per run, the in-process fake Gemini server
+(bench/fake_gemini.py), no warm-up, logs to stdout.
+
+    cd backend && python -m pytest -q
+
+Settings are read when `app` is imported, so the environment is set here,
+before any test module imports the app.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, "bench")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+TMP_DIR = tempfile.mkdtemp(prefix="chatbot-tests-")
+FAKE_GEMINI = start_fake_gemini()
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(TMP_DIR, 'primary.db')}",
+    DATABASE_REPLICA_URLS="",  # tests that need a replica add one (test_replicas.py)
+    GEMINI_API_KEY="fake",
+    GEMINI_BASE_URL=FAKE_GEMINI.base_url,
+    GEMINI_RPM="0",
+    GEMINI_TPM="0",
+    LOG_FILE="",
+    LOG_LEVEL="WARNING",
+    WARMUP_ENABLED="false",
+    SESSION_CACHE_REDIS_URL="",
+    IDEMPOTENCY_REDIS_URL="",
+    CHAT_ARCHIVE_DIR="",
+)
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator[TestClient]:
+    from app.main import app
+
+    with TestClient(app) as test_client:  # runs the lifespan: schema created
+        yield test_client
+
+
+@pytest.fixture
+def session_id(client) -> str:
+    return client.post("/create_session").json()["session_id"]
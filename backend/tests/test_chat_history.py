@@ -0,0 +1,84 @@
+"""
+chat_history hot path: the (session_id, created_at) index plans (same checks as
+bench/explain_plans.py, on SQLite), turn ordering through the concurrent and
+sequential stage graphs, and the SQL statement budget of one /chat turn.
+"""
+from __future__ import annotations
+
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from app.api.routers import chat as chat_router
+from app.core import tracing
+from app.db.session import SessionLocal, engine
+from app.services.chat_history import (
+    SESSION_CREATED_INDEX,
+    cap_boundary_query,
+    delete_before_query,
+    messages_after_query,
+    recent_messages_query,
+    session_history_query,
+)
+
+# statements /chat itself runs on a follow-up turn without retrieval: history, flag,
+# user message, reply, flag re-read (the session check is cached; background jobs
+# report under their own route)
+CHAT_TURN_STATEMENT_BUDGET = 5
+
+QUERIES = {
+    "history": lambda db, sid: session_history_query(db, sid),
+    "chat context": lambda db, sid: recent_messages_query(db, sid, 36),
+    "summary refresh": lambda db, sid: messages_after_query(db, sid, datetime(2025, 1, 1)),
+    "trim probe": lambda db, sid: cap_boundary_query(db, sid, keep=50),
+    "trim delete": lambda db, sid: delete_before_query(db, sid, datetime(2025, 1, 1)),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_history_queries_use_composite_index(client, name):
+    with SessionLocal() as db, engine.connect() as conn:
+        compiled = QUERIES[name](db, "00000000-0000-7000-8000-000000000000").statement.compile(dialect=engine.dialect)
+        params = tuple(compiled.construct_params()[p] for p in compiled.positiontup)
+        details = [row.detail for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+    assert any(SESSION_CREATED_INDEX in d for d in details), details
+    assert not any("TEMP B-TREE" in d for d in details), details
+
+
+@pytest.mark.parametrize("concurrent", [True, False], ids=["concurrent", "sequential"])
+def test_turns_are_stored_in_order(client, session_id, monkeypatch, concurrent):
+    monkeypatch.setattr(
+        chat_router, "settings", dataclasses.replace(chat_router.settings, chat_concurrent_stages=concurrent)
+    )
+    messages = ["hi", "best phone under 40k", "which one has the best camera?", "thanks"]
+    replies = []
+    for message in messages:
+        r = client.post("/chat", json={"session_id": session_id, "message": message})
+        assert r.status_code == 200, r.text
+        replies.append(r.json()["bot_message"])
+
+    history = client.get(f"/history/{session_id}").json()
+    assert [(h["role"], h["message"]) for h in history] == [
+        turn for message, reply in zip(messages, replies) for turn in (("user", message), ("assistant", reply))
+    ]
+
+
+def test_chat_turn_statement_budget(client, session_id):
+    exporter = tracing.InMemorySpanExporter()
+    tracing.add_exporter(exporter)
+    try:
+        for message in ("hi", "best phone under 40k", "tell me more about the first one"):
+            assert client.post("/chat", json={"session_id": session_id, "message": message}).status_code == 200
+    finally:
+        tracing.remove_exporter(exporter)
+
+    turns = [
+        s
+        for s in exporter.get_finished_spans()
+        if s.name == "http.request" and s.attributes.get("http_route") == "/chat"
+    ]
+    assert len(turns) == 3
+    follow_up = turns[-1].attributes["db_queries"]
+    assert 0 < follow_up <= CHAT_TURN_STATEMENT_BUDGET, f"/chat ran {follow_up} statements"
@@ -0,0 +1,67 @@
+"""
+Session retention: trim_chat_sessions pages through the sessions past the cap,
+and a lazy session token retired by the trim is not recreated by /chat.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.routers.chat import CHAT_SESSION_CAP
+from app.db.session import SessionLocal
+from app.models import ChatHistory, ChatSession
+from app.services import chat_maintenance
+from app.services.chat_maintenance import trim_chat_sessions
+from app.services.chat_sessions import issue_lazy_session
+
+
+def session_exists(session_id: str) -> bool:
+    with SessionLocal() as db:
+        return db.get(ChatSession, session_id) is not None
+
+
+def test_trim_pages_through_the_oldest_sessions(client, monkeypatch):
+    monkeypatch.setattr(chat_maintenance, "SESSION_TRIM_BATCH", 2)
+    oldest = datetime(2000, 1, 1)
+    ids = [f"trim-page-{i}" for i in range(7)]
+    with SessionLocal() as db:
+        for i, session_id in enumerate(ids):
+            db.add(ChatSession(session_id=session_id, created_at=oldest + timedelta(minutes=i)))
+            db.add(ChatHistory(session_id=session_id, role="user", message="hi", created_at=oldest))
+        db.commit()
+        total = db.query(ChatSession).count()
+
+        # everything but the five oldest stays; one of those five is in use
+        trim_chat_sessions(db, max_sessions=total - 5, keep_session_id=ids[2])
+
+        assert [sid for sid in ids if session_exists(sid)] == [ids[2], ids[5], ids[6]]
+        assert db.query(ChatHistory).filter(ChatHistory.session_id.in_(ids)).count() == 3
+        db.query(ChatHistory).filter(ChatHistory.session_id.in_(ids)).delete(synchronize_session=False)
+        db.query(ChatSession).filter(ChatSession.session_id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+@pytest.mark.parametrize("materialized", [True, False], ids=["materialized", "never-used"])
+def test_retired_lazy_session_is_not_recreated(client, materialized):
+    token = issue_lazy_session()
+    if materialized:
+        assert client.post("/chat", json={"session_id": token, "message": "hi"}).status_code == 200
+        assert session_exists(token)
+
+    for _ in range(CHAT_SESSION_CAP):
+        client.post("/create_session")
+    with SessionLocal() as db:
+        trim_chat_sessions(db, max_sessions=CHAT_SESSION_CAP)
+    assert not session_exists(token)
+
+    r = client.post("/chat", json={"session_id": token, "message": "still there?"})
+    assert r.status_code == 404, r.text
+    assert not session_exists(token)
+
+
+def test_fresh_lazy_session_is_created(client):
+    token = issue_lazy_session()
+    assert client.post("/chat", json={"session_id": token, "message": "hi"}).status_code == 200
+    assert session_exists(token)
+
@@ -0,0 +1,43 @@
+"""
+PromptBuilder must stay byte-identical to the original f-string prompt
+(bench/bench_prompt_build.py keeps that reference assembly).
+"""
+from __future__ import annotations
+
+import pytest
+
+from app.services.gemini_client import SYSTEM_INSTRUCTION
+from app.services.prompt_builder import PromptBuilder
+
+from bench_prompt_build import legacy_build, make_history, make_products
+
+PRODUCTS = make_products(200)  # far past the 3000-char product budget: truncated
+HISTORY = make_history(12)
+SPARSE = [
+    {"name": "No Specs Phone", "price": None},
+    {"name": "x" * 600, "category": "laptop", "ram": "", "camera": None, "price": 0},
+    {"brand": "Acme", "price": 49999.5},
+]
+
+CASES = {
+    "products and history": (PRODUCTS, HISTORY),
+    "nothing": ([], []),
+    "few products": (PRODUCTS[:3], HISTORY[:1]),
+    "sparse products": (SPARSE, []),
+    "no products": ([], HISTORY),
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_build_matches_legacy_prompt(case):
+    products, history = CASES[case]
+    prompt = "laptop under 80k for gaming"
+    assert PromptBuilder(SYSTEM_INSTRUCTION).build(prompt, products, history) == legacy_build(prompt, products, history)
+
+
+def test_prefix_then_complete_matches_build():
+    builder = PromptBuilder(SYSTEM_INSTRUCTION)
+    prompt = "best phone under 40k"
+    prefix = builder.prefix(prompt, HISTORY)
+    for products in (PRODUCTS, PRODUCTS[:2], []):
+        assert builder.complete(prefix, products) == builder.build(prompt, products, HISTORY)
@@ -0,0 +1,115 @@
+"""
+Read-replica routing (app/db/replicas.py) against a SQLite stand-in. The replica
+does not replicate: the same marker row is written to each database under a
+different name, so every read shows which database served it.
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.db import replicas as replica_routing
+from app.db.migrate import migrate
+from app.db.replicas import ReadSessionLocal, Replica, track_writes
+from app.db.session import SessionLocal, engine, make_engine
+from app.models import ChatSession, Product
+
+MARKER_ID = 987654321
+PRIMARY_ROW, REPLICA_ROW = "PRIMARY ROW", "REPLICA ROW"
+
+
+@pytest.fixture(scope="module")
+def replica(client, tmp_path_factory):
+    path = tmp_path_factory.mktemp("replica") / "replica.db"
+    replica = Replica("test", make_engine(f"sqlite:///{path}", name="replica-test"))
+    for name, target in ((PRIMARY_ROW, engine), (REPLICA_ROW, replica.engine)):
+        migrate(target)
+        with target.begin() as conn:
+            conn.execute(delete(Product.__table__).where(Product.id == MARKER_ID))
+            conn.execute(Product.__table__.insert().values(id=MARKER_ID, name=name, price=1.0))
+    replica.refresh()
+    replica_routing.replicas.append(replica)
+    yield replica
+    replica_routing.replicas.remove(replica)
+    with engine.begin() as conn:
+        conn.execute(delete(Product.__table__).where(Product.id == MARKER_ID))
+    replica.engine.dispose()
+
+
+@pytest.fixture
+def probe_session(replica):
+    """A chat_sessions row that exists only on the primary."""
+    session_id = f"check-replicas-{time.time_ns()}"
+    with SessionLocal() as db:
+        db.add(ChatSession(session_id=session_id))
+        db.commit()
+    yield session_id
+    with SessionLocal() as db:
+        db.execute(delete(ChatSession).where(ChatSession.session_id.like(f"{session_id}%")))
+        db.commit()
+
+
+def product_name(db) -> str:
+    return db.execute(select(Product.name).where(Product.id == MARKER_ID)).scalar()
+
+
+def session_found(db, session_id: str) -> bool:
+    return db.execute(select(ChatSession.session_id).where(ChatSession.session_id == session_id)).first() is not None
+
+
+def test_reads_use_the_replica(replica):
+    with ReadSessionLocal() as db:
+        assert db.get(Product, MARKER_ID).name == REPLICA_ROW
+        assert product_name(db) == REPLICA_ROW
+
+
+def test_get_products_uses_the_replica(client, replica):
+    names = {p["name"] for p in client.get("/products?limit=500").json()}
+    assert REPLICA_ROW in names
+    assert PRIMARY_ROW not in names
+
+
+def test_write_through_a_read_session_lands_on_the_primary(replica):
+    session_id = f"check-replicas-write-{time.time_ns()}"
+    with ReadSessionLocal() as db:
+        db.add(ChatSession(session_id=session_id))
+        db.commit()
+    with SessionLocal() as primary:
+        assert primary.get(ChatSession, session_id) is not None
+        primary.execute(delete(ChatSession).where(ChatSession.session_id == session_id))
+        primary.commit()
+
+
+def test_read_your_writes_within_a_request(replica, probe_session):
+    with track_writes():
+        with SessionLocal() as writer:
+            writer.get(ChatSession, probe_session).summary = "touched"
+            writer.commit()
+        with ReadSessionLocal() as db:
+            assert session_found(db, probe_session)  # written table: primary
+            assert product_name(db) == REPLICA_ROW  # other tables: still the replica
+
+    with ReadSessionLocal() as db:
+        assert not session_found(db, probe_session)  # new request scope: replica again
+
+
+def test_own_flush_pins_the_table(replica, probe_session):
+    with ReadSessionLocal() as db:
+        db.add(ChatSession(session_id=f"{probe_session}-own"))
+        db.flush()
+        assert session_found(db, probe_session)
+        db.rollback()
+
+
+@pytest.mark.parametrize("lag", [10.0, None], ids=["above-limit", "unknown"])
+def test_lagging_replica_is_skipped(replica, lag):
+    replica.lag, replica._checked = lag, time.monotonic()
+    try:
+        with ReadSessionLocal() as db:
+            assert product_name(db) == PRIMARY_ROW
+    finally:
+        replica.refresh()
+    with ReadSessionLocal() as db:
+        assert product_name(db) == REPLICA_ROW
@@ -186,13 +186,23 @@ export default function App() {
     setInput("");
     setIsSending(true);
 
-    try {
-      const res = await fetch(`${API_URL}/chat`, {
+    // same id on the retry => the server replays its reply instead of answering twice
+    const clientMessageId = crypto.randomUUID();
+    const postChat = () =>
+      fetch(`${API_URL}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ session_id: sessionId, message: userMessage }),
+        body: JSON.stringify({
+          session_id: sessionId,
+          message: userMessage,
+          client_message_id: clientMessageId,
+        }),
       });
 
+    try {
+      // one retry on a dropped connection
+      const res = await postChat().catch(() => postChat());
+
       let botReply = "Error: No response from server.";
 
       if (res.ok) {